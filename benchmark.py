@@ -0,0 +1,422 @@
+# Set matplotlib backend to non-interactive - must be done before any other matplotlib imports
+import matplotlib
+matplotlib.use('Agg')  # Use the Agg backend which doesn't require a GUI
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from modules.card import Shoe
+from modules.hand import Hand
+from modules.strategy import Strategy
+from modules.game import BlackjackGame
+from modules.simulator import BlackjackSimulator
+from modules.plotting import plot_results
+from modules.results import MappedResultStore, session_final_bankrolls
+from blackjack_sim import print_results_summary, print_summary
+
+STRATEGY_FILE = 'data/basic-strategy.csv'
+
+# (name, unit, scales, setup, budget) for every benchmark, in the order they run
+BENCHMARKS = []
+
+# (name, scales, check) for every consistency check, run before the benchmarks
+CHECKS = []
+
+# Seconds a short command line run may take from launch to exit
+STARTUP_BUDGET = 0.5
+
+def benchmark(name, unit, scales, budget=None):
+    """Register a benchmark
+
+    The decorated function takes a scale and does any setup that shouldn't be
+    timed, then returns a function that runs the benchmark and returns the
+    number of units (cards, hands, lookups...) it processed. A benchmark whose
+    best time exceeds its budget (in seconds) fails the run.
+    """
+    def register(setup):
+        BENCHMARKS.append((name, unit, scales, setup, budget))
+        return setup
+    return register
+
+def check(name, scales):
+    """Register a consistency check
+
+    The decorated function takes a scale and returns a list of problems,
+    empty if the check passed. Any problem fails the run.
+    """
+    def register(run):
+        CHECKS.append((name, scales, run))
+        return run
+    return register
+
+def load_strategy():
+    """Load the default strategy without its loading messages"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Strategy(STRATEGY_FILE)
+
+def sample_hands(count, seed=0):
+    """Deal count two-or-more-card hands and up cards from shuffled shoes"""
+    shoe = Shoe(6, rng=np.random.default_rng(seed))
+    hands = []
+    for _ in range(count):
+        if shoe.cards_remaining() < 10:
+            shoe.initialize()
+        hand = Hand([shoe.draw_card(), shoe.draw_card()])
+        while hand.get_value() < 12:
+            hand.add_card(shoe.draw_card())
+        hands.append((hand, shoe.draw_card()))
+    return hands
+
+def simulator_args(num_sessions, num_hands, engine):
+    return argparse.Namespace(
+        num_sessions=num_sessions, num_hands=num_hands, starting_stake=1000, standard_bet=10,
+        verbose=False, debug=False, strategy_file=STRATEGY_FILE, workers=1, seed=0,
+        engine=engine, batch_size=10000, profile=False,
+        event_log=None, event_sample=1, event_buffer=0, cache_dir=None, cache_size=0,
+        checkpoint=None, checkpoint_sessions=1000, checkpoint_seconds=300, resume=None
+    )
+
+def summary_lines(output):
+    """Return the median and percentile lines of printed summary statistics"""
+    return [line for line in output.splitlines() if line.startswith(("Median", "Final bankroll percentiles"))]
+
+@check("summary_only percentiles", ("object", "vector"))
+def check_summary_percentiles(engine):
+    """--summary_only must print the same median and percentiles as a full run of the same seed"""
+    problems = []
+    for starting_stake in (1000, 1000000):
+        args = simulator_args(500, 200, engine)
+        args.starting_stake = starting_stake
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator = BlackjackSimulator(args)
+            final_bankrolls = session_final_bankrolls(simulator.run_simulation())
+            summary = simulator.run_summary()
+        full, summary_only = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(full):
+            print_results_summary(final_bankrolls, starting_stake)
+        with contextlib.redirect_stdout(summary_only):
+            print_summary(summary)
+        if summary_lines(full.getvalue()) != summary_lines(summary_only.getvalue()):
+            problems.append(f"stake {starting_stake}: full run printed {summary_lines(full.getvalue())}, "
+                            f"summary_only printed {summary_lines(summary_only.getvalue())}")
+    return problems
+
+@benchmark("startup", "runs", ("help", "debug", "summary"), budget=STARTUP_BUDGET)
+def bench_startup(scale):
+    """Launch blackjack_sim.py in a fresh interpreter, as sweep scripts do"""
+    script = os.path.abspath("blackjack_sim.py")
+    arguments = {
+        "help": ["--help"],
+        "debug": ["--debug"],
+        "summary": ["--summary_only", "--num_hands", "100", "--seed", "0", "--no_cache",
+                    "--strategy_file", os.path.abspath(STRATEGY_FILE)]
+    }[scale]
+    def run():
+        # Debug scenarios are read from the working directory; other runs write to a scratch one
+        with tempfile.TemporaryDirectory() as scratch:
+            subprocess.run([sys.executable, script, *arguments], cwd=os.getcwd() if scale == "debug" else scratch,
+                           stdout=subprocess.DEVNULL, check=True)
+        return 1
+    return run
+
+@benchmark("Shoe.initialize", "shoes", (100, 1000))
+def bench_shoe_initialize(scale):
+    shoe = Shoe(6, rng=np.random.default_rng(0))
+    def run():
+        for _ in range(scale):
+            shoe.initialize()
+        return scale
+    return run
+
+@benchmark("Shoe.shuffle", "shoes", (100, 1000))
+def bench_shoe_shuffle(scale):
+    shoe = Shoe(6, rng=np.random.default_rng(0))
+    def run():
+        for _ in range(scale):
+            shoe.shuffle()
+        return scale
+    return run
+
+@benchmark("Shoe.draw_card", "cards", (100000, 1000000))
+def bench_shoe_draw_card(scale):
+    shoe = Shoe(6, rng=np.random.default_rng(0))
+    def run():
+        remaining = scale
+        while remaining:
+            shoe.initialize()
+            count = min(remaining, shoe.cards_remaining())
+            for _ in range(count):
+                shoe.draw_card()
+            remaining -= count
+        return scale
+    return run
+
+@benchmark("Hand.get_value", "calls", (100000, 1000000))
+def bench_hand_get_value(scale):
+    hands = [hand for hand, _ in sample_hands(1000)]
+    def run():
+        for _ in range(scale // len(hands)):
+            for hand in hands:
+                hand.get_value()
+        return scale
+    return run
+
+@benchmark("Hand.is_soft", "calls", (100000, 1000000))
+def bench_hand_is_soft(scale):
+    hands = [hand for hand, _ in sample_hands(1000)]
+    def run():
+        for _ in range(scale // len(hands)):
+            for hand in hands:
+                hand.is_soft()
+        return scale
+    return run
+
+@benchmark("Strategy.get_action", "lookups", (100000, 1000000))
+def bench_strategy_get_action(scale):
+    strategy = load_strategy()
+    hands = sample_hands(1000)
+    def run():
+        for _ in range(scale // len(hands)):
+            for hand, upcard in hands:
+                strategy.get_action(hand, upcard)
+        return scale
+    return run
+
+@benchmark("BlackjackGame.play_round", "hands", (10000, 100000))
+def bench_play_round(scale):
+    game = BlackjackGame(load_strategy(), Shoe(6, rng=np.random.default_rng(0)), float("inf"), 10)
+    def run():
+        for _ in range(scale):
+            game.play_round()
+        return scale
+    return run
+
+@benchmark("BlackjackGame.play_round_fast", "hands", (10000, 100000))
+def bench_play_round_fast(scale):
+    game = BlackjackGame(load_strategy(), Shoe(6, rng=np.random.default_rng(0)), float("inf"), 10)
+    def run():
+        for _ in range(scale):
+            game.play_round_fast()
+        return scale
+    return run
+
+@benchmark("run_simulation[object]", "hands", ((10, 100), (100, 100), (100, 1000)))
+def bench_run_simulation_object(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "object"))
+    def run():
+        results = simulator.run_simulation()
+        return len(results) - simulator.num_sessions
+    return run
+
+@benchmark("run_simulation[vector]", "hands", ((100, 100), (1000, 1000), (10000, 1000)))
+def bench_run_simulation_vector(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "vector"))
+    def run():
+        results = simulator.run_simulation()
+        return len(results) - simulator.num_sessions
+    return run
+
+@benchmark("run_simulation[mmap]", "hands", ((1000, 1000), (10000, 1000)))
+def bench_run_simulation_mmap(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "vector"))
+    def run():
+        with tempfile.TemporaryDirectory() as output_dir:
+            writer = MappedResultStore.create(os.path.join(output_dir, "results.mmap"), *scale)
+            results = simulator.run_simulation(writer)
+        return len(results) - simulator.num_sessions
+    return run
+
+@benchmark("run_summary[object]", "hands", ((10, 100), (100, 1000)))
+def bench_run_summary_object(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "object"))
+    def run():
+        return simulator.run_summary().ev_per_hand.sy
+    return run
+
+@benchmark("run_summary[vector]", "hands", ((1000, 1000), (10000, 1000)))
+def bench_run_summary_vector(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "vector"))
+    def run():
+        return simulator.run_summary().ev_per_hand.sy
+    return run
+
+@benchmark("plot_results", "hands", ((10, 100), (100, 1000)))
+def bench_plot_results(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "vector"))
+    results = simulator.run_simulation()
+    def run():
+        with tempfile.TemporaryDirectory() as output_dir:
+            plot_results(results, 1000, scale[1], output_dir, mode="lines")
+        return len(results) - simulator.num_sessions
+    return run
+
+@benchmark("plot_results[bands]", "hands", ((1000, 1000), (10000, 1000)))
+def bench_plot_results_bands(scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = BlackjackSimulator(simulator_args(*scale, "vector"))
+    results = simulator.run_simulation()
+    def run():
+        with tempfile.TemporaryDirectory() as output_dir:
+            plot_results(results, 1000, scale[1], output_dir, mode="bands")
+        return len(results) - simulator.num_sessions
+    return run
+
+def measure(setup, scale, repeat, memory):
+    """Time a benchmark repeat times, then optionally measure its peak memory in one more run"""
+    times = []
+    for _ in range(repeat):
+        run = setup(scale)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            units = run()
+        times.append(time.perf_counter() - start)
+
+    peak_memory = None
+    if memory:
+        run = setup(scale)
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return units, times, peak_memory
+
+def benchmark_key(result):
+    return f"{result['name']}@{result['scale']}"
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def find_regressions(results, baseline, threshold):
+    """Return (key, baseline seconds, seconds) for benchmarks slower than baseline by more than threshold"""
+    previous = {benchmark_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(benchmark_key(result))
+        if old and result['best_seconds'] > old['best_seconds'] * (1 + threshold):
+            regressions.append((benchmark_key(result), old['best_seconds'], result['best_seconds']))
+    return regressions
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Blackjack Simulator benchmarks')
+    parser.add_argument('--filter', type=str, default=None,
+                        help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--quick', action='store_true',
+                        help='Only run the smallest scale of each benchmark')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed runs per benchmark; the best is reported (default: 3)')
+    parser.add_argument('--no_memory', action='store_true',
+                        help='Skip the extra traced run that measures peak memory')
+    parser.add_argument('--output', type=str, default=None,
+                        help='JSON results file (default: output/YYYYMMDD_HHMM_benchmark.json)')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Baseline JSON results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown relative to the baseline that counts as a regression (default: 0.10)')
+    return parser.parse_args()
+
+def main():
+    """Run the benchmarks, save the results as JSON and check them against a baseline"""
+    args = parse_args()
+
+    failed_checks = []
+    for name, scales, run in CHECKS:
+        if args.filter and args.filter not in name:
+            continue
+        for scale in scales:
+            problems = run(scale)
+            print(f"check {name} [{scale}]: {'FAILED' if problems else 'ok'}", flush=True)
+            failed_checks.extend(f"{name} [{scale}]: {problem}" for problem in problems)
+
+    results = []
+    print(f"{'benchmark':<28} {'scale':>10} {'best (s)':>10} {'rate':>24} {'peak memory':>12}")
+    over_budget = []
+    for name, unit, scales, setup, budget in BENCHMARKS:
+        if args.filter and args.filter not in name:
+            continue
+        for scale in scales[:1] if args.quick else scales:
+            units, times, peak_memory = measure(setup, scale, args.repeat, not args.no_memory)
+            best = min(times)
+            result = {
+                "name": name,
+                "scale": scale if isinstance(scale, (int, str)) else "x".join(map(str, scale)),
+                "unit": unit,
+                "units": units,
+                "times": times,
+                "best_seconds": best,
+                "per_second": units / best if best else None,
+                "peak_memory_bytes": peak_memory,
+                "budget_seconds": budget
+            }
+            results.append(result)
+            if budget is not None and best > budget:
+                over_budget.append((benchmark_key(result), budget, best))
+            rate = f"{result['per_second']:,.0f} {unit}/s"
+            memory = f"{peak_memory / 2**20:.2f} MiB" if peak_memory is not None else "-"
+            print(f"{name:<28} {result['scale']:>10} {best:>10.4f} {rate:>24} {memory:>12}", flush=True)
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    output_file = args.output or os.path.join("output", f"{timestamp}_benchmark.json")
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump({
+            "timestamp": timestamp,
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results
+        }, f, indent=2)
+    print(f"\nBenchmark results saved to {output_file}")
+
+    failed = False
+    if failed_checks:
+        print("\nFailed checks:")
+        for problem in failed_checks:
+            print(f"  {problem}")
+        failed = True
+
+    if over_budget:
+        print("\nOver budget:")
+        for key, budget, best in over_budget:
+            print(f"  {key}: {best:.4f}s (budget {budget:.4f}s)")
+        failed = True
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions of more than {args.threshold:.0%} against {args.compare}:")
+            for key, old, new in regressions:
+                print(f"  {key}: {old:.4f}s -> {new:.4f}s ({new / old - 1:+.0%})")
+            failed = True
+        else:
+            print(f"\nNo regressions of more than {args.threshold:.0%} against {args.compare}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
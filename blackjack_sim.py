@@ -1,16 +1,25 @@
-# Set matplotlib backend to non-interactive - must be done before any other matplotlib imports
-import matplotlib
-matplotlib.use('Agg')  # Use the Agg backend which doesn't require a GUI
-
 import argparse
+import datetime
 import os
 import json
-import pandas as pd
+import numpy as np
 from modules.card import Card, Suit, Shoe
-from modules.strategy import Strategy
+from modules.strategy import Strategy, StrategyError, load_compiled_strategy
 from modules.game import BlackjackGame
 from modules.simulator import BlackjackSimulator
-from modules.plotting import plot_results
+from modules.results import ChunkedResultWriter, MappedResultStore, session_final_bankrolls
+from modules.events import render
+from modules.checkpoint import read_checkpoint
+from modules.shards import parse_shard, write_shard
+from modules.result_cache import ResultCache
+from modules.stats import METRICS, PERCENTILES, format_estimate, format_value
+
+def shard_argument(text):
+    """Parse --shard i/N for argparse"""
+    try:
+        return parse_shard(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
 
 def parse_args():
     """Parse command line arguments"""
@@ -31,7 +40,132 @@ def parse_args():
                         help='Path to strategy CSV file (default: data/basic-strategy.csv)')
     parser.add_argument('--scenario', type=str, default='split_8s',
                         help='Test scenario to run in debug mode (default: split_8s)')
-    return parser.parse_args()
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes to spread sessions across, 0 for all cores (default: 1)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Master random seed; each session derives its own seed from it (default: random)')
+    parser.add_argument('--engine', type=str, choices=['object', 'vector'], default='object',
+                        help='Simulation engine: per-object game play or lockstep NumPy arrays (default: object)')
+    parser.add_argument('--batch_size', type=int, default=10000,
+                        help='Sessions simulated together per batch by the vector engine (default: 10000)')
+    parser.add_argument('--house_edge', action='store_true',
+                        help='Compute the exact expected value of the strategy file instead of simulating')
+    parser.add_argument('--chunk_rows', type=int, default=0,
+                        help='Stream results to disk in chunks of this many rows instead of keeping them in memory (default: 0, in memory)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Write results into a memory-mapped file instead of memory, for runs larger than RAM')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time each phase of a round and count actions, splits, doubles and reshuffles (object engine)')
+    parser.add_argument('--event_log', type=str, default=None,
+                        help='Write structured events (deals, actions, splits, dealer hits, outcomes, reshuffles) to this JSONL file')
+    parser.add_argument('--event_sample', type=int, default=1,
+                        help='Log events for 1 in N rounds (default: 1, every round)')
+    parser.add_argument('--event_buffer', type=int, default=0,
+                        help='Keep the last N events in memory and print them at the end of the run (default: 0, off)')
+    parser.add_argument('--compare_strategies', '--compare-strategies', type=str, nargs='+', default=None,
+                        metavar='STRATEGY_FILE',
+                        help='Play two or more strategy files on the same shoes and report their paired differences')
+    parser.add_argument('--bankroll_solver', type=str, choices=['exact', 'simulated'], default=None,
+                        help='Solve the session outcome distribution as a Markov chain instead of simulating, '
+                             'using an exact or simulated per-round payout distribution')
+    parser.add_argument('--payout_rounds', type=int, default=1000000,
+                        help='Rounds simulated to estimate the payout distribution for --bankroll_solver simulated (default: 1000000)')
+    parser.add_argument('--target_precision', type=float, default=None,
+                        help='Run batches of sessions until the confidence interval of --target_metric is at most '
+                             '± this wide, instead of a fixed --num_sessions (proportions and EV as fractions, e.g. 0.005)')
+    parser.add_argument('--target_metric', type=str, choices=list(METRICS), default='doubled',
+                        help='Metric whose precision --target_precision sets (default: doubled)')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='Confidence level of the --target_precision interval (default: 0.95)')
+    parser.add_argument('--batch_sessions', type=int, default=1000,
+                        help='Sessions run between checks of --target_precision (default: 1000)')
+    parser.add_argument('--max_sessions', type=int, default=1000000,
+                        help='Stop --target_precision runs after this many sessions even if the target is not reached (default: 1000000)')
+    parser.add_argument('--plot_mode', type=str, choices=['auto', 'lines', 'bands'], default='auto',
+                        help='Plot one line per session, or per-hand percentile bands with a sample of sessions; '
+                             'auto uses bands for more than --plot_sample sessions (default: auto)')
+    parser.add_argument('--plot_sample', type=int, default=20,
+                        help='Number of individual sessions drawn over the percentile bands (default: 20)')
+    parser.add_argument('--plot_points', type=int, default=500,
+                        help='Points per session in the interactive plot; longer sessions are downsampled with LTTB (default: 500)')
+    parser.add_argument('--summary_only', '--summary-only', action='store_true',
+                        help='Keep only online summaries of session outcomes instead of per-hand results; '
+                             'prints the summary statistics without saving results or plots')
+    parser.add_argument('--cache_dir', type=str, default='cache',
+                        help='Directory of the result cache, which seeded runs reuse and extend (default: cache)')
+    parser.add_argument('--cache_size', type=int, default=1024,
+                        help='Size limit of the result cache in MiB; least recently used entries are evicted (default: 1024)')
+    parser.add_argument('--no_cache', action='store_true',
+                        help='Neither read nor write the result cache')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='Periodically save completed sessions to this file so the run can be resumed')
+    parser.add_argument('--checkpoint_sessions', type=int, default=1000,
+                        help='Sessions completed between checkpoints (default: 1000)')
+    parser.add_argument('--checkpoint_seconds', type=float, default=300,
+                        help='Seconds between checkpoints (default: 300)')
+    parser.add_argument('--resume', type=str, default=None,
+                        help='Resume the run saved in this checkpoint, with the arguments it was started with')
+    parser.add_argument('--shard', type=shard_argument, default=None, metavar='I/N',
+                        help='Run only shard I of N (numbered from 1) of the sessions and save its partial results '
+                             'to --shard_dir, to be combined with merge_shards.py')
+    parser.add_argument('--shard_dir', type=str, default='shards',
+                        help='Directory that --shard saves partial results to (default: shards)')
+    args = parser.parse_args()
+    if args.resume:
+        # The checkpointed run's arguments (and seed) replace any given, and checkpoints continue in the same file
+        header, _ = read_checkpoint(args.resume, payload=False)
+        vars(args).update({name: value for name, value in header["args"].items() if name != "resume"})
+        args.checkpoint = args.resume
+    if args.no_cache:
+        args.cache_dir = None
+    if args.profile and args.engine != 'object':
+        parser.error("--profile instruments the object engine; use --engine object")
+    if args.compare_strategies is not None and len(args.compare_strategies) < 2:
+        parser.error("--compare_strategies needs at least two strategy files")
+    if args.compare_strategies and args.engine != 'object':
+        parser.error("--compare_strategies plays every strategy on the same shoes with the object engine; use --engine object")
+    if args.checkpoint:
+        if args.chunk_rows or args.profile or args.event_log or args.event_buffer or args.verbose:
+            parser.error("--checkpoint saves in-memory results and summaries; it can't be combined with "
+                         "--chunk_rows, --profile, --verbose, --event_log or --event_buffer")
+        if args.debug or args.house_edge or args.compare_strategies or args.bankroll_solver or args.target_precision is not None:
+            parser.error("--checkpoint applies to simulation runs (optionally with --summary_only)")
+    if args.shard:
+        if args.seed is None:
+            parser.error("--shard needs --seed, so every shard plays its sessions of the same run")
+        if args.checkpoint or args.chunk_rows or args.profile:
+            parser.error("--shard can't be combined with --checkpoint, --chunk_rows or --profile")
+        if args.debug or args.house_edge or args.compare_strategies or args.bankroll_solver or args.target_precision is not None:
+            parser.error("--shard applies to simulation runs (optionally with --summary_only)")
+    if args.mmap:
+        if args.chunk_rows:
+            parser.error("--mmap and --chunk_rows both keep results out of memory; choose one")
+        if args.checkpoint or args.shard or args.summary_only or args.target_precision is not None:
+            parser.error("--mmap can't be combined with --checkpoint, --shard, --summary_only or --target_precision")
+    if args.plot_points < 3:
+        parser.error("--plot_points must be at least 3")
+    if args.event_sample < 1:
+        parser.error("--event_sample must be at least 1")
+    if args.target_precision is not None:
+        if args.target_precision <= 0:
+            parser.error("--target_precision must be positive")
+        if not 0 < args.confidence < 1:
+            parser.error("--confidence must be between 0 and 1")
+        if args.batch_sessions < 2 or args.max_sessions < 2:
+            parser.error("--batch_sessions and --max_sessions must be at least 2")
+    if args.summary_only and args.target_precision is not None:
+        parser.error("--target_precision already keeps only session summaries; drop --summary_only")
+    if args.target_precision is not None or args.summary_only:
+        if args.profile or args.chunk_rows or args.verbose or args.event_log or args.event_buffer:
+            parser.error("--target_precision and --summary_only keep only session summaries; they can't be "
+                         "combined with --profile, --chunk_rows, --verbose, --event_log or --event_buffer")
+    # Compile (or load the compiled) strategy files now, so a malformed table fails before anything runs
+    for strategy_file in [args.strategy_file, *(args.compare_strategies or [])]:
+        try:
+            load_compiled_strategy(strategy_file)
+        except (FileNotFoundError, StrategyError) as error:
+            parser.exit(2, f"{parser.prog}: error: {error}\n")
+    return args
 
 def create_output_directory():
     """Create output directory if it doesn't exist"""
@@ -39,6 +173,53 @@ def create_output_directory():
     os.makedirs(output_dir, exist_ok=True)
     return output_dir
 
+def print_summary(summary):
+    """Print the summary statistics of a run from its online accumulators"""
+    final_bankroll = summary.final_bankroll
+    total_sessions = summary.sessions
+    counts = summary.counts
+    print(f"Average final bankroll: ${final_bankroll.mean:.2f}")
+    print(f"Median final bankroll: ${summary.quantiles.quantile(0.5):.2f}")
+    print(f"Maximum final bankroll: ${final_bankroll.maximum:.2f}")
+    print(f"Minimum final bankroll: ${final_bankroll.minimum:.2f}")
+    print(f"Sessions ending with profit: {counts['profit'] / total_sessions * 100:.1f}%")
+    print("Final bankroll percentiles: " + ", ".join(
+        f"p{percentile} ${value:.2f}" for percentile, value in summary.percentiles().items()
+    ))
+    
+    print("\nSession Outcome Distribution:")
+    print(f"Doubled starting stake: {counts['doubled']} ({counts['doubled']/total_sessions*100:.1f}%)")
+    print(f"Positive but not doubled: {counts['positive']} ({counts['positive']/total_sessions*100:.1f}%)")
+    print(f"Negative but not zero: {counts['negative']} ({counts['negative']/total_sessions*100:.1f}%)")
+    print(f"Zero bankroll: {counts['zero']} ({counts['zero']/total_sessions*100:.1f}%)")
+
+def print_results_summary(final_bankrolls, starting_stake):
+    """Print the summary statistics of a run from each session's final bankroll"""
+    print(f"Average final bankroll: ${final_bankrolls.mean():.2f}")
+    print(f"Median final bankroll: ${final_bankrolls.median():.2f}")
+    print(f"Maximum final bankroll: ${final_bankrolls.max():.2f}")
+    print(f"Minimum final bankroll: ${final_bankrolls.min():.2f}")
+    
+    # Calculate win/loss percentage
+    win_percentage = (final_bankrolls > starting_stake).mean() * 100
+    print(f"Sessions ending with profit: {win_percentage:.1f}%")
+    print("Final bankroll percentiles: " + ", ".join(
+        f"p{percentile} ${value:.2f}" for percentile, value in zip(PERCENTILES, np.percentile(final_bankrolls, PERCENTILES))
+    ))
+    
+    # Calculate the additional outcome statistics
+    total_sessions = len(final_bankrolls)
+    doubled_count = sum(final_bankrolls >= 2 * starting_stake)
+    positive_count = sum((final_bankrolls < 2 * starting_stake) & (final_bankrolls > 0))
+    negative_count = sum(final_bankrolls < 0)
+    zero_count = sum(final_bankrolls == 0)
+    
+    print("\nSession Outcome Distribution:")
+    print(f"Doubled starting stake: {doubled_count} ({doubled_count/total_sessions*100:.1f}%)")
+    print(f"Positive but not doubled: {positive_count} ({positive_count/total_sessions*100:.1f}%)")
+    print(f"Negative but not zero: {negative_count} ({negative_count/total_sessions*100:.1f}%)")
+    print(f"Zero bankroll: {zero_count} ({zero_count/total_sessions*100:.1f}%)")
+
 def main():
     """Main function to run the blackjack simulator"""
     # Parse command line arguments
@@ -53,45 +234,189 @@ def main():
     if args.debug:
         # Run in debug mode with the specified test scenario
         simulator.run_debug_session(args.scenario)
+    elif args.house_edge:
+        # Compute the expected value of every initial hand analytically
+        from modules.house_edge import HouseEdgeCalculator
+        print(f"Computing expected values for {args.strategy_file}")
+        ev_table, expected_value = HouseEdgeCalculator(simulator.strategy).ev_table()
+        
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        ev_file = os.path.join(output_dir, f"{timestamp}_house_edge.csv")
+        ev_table.to_csv(ev_file)
+        
+        print("\nExpected value per unit bet (rows: initial hand, columns: dealer up card):")
+        print(ev_table.round(3).to_string())
+        print(f"\nExpected value per hand: {expected_value * 100:.3f}% of the initial bet")
+        print(f"House edge: {-expected_value * 100:.3f}%")
+        print(f"Expected value table saved to {ev_file}")
+    elif args.compare_strategies:
+        # Play every strategy on the same shoes and compare them session by session
+        print(f"Comparing {len(args.compare_strategies)} strategies over {args.num_sessions} sessions of {args.num_hands} hands each")
+        print(f"Starting stake: ${args.starting_stake:.2f}, Standard bet: ${args.standard_bet:.2f}")
+        print(f"Workers: {simulator.workers}, Seed: {simulator.seed}")
+        comparison = simulator.run_comparison(args.compare_strategies)
+        
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        comparison_file = os.path.join(output_dir, f"{timestamp}_strategy_comparison.csv")
+        comparison.to_dataframe().to_csv(comparison_file, index=False)
+        
+        print()
+        print(comparison.report())
+        print(f"Per-session results saved to {comparison_file}")
+    elif args.bankroll_solver:
+        # Solve the bankroll distribution from a per-round payout distribution
+        from modules.bankroll_solver import BankrollSolver, exact_payout_distribution, simulated_payout_distribution
+        if args.bankroll_solver == 'exact':
+            print(f"Computing the exact payout distribution for {args.strategy_file}")
+            cache = ResultCache(args.cache_dir, args.cache_size * 2**20) if args.cache_dir else None
+            payouts = exact_payout_distribution(simulator.strategy, cache)
+        else:
+            print(f"Estimating the payout distribution from {args.payout_rounds} simulated rounds (seed {simulator.seed})")
+            rng = np.random.default_rng(np.random.SeedSequence(simulator.seed))
+            payouts = simulated_payout_distribution(simulator.strategy, args.payout_rounds, rng)
+        expected_value = sum(payout * probability for payout, probability in payouts.items())
+        print(f"Expected value per hand: {expected_value * 100:.3f}% of the initial bet")
+        
+        solver = BankrollSolver(payouts, args.starting_stake, args.standard_bet)
+        outcomes, percentiles = solver.solve(args.num_hands)
+        
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        percentiles_file = os.path.join(output_dir, f"{timestamp}_bankroll_percentiles.csv")
+        percentiles.to_csv(percentiles_file)
+        
+        print(f"\nBankroll distribution after {args.num_hands} hands "
+              f"(starting stake: ${args.starting_stake:.2f}, standard bet: ${args.standard_bet:.2f}):")
+        print(f"Average final bankroll: ${outcomes['mean']:.2f}")
+        print(f"Median final bankroll: ${percentiles['p50'].iloc[-1]:.2f}")
+        print(f"Sessions ending with profit: {outcomes['profit'] * 100:.1f}%")
+        
+        print("\nSession Outcome Distribution:")
+        print(f"Doubled starting stake: {outcomes['doubled'] * 100:.1f}%")
+        print(f"Positive but not doubled: {outcomes['positive'] * 100:.1f}%")
+        print(f"Negative but not zero: {outcomes['negative'] * 100:.1f}%")
+        print(f"Zero bankroll: {outcomes['zero'] * 100:.1f}%")
+        
+        print("\nBankroll percentiles:")
+        step = max(1, args.num_hands // 10)
+        print(percentiles.iloc[::step].round(2).to_string())
+        print(f"Bankroll percentiles saved to {percentiles_file}")
+    elif args.target_precision is not None:
+        # Run sessions in batches until the target metric is known precisely enough
+        import pandas as pd
+        metric = args.target_metric
+        level = f"{args.confidence:.0%}"
+        print(f"Estimating the {METRICS[metric]} to ± {format_value(metric, args.target_precision)} "
+              f"at {level} confidence, {args.batch_sessions} sessions of {args.num_hands} hands per batch")
+        print(f"Starting stake: ${args.starting_stake:.2f}, Standard bet: ${args.standard_bet:.2f}")
+        print(f"Engine: {args.engine}, Workers: {simulator.workers}, Seed: {simulator.seed}")
+        
+        def progress(sessions, estimate, half_width):
+            print(f"  {sessions:>9} sessions: {format_estimate(metric, estimate, half_width)}", flush=True)
+        estimators, history = simulator.run_adaptive(
+            metric, args.target_precision, args.confidence, args.batch_sessions, args.max_sessions, progress
+        )
+        
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        progress_file = os.path.join(output_dir, f"{timestamp}_adaptive_progress.csv")
+        pd.DataFrame(history, columns=["sessions", metric, "half_width"]).to_csv(progress_file, index=False)
+        
+        sessions, estimate, half_width = history[-1]
+        if half_width <= args.target_precision:
+            print(f"\nTarget reached after {sessions} sessions")
+        else:
+            print(f"\nTarget not reached: stopped at --max_sessions {sessions}")
+        print(f"Achieved precision: ± {format_value(metric, half_width)} at {level} confidence")
+        
+        print(f"\nEstimates after {sessions} sessions (± {level} confidence interval):")
+        for name, description in METRICS.items():
+            print(f"  {description}: {format_estimate(name, *estimators.estimate(name, args.confidence))}")
+        print(f"Progress saved to {progress_file}")
+    elif args.shard:
+        # Run one shard's range of sessions and save its partial results for merge_shards.py
+        shard, num_shards = args.shard
+        print(f"Starting shard {shard} of {num_shards} of a simulation with {args.num_sessions} sessions of {args.num_hands} hands each")
+        print(f"Starting stake: ${args.starting_stake:.2f}, Standard bet: ${args.standard_bet:.2f}")
+        print(f"Engine: {args.engine}, Workers: {simulator.workers}, Seed: {simulator.seed}")
+        first, last, results, summary = simulator.run_shard(shard, num_shards, args.summary_only)
+        
+        manifest_file = write_shard(args.shard_dir, args, shard, num_shards, first, last, results, summary)
+        if last < first:
+            print(f"Shard {shard} has no sessions (there are fewer batches than shards)")
+        else:
+            print(f"Simulated sessions {first}-{last}")
+        print(f"Shard saved to {manifest_file}")
+    elif args.summary_only:
+        # Run the simulation keeping only online summaries of each session's outcome
+        print(f"Starting summary-only simulation with {args.num_sessions} sessions of {args.num_hands} hands each")
+        print(f"Starting stake: ${args.starting_stake:.2f}, Standard bet: ${args.standard_bet:.2f}")
+        print(f"Engine: {args.engine}, Workers: {simulator.workers}, Seed: {simulator.seed}")
+        summary = simulator.run_summary()
+        
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        summary_file = os.path.join(output_dir, f"{timestamp}_summary.json")
+        with open(summary_file, 'w') as f:
+            json.dump(summary.to_dict(), f, indent=2)
+        
+        print("\nSummary Statistics:")
+        print_summary(summary)
+        print(f"Summary saved to {summary_file}")
     else:
-        # Run the simulation
+        # Run the simulation; plotting (and with it matplotlib and pandas) is only imported here
+        from modules.plotting import plot_results
         print(f"Starting simulation with {args.num_sessions} sessions of {args.num_hands} hands each")
         print(f"Starting stake: ${args.starting_stake:.2f}, Standard bet: ${args.standard_bet:.2f}")
+        print(f"Engine: {args.engine}, Workers: {simulator.workers}, Seed: {simulator.seed}")
+        
+        writer = None
+        if args.chunk_rows > 0:
+            writer = ChunkedResultWriter(output_dir, args.chunk_rows)
+        elif args.mmap:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+            writer = MappedResultStore.create(
+                os.path.join(output_dir, f"{timestamp}_simulation_results.mmap"), args.num_sessions, args.num_hands
+            )
+        results_df = simulator.run_simulation(writer)
         
-        results_df = simulator.run_simulation()
+        if args.event_buffer > 0:
+            # Render the most recent events only now that the run is over
+            recent = simulator.event_sink.recent
+            print(f"\nLast {len(recent)} of {recent.count} events:")
+            for event in recent:
+                print(render(event))
+        if args.event_log:
+            print(f"Events saved to {args.event_log}")
         
         # Save results to file
         results_file = simulator.save_results(results_df, output_dir)
         print(f"Simulation results saved to {results_file}")
         
         # Plot results
-        static_plot_file, html_plot_file = plot_results(results_df, args.starting_stake, args.num_hands, output_dir)
+        static_plot_file, html_plot_file = plot_results(
+            results_df, args.starting_stake, args.num_hands, output_dir, args.plot_mode, args.plot_sample, args.plot_points
+        )
         
         # Display summary statistics
         print("\nSummary Statistics:")
-        final_bankrolls = results_df.groupby('session')['bankroll'].last()
+        print_results_summary(session_final_bankrolls(results_df), args.starting_stake)
         
-        print(f"Average final bankroll: ${final_bankrolls.mean():.2f}")
-        print(f"Median final bankroll: ${final_bankrolls.median():.2f}")
-        print(f"Maximum final bankroll: ${final_bankrolls.max():.2f}")
-        print(f"Minimum final bankroll: ${final_bankrolls.min():.2f}")
-        
-        # Calculate win/loss percentage
-        win_percentage = (final_bankrolls > args.starting_stake).mean() * 100
-        print(f"Sessions ending with profit: {win_percentage:.1f}%")
-        
-        # Calculate the additional outcome statistics
-        total_sessions = len(final_bankrolls)
-        doubled_count = sum(final_bankrolls >= 2 * args.starting_stake)
-        positive_count = sum((final_bankrolls < 2 * args.starting_stake) & (final_bankrolls > 0))
-        negative_count = sum(final_bankrolls < 0)
-        zero_count = sum(final_bankrolls == 0)
-        
-        print("\nSession Outcome Distribution:")
-        print(f"Doubled starting stake: {doubled_count} ({doubled_count/total_sessions*100:.1f}%)")
-        print(f"Positive but not doubled: {positive_count} ({positive_count/total_sessions*100:.1f}%)")
-        print(f"Negative but not zero: {negative_count} ({negative_count/total_sessions*100:.1f}%)")
-        print(f"Zero bankroll: {zero_count} ({zero_count/total_sessions*100:.1f}%)")
+        if args.profile:
+            # Report where the time went in each worker and overall
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+            profile_file = os.path.join(output_dir, f"{timestamp}_profile.json")
+            total_profile = simulator.total_profile()
+            with open(profile_file, 'w') as f:
+                json.dump({
+                    "total": total_profile.to_dict(),
+                    "workers": [profile.to_dict() for profile in simulator.worker_profiles.values()]
+                }, f, indent=2)
+            
+            if len(simulator.worker_profiles) > 1:
+                for profile in simulator.worker_profiles.values():
+                    print(f"\nProfile of worker {profile.worker}:")
+                    print(profile.report())
+            print("\nProfile:")
+            print(total_profile.report())
+            print(f"Profile saved to {profile_file}")
 
 if __name__ == "__main__":
     main()
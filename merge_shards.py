@@ -0,0 +1,69 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+from modules.plotting import plot_results
+from modules.results import ResultStore
+from modules.shards import load_shards, load_shard_results, load_shard_summary
+from blackjack_sim import print_results_summary, print_summary
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Merge the shards of a sharded blackjack simulation')
+    parser.add_argument('shard_dir', type=str,
+                        help='Directory the shards were saved to with --shard_dir')
+    parser.add_argument('--output_dir', type=str, default='output',
+                        help='Directory to save the merged results, plots and summary to (default: output)')
+    return parser.parse_args()
+
+def main():
+    """Check that the shards cover every session exactly once and save the merged run"""
+    args = parse_args()
+    try:
+        shards = load_shards(args.shard_dir)
+    except ValueError as error:
+        sys.exit(f"Can't merge shards: {error}")
+    run = shards[0][0]["args"]
+    num_sessions, num_hands, starting_stake = run["num_sessions"], run["num_hands"], run["starting_stake"]
+    print(f"Merging {len(shards)} shards of a simulation with {num_sessions} sessions of {num_hands} hands each")
+    print(f"Starting stake: ${starting_stake:.2f}, Standard bet: ${run['standard_bet']:.2f}")
+    print(f"Engine: {run['engine']}, Seed: {run['seed']}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+
+    # Merge the shards' summary accumulators in session order
+    summary = load_shard_summary(shards[0][1])
+    for _, base in shards[1:]:
+        summary.merge(load_shard_summary(base))
+
+    if not run["summary_only"]:
+        results = ResultStore(num_sessions, num_hands)
+        try:
+            for manifest, base in shards:
+                results.add_rows(*load_shard_results(manifest, base))
+        except ValueError as error:
+            sys.exit(f"Can't merge shards: {error}")
+        results_df = results.to_dataframe()
+
+        results_file = os.path.join(args.output_dir, f"{timestamp}_simulation_results.csv")
+        results_df.to_csv(results_file, index=False)
+        print(f"Simulation results saved to {results_file}")
+
+        plot_results(
+            results_df, starting_stake, num_hands, args.output_dir, run["plot_mode"], run["plot_sample"], run["plot_points"]
+        )
+
+        print("\nSummary Statistics:")
+        print_results_summary(results.final_bankrolls(), starting_stake)
+    else:
+        print("\nSummary Statistics:")
+        print_summary(summary)
+
+    summary_file = os.path.join(args.output_dir, f"{timestamp}_summary.json")
+    with open(summary_file, 'w') as f:
+        json.dump(summary.to_dict(), f, indent=2)
+    print(f"Summary saved to {summary_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from modules.house_edge import ANALYSIS_VERSION, HouseEdgeCalculator
+from modules.result_cache import distribution_key
+from modules.vector_engine import VectorEngine
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def exact_payout_distribution(strategy, cache=None, num_decks=6):
+    """Compute the exact distribution of the net payout of a round, reusing it from a ResultCache if given
+
+    The analysis takes tens of seconds, so the distribution is stored by
+    the strategy file's contents, the number of decks and ANALYSIS_VERSION.
+
+    Returns:
+        dict: {net payout in units of the bet: probability}, sorted by payout
+    """
+    key = distribution_key(strategy.strategy_file, num_decks, ANALYSIS_VERSION)
+    distribution = cache.load_distribution(key) if cache is not None else None
+    if distribution is None:
+        distribution = HouseEdgeCalculator(strategy, num_decks, distributions=True).round_distribution()
+        if cache is not None:
+            cache.store_distribution(key, distribution)
+    return distribution
+
+def simulated_payout_distribution(strategy, num_rounds, rng, hands_per_session=1000):
+    """Estimate the distribution of the net payout of a round by simulation
+
+    Plays num_rounds rounds with the vector engine at a $1 bet and a bankroll
+    large enough never to run out, so every round is played at the full bet.
+
+    Returns:
+        dict: {net payout in units of the bet: probability}, sorted by payout
+    """
+    num_sessions = max(1, -(-num_rounds // hands_per_session))
+    engine = VectorEngine(strategy, 1e9, 1, hands_per_session)
+    _, hands, bankrolls = engine.run(num_sessions, rng)
+    payouts = np.diff(bankrolls)[hands[1:] > 0]
+    values, counts = np.unique(payouts, return_counts=True)
+    return dict(zip(values.tolist(), (counts / counts.sum()).tolist()))
+
+class BankrollSolver:
+    """Markov chain over bankroll states for a session of independent rounds
+
+    Bankrolls live on a grid of half bets starting from the stake. Each hand
+    moves the probability of every live bankroll by the per-round payout
+    distribution; bankrolls at or below zero, or at or above twice the
+    stake, are absorbing, as in BlackjackSimulator.run_session. A bankroll
+    below the standard bet plays a smaller bet, as BlackjackGame does, with
+    its payouts rounded to the grid. Rounds are treated as independent;
+    doubles and splits the bankroll couldn't fund are approximated by
+    capping every loss at the bankroll, so sessions end at zero rather than
+    below it, as they do in the simulation.
+    """
+
+    def __init__(self, payout_distribution, starting_stake, standard_bet):
+        self.starting_stake = starting_stake
+        self.standard_bet = standard_bet
+        self.step = standard_bet / 2
+        self.payouts = np.array(list(payout_distribution), dtype=np.float64)
+        self.probabilities = np.array(list(payout_distribution.values()), dtype=np.float64)
+        self.probabilities /= self.probabilities.sum()
+        self.shifts = np.round(self.payouts * 2).astype(np.int64)
+
+        # Grid index k is a bankroll of starting_stake + k * step, offset so indexes start at 0
+        low = int(np.floor(-starting_stake / self.step)) + 1
+        high = int(np.ceil(starting_stake / self.step)) - 1
+        self.offset = -low - min(self.shifts.min(), 0) + 1
+        self.live = slice(low + self.offset, high + self.offset + 1)
+        self.size = high + self.offset + max(self.shifts.max(), 0) + 2
+        self.values = starting_stake + (np.arange(self.size) - self.offset) * self.step
+        # Losses are capped at the bankroll, so everything at or below zero is a zero bankroll
+        self.zero = int(np.flatnonzero(self.values <= 0)[-1])
+        self.values[:self.zero + 1] = 0
+
+        # Live bankrolls that can't cover the standard bet play the whole bankroll
+        live = np.arange(self.size)[self.live]
+        partial = live[self.values[live] < standard_bet]
+        self.full = slice(partial.max() + 1 if partial.size else self.live.start, self.live.stop)
+
+        # Bankrolls playing the full bet all move by the same shifts, so a hand convolves them with one kernel
+        self.kernel_start = int(self.shifts.min())
+        self.kernel = np.zeros(int(self.shifts.max()) - self.kernel_start + 1)
+        np.add.at(self.kernel, self.shifts - self.kernel_start, self.probabilities)
+        # Partial bets scale every payout by the bankroll: one (source, target, probability) transition per pair
+        self.partial_sources = np.repeat(partial, len(self.payouts))
+        self.partial_targets = self._index(self.values[self.partial_sources] * (1 + np.tile(self.payouts, len(partial))))
+        self.partial_probabilities = np.tile(self.probabilities, len(partial))
+        self.targets = np.array(PERCENTILES) / 100 - 1e-12
+
+    def _index(self, bankrolls):
+        indexes = np.round((bankrolls - self.starting_stake) / self.step).astype(np.int64) + self.offset
+        return np.clip(indexes, 0, self.size - 1)
+
+    def _advance(self, distribution):
+        """Play one hand from every live bankroll"""
+        result = distribution.copy()
+        result[self.live] = 0
+        live = distribution[self.full]
+        start = self.full.start + self.kernel_start
+        result[start:start + live.size + self.kernel.size - 1] += np.convolve(live, self.kernel)
+        np.add.at(result, self.partial_targets, self.partial_probabilities * distribution[self.partial_sources])
+        result[self.zero] += result[:self.zero].sum()
+        result[:self.zero] = 0
+        return result
+
+    def percentiles(self, distribution):
+        """Return the bankroll at each of PERCENTILES for a distribution over the grid"""
+        cumulative = np.cumsum(distribution)
+        indexes = np.searchsorted(cumulative, self.targets)
+        return self.values[np.minimum(indexes, self.size - 1)]
+
+    def solve(self, num_hands):
+        """Compute the distribution of the bankroll over a session of num_hands hands
+
+        Returns:
+            tuple: (dict of final outcome probabilities, DataFrame of the bankroll
+                percentiles before the first hand and after each hand)
+        """
+        distribution = np.zeros(self.size)
+        distribution[self.offset] = 1
+        curve = np.empty((num_hands + 1, len(PERCENTILES)))
+        curve[0] = self.percentiles(distribution)
+        for hand in range(1, num_hands + 1):
+            distribution = self._advance(distribution)
+            curve[hand] = self.percentiles(distribution)
+
+        values = self.values
+        double = 2 * self.starting_stake
+        outcomes = {
+            'doubled': distribution[values >= double].sum(),
+            'positive': distribution[(values > 0) & (values < double)].sum(),
+            'negative': distribution[values < 0].sum(),
+            'zero': distribution[values == 0].sum(),
+            'profit': distribution[values > self.starting_stake].sum(),
+            'mean': (distribution * values).sum()
+        }
+        percentiles = pd.DataFrame(
+            curve,
+            index=pd.Index(range(num_hands + 1), name='hand'),
+            columns=[f"p{percentile}" for percentile in PERCENTILES]
+        )
+        return outcomes, percentiles
@@ -1,5 +1,5 @@
 from enum import Enum
-import random
+import numpy as np
 
 class Suit(Enum):
     HEARTS = "Hearts"
@@ -7,62 +7,112 @@ class Suit(Enum):
     CLUBS = "Clubs"
     SPADES = "Spades"
 
+# Cards are encoded as small integers: code = suit index * 13 + rank code,
+# where the rank code (0-12) indexes RANKS. The suit is only decoded for display.
+RANKS = ("2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K", "A")
+RANK_VALUES = (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11)
+SUITS = tuple(Suit)
+
+DECK_CODES = tuple(range(len(SUITS) * len(RANKS)))
+CARD_RANKS = tuple(code % len(RANKS) for code in DECK_CODES)
+CARD_VALUES = tuple(RANK_VALUES[rank] for rank in CARD_RANKS)  # Ace counts 11 (adjusted as needed)
+ACE = RANKS.index("A")
+
+def card_code(value, suit):
+    """Encode a card value ("2"-"9", "T", "J", "Q", "K", "A") and suit as an integer"""
+    return SUITS.index(suit) * len(RANKS) + RANKS.index(value)
+
+def card_str(code):
+    """Format a card code for display, e.g. "TH" for the ten of hearts"""
+    return f"{RANKS[CARD_RANKS[code]]}{SUITS[code // len(RANKS)].name[0]}"
+
 class Card:
     def __init__(self, value, suit):
         self.value = value
         self.suit = suit
+        self.code = card_code(value, suit)
+        
+    @classmethod
+    def from_code(cls, code):
+        """Materialize a Card from its integer code"""
+        return cls(RANKS[CARD_RANKS[code]], SUITS[code // len(RANKS)])
         
     def get_numerical_value(self):
-        if self.value in ["J", "Q", "K", "T"]:
-            return 10
-        elif self.value == "A":
-            return 11  # Ace's default value (will be adjusted as needed)
-        else:
-            return int(self.value)
+        return CARD_VALUES[self.code]
             
     def __str__(self):
-        return f"{self.value}{self.suit.name[0]}"
+        return card_str(self.code)
     
     def __repr__(self):
         return self.__str__()
 
 class Shoe:
-    def __init__(self, num_decks=6):
+    """A shoe of card codes read from a cursor, so drawing never moves or allocates cards
+    
+    Every shuffled shoe is a permutation of an immutable template of card
+    codes. The shoe's NumPy Generator permutes batch_size copies of the
+    template in one call, and the batch is kept as a single bytes object
+    that initialize steps through, so a reshuffle allocates nothing until
+    the batch runs out.
+    """
+    
+    def __init__(self, num_decks=6, rng=None, batch_size=16):
         self.num_decks = num_decks
-        self.cards = []
+        self.rng = rng if rng is not None else np.random.default_rng()  # A NumPy Generator
+        self.batch_size = batch_size
+        self.template = np.tile(np.array(DECK_CODES, dtype=np.uint8), num_decks)
+        self.template.flags.writeable = False
+        self.batch = b""
+        self.next_shoe = batch_size  # Index in the batch of the next shoe; batch_size means shuffle a new batch
+        self.cards = b""
+        self.position = 0
+        self.end = 0
         self.initialize()
         
     def initialize(self):
-        """Initialize the shoe with the specified number of decks and shuffle"""
-        self.cards = []
-        values = ["2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K", "A"]
-        
-        for _ in range(self.num_decks):
-            for suit in Suit:
-                for value in values:
-                    self.cards.append(Card(value, suit))
-        
-        self.shuffle()
+        """Start the next freshly shuffled shoe with the specified number of decks"""
+        size = len(self.template)
+        if self.next_shoe >= self.batch_size:
+            copies = np.broadcast_to(self.template, (self.batch_size, size))
+            self.batch = self.rng.permuted(copies, axis=1).tobytes()
+            self.next_shoe = 0
+        self.cards = self.batch
+        self.position = self.next_shoe * size
+        self.end = self.position + size
+        self.next_shoe += 1
         
     def shuffle(self):
-        """Shuffle the cards in the shoe"""
-        random.shuffle(self.cards)
+        """Shuffle the cards remaining in the shoe"""
+        remaining = np.frombuffer(self.cards, dtype=np.uint8)[self.position:self.end]
+        self.cards = self.rng.permutation(remaining).tobytes()
+        self.position = 0
+        self.end = len(self.cards)
         
     def draw_card(self):
-        """Draw a card from the top of the shoe"""
-        if not self.cards:
+        """Draw a card code from the top of the shoe"""
+        position = self.position
+        if position >= self.end:
             raise ValueError("No cards left in the shoe")
-        return self.cards.pop(0)
+        self.position = position + 1
+        return self.cards[position]
         
     def should_reshuffle(self):
         """Check if the shoe should be reshuffled (less than 10% cards remain)"""
-        return len(self.cards) < (self.num_decks * 52 * 0.1)
+        return self.end - self.position < (self.num_decks * 52 * 0.1)
     
     def cards_remaining(self):
         """Return the number of cards remaining in the shoe"""
-        return len(self.cards)
+        return self.end - self.position
+    
+    def clear(self):
+        """Remove all cards from the shoe"""
+        self.cards = b""
+        self.position = 0
+        self.end = 0
     
     def insert_cards(self, cards):
-        """Insert specific cards at the beginning of the shoe (for testing)"""
-        for card in reversed(cards):
-            self.cards.insert(0, card)
+        """Insert specific cards (Card objects or codes) at the beginning of the shoe (for testing)"""
+        codes = bytes(card.code if isinstance(card, Card) else card for card in cards)
+        self.cards = codes + self.cards[self.position:self.end]
+        self.position = 0
+        self.end = len(self.cards)
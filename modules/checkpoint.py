@@ -0,0 +1,53 @@
+import os
+import pickle
+import time
+
+CHECKPOINT_VERSION = 1
+
+def read_checkpoint(path, payload=True):
+    """Return (header, payload) of a checkpoint file; the payload is None unless requested
+
+    The header holds the run's arguments (with its seed) and the number of
+    sessions completed, and can be read without loading the payload.
+    """
+    with open(path, "rb") as f:
+        header = pickle.load(f)
+        if header.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} is not a version {CHECKPOINT_VERSION} checkpoint")
+        return header, pickle.load(f) if payload else None
+
+class Checkpointer:
+    """Saves a run's progress every so many sessions or seconds
+
+    A checkpoint is a header pickle followed by a payload pickle holding the
+    completed sessions' results or summary accumulators. Sessions are seeded
+    from the master seed and their session number, so the seed and the
+    number of sessions completed are all the random state a resumed run
+    needs. Files are written to a temporary file, synced and renamed, so a
+    crash never leaves a partial checkpoint behind.
+    """
+
+    def __init__(self, path, args, every_sessions, every_seconds):
+        self.path = path
+        self.args = args
+        self.every_sessions = every_sessions
+        self.every_seconds = every_seconds
+        self.saved_sessions = 0
+        self.saved_at = time.monotonic()
+
+    def due(self, sessions):
+        """Whether a checkpoint should be written now that sessions are complete"""
+        return (sessions - self.saved_sessions >= self.every_sessions
+                or time.monotonic() - self.saved_at >= self.every_seconds)
+
+    def save(self, sessions, payload):
+        header = {"version": CHECKPOINT_VERSION, "args": self.args, "sessions": sessions}
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump(header, f)
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self.saved_sessions = sessions
+        self.saved_at = time.monotonic()
@@ -0,0 +1,93 @@
+import os
+import numpy as np
+import pandas as pd
+from modules.stats import mean_interval, ratio_interval, paired_ratio_difference
+
+class StrategyComparison:
+    """Paired results of several strategies played on the same shoes
+
+    finals and hands hold each session's final bankroll and number of hands
+    played, one column per strategy. Since every strategy's session n sees
+    the same sequence of shuffled shoes, differences are taken session by
+    session, which cancels most of the shoe noise that independent runs
+    would carry.
+    """
+
+    def __init__(self, strategy_files, finals, hands, starting_stake, standard_bet, confidence=0.95):
+        self.strategy_files = list(strategy_files)
+        self.names = [os.path.splitext(os.path.basename(path))[0] for path in strategy_files]
+        self.finals = np.asarray(finals, dtype=np.float64)
+        self.hands = np.asarray(hands, dtype=np.float64)
+        self.starting_stake = starting_stake
+        self.standard_bet = standard_bet
+        self.confidence = confidence
+
+    def _doubled(self, index):
+        return (self.finals[:, index] >= 2 * self.starting_stake).astype(np.float64)
+
+    def _net_bets(self, index):
+        return (self.finals[:, index] - self.starting_stake) / self.standard_bet
+
+    def summary(self):
+        """Return each strategy's mean final bankroll, doubling rate and EV per hand, with interval half widths"""
+        rows = []
+        for index, name in enumerate(self.names):
+            final, final_ci = mean_interval(self.finals[:, index], self.confidence)
+            doubled, doubled_ci = mean_interval(self._doubled(index), self.confidence)
+            ev, ev_ci = ratio_interval(self._net_bets(index), self.hands[:, index], self.confidence)
+            rows.append((name, final, final_ci, doubled, doubled_ci, ev, ev_ci))
+        columns = ["strategy", "final_bankroll", "final_bankroll_ci", "doubled", "doubled_ci", "ev_per_hand", "ev_per_hand_ci"]
+        return pd.DataFrame(rows, columns=columns).set_index("strategy")
+
+    def differences(self):
+        """Return the paired difference of every strategy from the first one
+
+        Includes the variance reduction of the final bankroll difference:
+        how many times more sessions independent runs would need for the
+        same interval.
+        """
+        rows = []
+        baseline = self.finals[:, 0]
+        for index, name in enumerate(self.names[1:], start=1):
+            final, final_ci = mean_interval(self.finals[:, index] - baseline, self.confidence)
+            doubled, doubled_ci = mean_interval(self._doubled(index) - self._doubled(0), self.confidence)
+            ev, ev_ci = paired_ratio_difference(
+                self._net_bets(0), self.hands[:, 0], self._net_bets(index), self.hands[:, index], self.confidence
+            )
+            paired_variance = np.var(self.finals[:, index] - baseline, ddof=1)
+            independent_variance = np.var(self.finals[:, index], ddof=1) + np.var(baseline, ddof=1)
+            reduction = independent_variance / paired_variance if paired_variance > 0 else np.inf
+            rows.append((f"{name} - {self.names[0]}", final, final_ci, doubled, doubled_ci, ev, ev_ci,
+                         reduction, abs(ev) > ev_ci))
+        columns = ["comparison", "final_bankroll", "final_bankroll_ci", "doubled", "doubled_ci",
+                   "ev_per_hand", "ev_per_hand_ci", "variance_reduction", "ev_significant"]
+        return pd.DataFrame(rows, columns=columns).set_index("comparison")
+
+    def to_dataframe(self):
+        """Return the per-session final bankroll and hands played of every strategy"""
+        data = {"session": np.arange(1, len(self.finals) + 1)}
+        for index, name in enumerate(self.names):
+            data[f"{name}_final_bankroll"] = self.finals[:, index]
+            data[f"{name}_hands"] = self.hands[:, index].astype(np.int64)
+        return pd.DataFrame(data)
+
+    def report(self):
+        """Format the summary and paired differences for printing"""
+        level = f"{self.confidence:.0%}"
+        lines = [f"Strategies ({len(self.finals)} sessions each, same shoes, ± {level} confidence interval):"]
+        for name, row in self.summary().iterrows():
+            lines.append(
+                f"  {name}: final bankroll ${row.final_bankroll:.2f} ± {row.final_bankroll_ci:.2f}, "
+                f"doubled {row.doubled * 100:.2f}% ± {row.doubled_ci * 100:.2f}, "
+                f"EV per hand {row.ev_per_hand * 100:.3f}% ± {row.ev_per_hand_ci * 100:.3f}"
+            )
+        lines.append(f"\nPaired differences (± {level} confidence interval):")
+        for name, row in self.differences().iterrows():
+            verdict = "significant" if row.ev_significant else "not significant"
+            lines.append(
+                f"  {name}: final bankroll ${row.final_bankroll:+.2f} ± {row.final_bankroll_ci:.2f}, "
+                f"doubled {row.doubled * 100:+.2f}% ± {row.doubled_ci * 100:.2f}, "
+                f"EV per hand {row.ev_per_hand * 100:+.3f}% ± {row.ev_per_hand_ci * 100:.3f} ({verdict})"
+            )
+            lines.append(f"    Variance reduction vs independent runs: {row.variance_reduction:.1f}x fewer sessions needed")
+        return "\n".join(lines)
@@ -0,0 +1,191 @@
+import json
+from modules.card import card_str
+from modules.hand import Hand
+
+# Event kinds and the names of their fields, after the session and round every event carries.
+# Hands are recorded as tuples of card codes and only formatted when an event is rendered.
+SESSION_START = "session_start"
+SESSION_END = "session_end"
+ROUND_START = "round_start"
+ROUND_END = "round_end"
+RESHUFFLE = "reshuffle"
+BET = "bet"
+DEAL = "deal"
+DEALER_BLACKJACK = "dealer_blackjack"
+ACTION = "action"
+HIT = "hit"
+DOUBLE = "double"
+SPLIT = "split"
+SURRENDER = "surrender"
+FALLBACK = "fallback"
+SPLIT_ACES = "split_aces"
+DEALER_START = "dealer_start"
+DEALER_HIT = "dealer_hit"
+DEALER_SKIP = "dealer_skip"
+OUTCOME = "outcome"
+
+EVENT_FIELDS = {
+    SESSION_START: ("bankroll",),
+    SESSION_END: ("bankroll", "reason"),
+    ROUND_START: ("bankroll",),
+    ROUND_END: ("change", "bankroll"),
+    RESHUFFLE: (),
+    BET: ("amount", "bankroll"),
+    DEAL: ("player", "upcard"),
+    DEALER_BLACKJACK: ("dealer",),
+    ACTION: ("action", "player"),
+    HIT: ("player",),
+    DOUBLE: ("player", "bet"),
+    SPLIT: ("first", "second"),
+    SURRENDER: ("refund",),
+    FALLBACK: ("action", "instead"),
+    SPLIT_ACES: ("player",),
+    DEALER_START: ("dealer",),
+    DEALER_HIT: ("dealer",),
+    DEALER_SKIP: (),
+    OUTCOME: ("outcome", "payout", "bankroll")
+}
+
+FALLBACK_TEXT = {"D": "double", "B": "double", "P": "split", "X": "surrender", "U": "surrender"}
+SESSION_END_TEXT = {"depleted": "Bankroll depleted. Ending session.", "doubled": "Bankroll doubled! Ending session."}
+
+def hand_str(cards):
+    return str(Hand(cards))
+
+def render(event):
+    """Format an event as the human-readable text of verbose mode"""
+    kind, session, round_number, *fields = event
+    if kind == SESSION_START:
+        return f"\n=== Starting Session {session} ===\n"
+    if kind == SESSION_END:
+        bankroll, reason = fields
+        lines = [SESSION_END_TEXT[reason]] if reason in SESSION_END_TEXT else []
+        lines += [f"\n=== Session {session} Complete ===", f"Final bankroll: ${bankroll:.2f}"]
+        return "\n".join(lines)
+    if kind == ROUND_START:
+        return f"\n--- Hand {round_number} ---\n"
+    if kind == ROUND_END:
+        change, bankroll = fields
+        return f"Round complete. Bankroll change: ${change:.2f}, New bankroll: ${bankroll:.2f}"
+    if kind == RESHUFFLE:
+        return "Reshuffling the shoe"
+    if kind == BET:
+        amount, bankroll = fields
+        return f"Placed bet: ${amount:.2f}, Bankroll: ${bankroll:.2f}"
+    if kind == DEAL:
+        player, upcard = fields
+        return f"Player's initial hand: {hand_str(player)}\nDealer's up card: {card_str(upcard)}"
+    if kind == DEALER_BLACKJACK:
+        return f"Dealer has blackjack: {hand_str(fields[0])}"
+    if kind == ACTION:
+        action, player = fields
+        return f"Player action: {action} on hand {hand_str(player)}"
+    if kind == HIT:
+        return f"Hit: New hand: {hand_str(fields[0])}"
+    if kind == DOUBLE:
+        player, bet = fields
+        return f"Double: New hand: {hand_str(player)}, Bet: ${bet:.2f}"
+    if kind == SPLIT:
+        first, second = fields
+        return f"Split: First hand: {hand_str(first)}\nSplit: Second hand: {hand_str(second)}"
+    if kind == SURRENDER:
+        return f"Surrender: Refund: ${fields[0]:.2f}"
+    if kind == FALLBACK:
+        action, instead = fields
+        return f"Cannot {FALLBACK_TEXT[action]}, {instead} instead"
+    if kind == SPLIT_ACES:
+        return f"Split aces - only one card allowed: {hand_str(fields[0])}"
+    if kind == DEALER_START:
+        return f"Dealer's initial hand: {hand_str(fields[0])}"
+    if kind == DEALER_HIT:
+        return f"Dealer hits: {hand_str(fields[0])}"
+    if kind == DEALER_SKIP:
+        return "Dealer doesn't need to play"
+    if kind == OUTCOME:
+        outcome, payout, bankroll = fields
+        return f"Outcome: {outcome}, Payout: ${payout:.2f}, New bankroll: ${bankroll:.2f}"
+    raise ValueError(f"Unknown event kind: {kind}")
+
+def to_record(event):
+    """Convert an event to a dict with named fields, as written to JSONL"""
+    kind, session, round_number, *fields = event
+    record = {"event": kind, "session": session, "round": round_number}
+    record.update(zip(EVENT_FIELDS[kind], fields))
+    return record
+
+class EventRecorder:
+    """Callable that stamps events with the current session and round and appends them to an output
+
+    BlackjackGame and BlackjackSimulator hold an EventRecorder, or None when
+    nothing is being logged, so disabled logging costs one None check.
+    """
+    __slots__ = ("output", "session", "round")
+
+    def __init__(self, output, session=None):
+        self.output = output
+        self.session = session
+        self.round = None
+
+    def __call__(self, kind, *fields):
+        self.output.append((kind, self.session, self.round) + fields)
+
+class EventBuffer:
+    """Preallocated ring buffer of events
+
+    Keeps the last capacity events appended, counting the ones it drops;
+    with a capacity of 0 it keeps every event.
+    """
+
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.events = [None] * capacity
+        self.count = 0
+
+    def append(self, event):
+        if self.capacity:
+            self.events[self.count % self.capacity] = event
+        else:
+            self.events.append(event)
+        self.count += 1
+
+    @property
+    def dropped(self):
+        return max(0, self.count - self.capacity) if self.capacity else 0
+
+    def __len__(self):
+        return min(self.count, self.capacity) if self.capacity else self.count
+
+    def __iter__(self):
+        """Iterate over the kept events, oldest first"""
+        if not self.capacity or self.count <= self.capacity:
+            yield from self.events[:len(self)]
+        else:
+            start = self.count % self.capacity
+            yield from self.events[start:]
+            yield from self.events[:start]
+
+class EventSink:
+    """Destination for events: JSON lines in a file, rendered text on the console, and/or
+    a ring buffer of the most recent events to render on demand"""
+
+    def __init__(self, path=None, console=False, capacity=0):
+        self.file = open(path, "w") if path else None
+        self.console = console
+        self.recent = EventBuffer(capacity) if capacity else None
+
+    def append(self, event):
+        if self.recent is not None:
+            self.recent.append(event)
+        if self.file is not None:
+            self.file.write(json.dumps(to_record(event)) + "\n")
+        if self.console:
+            print(render(event))
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
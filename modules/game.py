@@ -1,12 +1,30 @@
+from modules.card import CARD_RANKS, ACE
 from modules.hand import Hand
+from modules.events import (
+    EventRecorder, EventSink, RESHUFFLE, BET, DEAL, DEALER_BLACKJACK, ACTION, HIT, DOUBLE, SPLIT,
+    SURRENDER, FALLBACK, SPLIT_ACES, DEALER_START, DEALER_HIT, DEALER_SKIP, OUTCOME, ROUND_END
+)
+
+# Outcome codes returned by evaluate_hand and play_round_fast, and their names
+OUTCOMES = (
+    "SURRENDER", "BUST", "WIN (dealer bust)", "BLACKJACK", "LOSE (dealer blackjack)", "WIN", "LOSE", "PUSH"
+)
+(OUTCOME_SURRENDER, OUTCOME_BUST, OUTCOME_DEALER_BUST, OUTCOME_BLACKJACK,
+ OUTCOME_DEALER_BLACKJACK, OUTCOME_WIN, OUTCOME_LOSE, OUTCOME_PUSH) = range(len(OUTCOMES))
 
 class BlackjackGame:
-    def __init__(self, strategy, shoe, bankroll, standard_bet, verbose=False):
+    def __init__(self, strategy, shoe, bankroll, standard_bet, verbose=False, events=None):
         self.strategy = strategy
         self.shoe = shoe
         self.bankroll = bankroll
         self.standard_bet = standard_bet
         self.verbose = verbose
+        # Event recorder for this round, or None when nothing is logged; verbose renders events as they happen
+        if events is None and verbose:
+            events = EventRecorder(EventSink(console=True))
+        self.events = events
+        # (initial bankroll, player hands, dealer hand, outcomes, payouts) of the last round, for round_details
+        self.last_round = None
         
     def place_bet(self, hand, bet_amount):
         """Place a bet on a hand and update bankroll"""
@@ -16,8 +34,8 @@ class BlackjackGame:
         hand.bet = bet_amount
         self.bankroll -= bet_amount
         
-        if self.verbose:
-            print(f"Placed bet: ${bet_amount:.2f}, Bankroll: ${self.bankroll:.2f}")
+        if self.events is not None:
+            self.events(BET, bet_amount, self.bankroll)
             
     def deal_initial_cards(self):
         """Deal the initial cards for a new round"""
@@ -33,21 +51,21 @@ class BlackjackGame:
         player_hand.add_card(self.shoe.draw_card())
         dealer_hand.add_card(self.shoe.draw_card())  # Dealer hole card
         
-        if self.verbose:
-            print(f"Player's initial hand: {player_hand}")
-            print(f"Dealer's up card: {dealer_hand.cards[0]}")
+        if self.events is not None:
+            self.events(DEAL, tuple(player_hand.cards), dealer_hand.cards[0])
             
         return player_hand, dealer_hand
     
     def execute_player_action(self, action, player_hand, dealer_upcard, player_hands):
         """Execute the player's action based on the strategy"""
-        if self.verbose:
-            print(f"Player action: {action} on hand {player_hand}")
+        events = self.events
+        if events is not None:
+            events(ACTION, action, tuple(player_hand.cards))
             
         if action == "H":  # Hit
             player_hand.add_card(self.shoe.draw_card())
-            if self.verbose:
-                print(f"Hit: New hand: {player_hand}")
+            if events is not None:
+                events(HIT, tuple(player_hand.cards))
             
         elif action == "D":  # Double (or Stand if can't)
             if player_hand.can_double() and self.bankroll >= player_hand.bet:
@@ -59,12 +77,12 @@ class BlackjackGame:
                 
                 # Take exactly one more card
                 player_hand.add_card(self.shoe.draw_card())
-                if self.verbose:
-                    print(f"Double: New hand: {player_hand}, Bet: ${player_hand.bet:.2f}")
+                if events is not None:
+                    events(DOUBLE, tuple(player_hand.cards), player_hand.bet)
             else:
                 # Stand if can't double
-                if self.verbose:
-                    print("Cannot double, standing instead")
+                if events is not None:
+                    events(FALLBACK, action, "standing")
                 # No action needed for stand
             
         elif action == "P":  # Split
@@ -72,11 +90,11 @@ class BlackjackGame:
                 player_hand.split = True
                 
                 # Create a new hand with the second card
-                new_hand = Hand([player_hand.cards.pop()])
+                new_hand = Hand([player_hand.pop_card()])
                 new_hand.is_split_hand = True
                 
                 # Mark if splitting aces
-                if player_hand.cards[0].value == "A":
+                if CARD_RANKS[player_hand.cards[0]] == ACE:
                     player_hand.is_split_aces = True
                     new_hand.is_split_aces = True
                 
@@ -90,16 +108,15 @@ class BlackjackGame:
                 # Add the new hand to the list of player hands
                 player_hands.append(new_hand)
                 
-                if self.verbose:
-                    print(f"Split: First hand: {player_hand}")
-                    print(f"Split: Second hand: {new_hand}")
+                if events is not None:
+                    events(SPLIT, tuple(player_hand.cards), tuple(new_hand.cards))
             else:
                 # Hit if can't split
-                if self.verbose:
-                    print("Cannot split, hitting instead")
+                if events is not None:
+                    events(FALLBACK, action, "hitting")
                 player_hand.add_card(self.shoe.draw_card())
-                if self.verbose:
-                    print(f"Hit: New hand: {player_hand}")
+                if events is not None:
+                    events(HIT, tuple(player_hand.cards))
             
         elif action == "X":  # Surrender (or Hit if can't)
             if player_hand.can_surrender():
@@ -107,15 +124,15 @@ class BlackjackGame:
                 # Return half the bet
                 refund = player_hand.bet / 2
                 self.bankroll += refund
-                if self.verbose:
-                    print(f"Surrender: Refund: ${refund:.2f}")
+                if events is not None:
+                    events(SURRENDER, refund)
             else:
                 # Hit if can't surrender
-                if self.verbose:
-                    print("Cannot surrender, hitting instead")
+                if events is not None:
+                    events(FALLBACK, action, "hitting")
                 player_hand.add_card(self.shoe.draw_card())
-                if self.verbose:
-                    print(f"Hit: New hand: {player_hand}")
+                if events is not None:
+                    events(HIT, tuple(player_hand.cards))
             
         elif action == "B":  # Double (or Hit if can't)
             if player_hand.can_double() and self.bankroll >= player_hand.bet:
@@ -127,15 +144,15 @@ class BlackjackGame:
                 
                 # Take exactly one more card
                 player_hand.add_card(self.shoe.draw_card())
-                if self.verbose:
-                    print(f"Double: New hand: {player_hand}, Bet: ${player_hand.bet:.2f}")
+                if events is not None:
+                    events(DOUBLE, tuple(player_hand.cards), player_hand.bet)
             else:
                 # Hit if can't double
-                if self.verbose:
-                    print("Cannot double, hitting instead")
+                if events is not None:
+                    events(FALLBACK, action, "hitting")
                 player_hand.add_card(self.shoe.draw_card())
-                if self.verbose:
-                    print(f"Hit: New hand: {player_hand}")
+                if events is not None:
+                    events(HIT, tuple(player_hand.cards))
             
         elif action == "U":  # Surrender (or Stand if can't)
             if player_hand.can_surrender():
@@ -143,12 +160,12 @@ class BlackjackGame:
                 # Return half the bet
                 refund = player_hand.bet / 2
                 self.bankroll += refund
-                if self.verbose:
-                    print(f"Surrender: Refund: ${refund:.2f}")
+                if events is not None:
+                    events(SURRENDER, refund)
             else:
                 # Stand if can't surrender
-                if self.verbose:
-                    print("Cannot surrender, standing instead")
+                if events is not None:
+                    events(FALLBACK, action, "standing")
                 # No action needed for stand
         
         # For Stand (S), no action is needed
@@ -165,8 +182,8 @@ class BlackjackGame:
             
             # For split aces, deal only one card per hand and move on
             if current_hand.is_split_aces:
-                if self.verbose:
-                    print(f"Split aces - only one card allowed: {current_hand}")
+                if self.events is not None:
+                    self.events(SPLIT_ACES, tuple(current_hand.cards))
                 current_hand_index += 1
                 continue
             
@@ -188,8 +205,8 @@ class BlackjackGame:
     
     def play_dealer_hand(self, dealer_hand):
         """Play the dealer's hand according to the rules"""
-        if self.verbose:
-            print(f"Dealer's initial hand: {dealer_hand}")
+        if self.events is not None:
+            self.events(DEALER_START, tuple(dealer_hand.cards))
             
         # Keep hitting until the dealer has at least a hard 17 or busts
         while True:
@@ -201,56 +218,69 @@ class BlackjackGame:
                 break
                 
             dealer_hand.add_card(self.shoe.draw_card())
-            if self.verbose:
-                print(f"Dealer hits: {dealer_hand}")
+            if self.events is not None:
+                self.events(DEALER_HIT, tuple(dealer_hand.cards))
                 
         return dealer_hand
     
     def evaluate_hand(self, player_hand, dealer_hand):
-        """Evaluate the outcome of a hand and adjust the bankroll"""
+        """Evaluate the outcome of a hand and adjust the bankroll
+        
+        Returns:
+            tuple: (outcome code, an index into OUTCOMES; payout)
+        """
         if player_hand.surrendered:
             # Already handled the bankroll adjustment during surrender
-            outcome = "SURRENDER"
+            outcome = OUTCOME_SURRENDER
             payout = -player_hand.bet / 2
         elif player_hand.is_busted():
-            outcome = "BUST"
+            outcome = OUTCOME_BUST
             payout = -player_hand.bet
         elif dealer_hand.is_busted():
-            outcome = "WIN (dealer bust)"
+            outcome = OUTCOME_DEALER_BUST
             payout = player_hand.bet
             self.bankroll += player_hand.bet * 2  # Original bet + winnings
         elif player_hand.is_blackjack() and not dealer_hand.is_blackjack():
-            outcome = "BLACKJACK"
+            outcome = OUTCOME_BLACKJACK
             payout = player_hand.bet * 1.5
             self.bankroll += player_hand.bet + (player_hand.bet * 1.5)  # Original bet + BJ payout
         elif dealer_hand.is_blackjack() and not player_hand.is_blackjack():
-            outcome = "LOSE (dealer blackjack)"
+            outcome = OUTCOME_DEALER_BLACKJACK
             payout = -player_hand.bet
         elif player_hand.get_value() > dealer_hand.get_value():
-            outcome = "WIN"
+            outcome = OUTCOME_WIN
             payout = player_hand.bet
             self.bankroll += player_hand.bet * 2  # Original bet + winnings
         elif player_hand.get_value() < dealer_hand.get_value():
-            outcome = "LOSE"
+            outcome = OUTCOME_LOSE
             payout = -player_hand.bet
         else:
-            outcome = "PUSH"
+            outcome = OUTCOME_PUSH
             payout = 0
             self.bankroll += player_hand.bet  # Return the original bet
             
-        if self.verbose:
-            print(f"Outcome: {outcome}, Payout: ${payout:.2f}, New bankroll: ${self.bankroll:.2f}")
+        if self.events is not None:
+            self.events(OUTCOME, OUTCOMES[outcome], payout, self.bankroll)
             
         return outcome, payout
     
     def play_round(self):
-        """Play a complete round of blackjack"""
+        """Play a complete round of blackjack and return a detailed record of it"""
+        self.play_round_fast()
+        return self.round_details()
+    
+    def play_round_fast(self):
+        """Play a complete round of blackjack without building any per-hand records
+        
+        Returns:
+            tuple: (net change in bankroll, list of the outcome code of each player hand)
+        """
         initial_bankroll = self.bankroll
         
         # Check if we need to reshuffle
         if self.shoe.should_reshuffle():
-            if self.verbose:
-                print("Reshuffling the shoe")
+            if self.events is not None:
+                self.events(RESHUFFLE)
             self.shoe.initialize()
             
         # Deal initial cards
@@ -258,8 +288,8 @@ class BlackjackGame:
         
         # Check for dealer blackjack
         dealer_has_blackjack = dealer_hand.is_blackjack()
-        if dealer_has_blackjack and self.verbose:
-            print(f"Dealer has blackjack: {dealer_hand}")
+        if dealer_has_blackjack and self.events is not None:
+            self.events(DEALER_BLACKJACK, tuple(dealer_hand.cards))
             
         # Play the player's hand(s)
         player_hands = self.play_player_hand(player_hand, dealer_hand.cards[0])
@@ -268,30 +298,42 @@ class BlackjackGame:
         active_player_hands = [h for h in player_hands if not h.is_busted() and not h.surrendered]
         if active_player_hands and not dealer_has_blackjack:
             dealer_hand = self.play_dealer_hand(dealer_hand)
-        elif self.verbose:
-            print("Dealer doesn't need to play")
+        elif self.events is not None:
+            self.events(DEALER_SKIP)
             
         # Evaluate each player hand
-        results = []
+        outcomes = []
+        payouts = []
         for hand in player_hands:
             outcome, payout = self.evaluate_hand(hand, dealer_hand)
+            outcomes.append(outcome)
+            payouts.append(payout)
+        self.last_round = (initial_bankroll, player_hands, dealer_hand, outcomes, payouts)
+            
+        # Calculate the net change in bankroll
+        bankroll_change = self.bankroll - initial_bankroll
+        
+        if self.events is not None:
+            self.events(ROUND_END, bankroll_change, self.bankroll)
+            
+        return bankroll_change, outcomes
+    
+    def round_details(self):
+        """Build the detailed record of the last round played, formatting its hands"""
+        initial_bankroll, player_hands, dealer_hand, outcomes, payouts = self.last_round
+        results = []
+        for hand, outcome, payout in zip(player_hands, outcomes, payouts):
             results.append({
                 "player_hand": str(hand),
                 "dealer_hand": str(dealer_hand),
                 "bet": hand.bet,
-                "outcome": outcome,
+                "outcome": OUTCOMES[outcome],
                 "payout": payout
             })
             
-        # Calculate the net change in bankroll
-        bankroll_change = self.bankroll - initial_bankroll
-        
-        if self.verbose:
-            print(f"Round complete. Bankroll change: ${bankroll_change:.2f}, New bankroll: ${self.bankroll:.2f}")
-            
         return {
             "initial_bankroll": initial_bankroll,
             "final_bankroll": self.bankroll,
-            "change": bankroll_change,
+            "change": self.bankroll - initial_bankroll,
             "results": results
         }
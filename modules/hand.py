@@ -1,65 +1,79 @@
+from modules.card import CARD_VALUES, card_str
+
 class Hand:
+    # Totals and flags are kept up to date as cards are added or removed,
+    # so every query below is O(1)
+    __slots__ = (
+        "cards", "bet", "doubled", "split", "surrendered", "is_split_hand", "is_split_aces",
+        "hard_total", "aces", "value", "soft", "pair"
+    )
+    
     def __init__(self, cards=None):
-        self.cards = cards or []
+        self.cards = []
         self.bet = 0
         self.doubled = False
         self.split = False
         self.surrendered = False
         self.is_split_hand = False
         self.is_split_aces = False
+        self.hard_total = 0  # Total with every ace counted as 1
+        self.aces = 0
+        self.value = 0
+        self.soft = False
+        self.pair = False
+        
+        for card in cards or []:
+            self.add_card(card)
         
     def add_card(self, card):
         """Add a card to the hand"""
         self.cards.append(card)
+        value = CARD_VALUES[card]
+        if value == 11:
+            self.aces += 1
+            value = 1
+        self.hard_total += value
+        self._update_value()
+        
+    def pop_card(self):
+        """Remove and return the last card of the hand (used when splitting)"""
+        card = self.cards.pop()
+        value = CARD_VALUES[card]
+        if value == 11:
+            self.aces -= 1
+            value = 1
+        self.hard_total -= value
+        self._update_value()
+        return card
+        
+    def _update_value(self):
+        """Refresh the best total and the soft/pair flags from the running totals"""
+        # At most one ace can count as 11 without busting
+        self.soft = self.aces > 0 and self.hard_total + 10 <= 21
+        self.value = self.hard_total + 10 if self.soft else self.hard_total
+        cards = self.cards
+        self.pair = len(cards) == 2 and CARD_VALUES[cards[0]] == CARD_VALUES[cards[1]]
         
     def is_blackjack(self):
         """Check if the hand is a blackjack (exactly 2 cards with value of 21)"""
-        return len(self.cards) == 2 and self.get_value() == 21
+        return self.value == 21 and len(self.cards) == 2
         
     def get_value(self):
-        """Calculate the value of the hand, handling aces optimally"""
-        total = 0
-        aces = 0
-        
-        for card in self.cards:
-            value = card.get_numerical_value()
-            if value == 11:
-                aces += 1
-                value = 1
-            total += value
-        
-        # Add back 10 for each ace if it wouldn't bust
-        while aces > 0 and total + 10 <= 21:
-            total += 10
-            aces -= 1
-            
-        return total
+        """Return the value of the hand, handling aces optimally"""
+        return self.value
     
     def is_soft(self):
         """Check if the hand is soft (contains an Ace counted as 11)"""
-        value_without_aces = sum(
-            card.get_numerical_value() if card.value != "A" else 1 
-            for card in self.cards
-        )
-        
-        aces = sum(1 for card in self.cards if card.value == "A")
-        
-        return aces > 0 and value_without_aces + 10 <= 21
+        return self.soft
         
     def is_pair(self):
         """Check if the hand is a pair (two cards with the same value)"""
-        if len(self.cards) != 2:
-            return False
-        
-        # For face cards and 10s
-        if self.cards[0].value in ["T", "J", "Q", "K"] and self.cards[1].value in ["T", "J", "Q", "K"]:
-            return True
-        
-        return self.cards[0].value == self.cards[1].value
+        # Face cards and 10s all pair with each other, so values are compared
+        return self.pair
         
     def can_split(self):
         """Check if the hand can be split"""
-        return self.is_pair() and not self.doubled and not self.surrendered
+        return self.pair and not self.doubled and not self.surrendered
         
     def can_double(self):
         """Check if the hand can be doubled"""
@@ -71,8 +85,8 @@ class Hand:
     
     def is_busted(self):
         """Check if the hand is busted (value > 21)"""
-        return self.get_value() > 21
+        return self.hard_total > 21
     
     def __str__(self):
-        cards_str = " ".join(str(card) for card in self.cards)
-        return f"[{cards_str}] = {self.get_value()}"
+        cards_str = " ".join(card_str(card) for card in self.cards)
+        return f"[{cards_str}] = {self.value}"
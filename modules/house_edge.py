@@ -0,0 +1,349 @@
+from functools import lru_cache
+import pandas as pd
+from modules.card import RANK_VALUES, SUITS
+from modules.strategy import ACTIONS, DEALER_COLUMNS, HARD, SOFT, PAIR, MAX_TOTAL
+
+# Bump whenever a change alters the payout distributions computed, which invalidates cached ones
+ANALYSIS_VERSION = 1
+
+# Compositions are tuples of card counts indexed by numerical value - 2 (2-9, ten-value cards, Ace)
+VALUES = tuple(range(2, 12))
+
+# Dealer outcomes, in the order of the probabilities returned by dealer_distribution
+DEALER_OUTCOMES = (17, 18, 19, 20, 21, "BJ", "BUST")
+
+# Terminal states of a player hand: (kind, total, two-card 21, bet multiple)
+STAND = "STAND"
+BUST = "BUST"
+SURRENDER = "SURRENDER"
+
+# Split payout combinations less likely than this are dropped from payout distributions
+NEGLIGIBLE = 1e-12
+
+def full_shoe(num_decks=6):
+    """Return the composition of a full shoe"""
+    counts = [0] * len(VALUES)
+    for value in RANK_VALUES:
+        counts[value - 2] += len(SUITS) * num_decks
+    return tuple(counts)
+
+def card_probabilities(composition):
+    """Yield (value, probability, remaining composition) for the next card drawn"""
+    total = sum(composition)
+    for index, count in enumerate(composition):
+        if count:
+            counts = list(composition)
+            counts[index] -= 1
+            yield VALUES[index], count / total, tuple(counts)
+
+def payouts(terminal):
+    """Net payout, in units of the initial bet, of a terminal hand state against each of DEALER_OUTCOMES"""
+    kind, total, blackjack, multiple = terminal
+    if kind == SURRENDER:
+        return (-0.5,) * len(DEALER_OUTCOMES)
+    if kind == BUST:
+        return (-multiple,) * len(DEALER_OUTCOMES)
+    if blackjack:
+        # As in evaluate_hand, a dealer bust is checked first and pays even money
+        return (1.5,) * 5 + (0, 1)
+    return tuple(multiple * ((total > outcome) - (total < outcome)) for outcome in DEALER_OUTCOMES[:5]) \
+        + (-multiple, multiple)
+
+class HouseEdgeCalculator:
+    """Expected value of a strategy table under BlackjackGame's rules, by combinatorial analysis
+
+    Mirrors BlackjackGame: dealer hits soft 17, blackjack pays 3:2 (including
+    a two-card 21 after a split), no dealer peek, double on any two cards
+    including after splits, unlimited re-splits, surrender (X/U) on the
+    first two cards of a hand that was not itself split, and split aces
+    receive one card, except that the hand being played when aces are
+    split keeps following the strategy as play_player_hand does.
+
+    The player's draws are exact for the cards left in the shoe. The
+    dealer's final-total distribution is computed for the composition left
+    after the initial deal and memoized by (upcard, composition); the
+    player's later draws are not removed from the dealer's shoe, and split
+    hands draw from the same composition, the usual approximation that
+    keeps the analysis to seconds. The bankroll is assumed to always cover
+    doubles and splits.
+
+    With distributions=True, hands are played to a net payout distribution
+    per dealer outcome instead of expected counts of terminal states, which
+    round_distribution uses to give the full distribution of a round's
+    payout (slower, as split hands have to be convolved).
+    """
+
+    def __init__(self, strategy, num_decks=6, distributions=False):
+        self.compiled = strategy.compiled
+        self.num_decks = num_decks
+        self.distributions = distributions
+        if distributions:
+            self.num_columns = len(DEALER_OUTCOMES)
+            self._leaf, self._combine = self._payout_leaf, self._payout_combine
+        else:
+            self.num_columns = 1
+            self._leaf, self._combine = self._count_leaf, self._count_combine
+        self.dealer_distribution = lru_cache(maxsize=None)(self._dealer_distribution)
+        self._dealer_draw = lru_cache(maxsize=None)(self._dealer_draw)
+        self._play = lru_cache(maxsize=None)(self._play)
+
+    def _dealer_distribution(self, upcard, composition):
+        """Return the probability of each of DEALER_OUTCOMES for an upcard and the rest of the shoe"""
+        return self._dealer_draw(upcard - 10 if upcard == 11 else upcard, upcard == 11, 1, composition)
+
+    def _dealer_draw(self, hard, has_ace, num_cards, composition):
+        soft = has_ace and hard + 10 <= 21
+        value = hard + 10 if soft else hard
+        if num_cards == 2 and value == 21:
+            return (0, 0, 0, 0, 0, 1, 0)
+        if value > 21:
+            return (0, 0, 0, 0, 0, 0, 1)
+        # Dealer must hit on soft 17
+        if value >= 18 or (value == 17 and not soft):
+            return tuple(1 if outcome == value else 0 for outcome in DEALER_OUTCOMES)
+
+        distribution = [0] * len(DEALER_OUTCOMES)
+        for card, probability, remaining in card_probabilities(composition):
+            outcome = self._dealer_draw(
+                hard + (1 if card == 11 else card), has_ace or card == 11, min(num_cards + 1, 3), remaining
+            )
+            for i, p in enumerate(outcome):
+                distribution[i] += probability * p
+        return tuple(distribution)
+
+    def _action(self, hand, upcard):
+        """Look up the strategy action for a hand state, as Strategy.get_action_code does"""
+        hard, has_ace, num_cards, first, second = hand[:5]
+        dealer_index = upcard - 2
+        if num_cards == 2 and first == second:
+            return ACTIONS[self.compiled.lookup(PAIR, first, dealer_index)]
+        if has_ace and hard + 10 <= 21:
+            return ACTIONS[self.compiled.lookup(SOFT, hard + 10, dealer_index)]
+        return ACTIONS[self.compiled.lookup(HARD, min(hard, MAX_TOTAL), dealer_index)]
+
+    @staticmethod
+    def _add_card(hand, card):
+        hard, has_ace, num_cards, first, second, doubled, split, split_aces = hand
+        if num_cards == 0:
+            first = card
+        elif num_cards == 1:
+            second = card
+        return (hard + (1 if card == 11 else card), has_ace or card == 11, num_cards + 1,
+                first, second, doubled, split, split_aces)
+
+    @staticmethod
+    def _terminal(hand, surrendered=False):
+        hard, has_ace, num_cards, _, _, doubled, _, _ = hand
+        multiple = 2 if doubled else 1
+        if surrendered:
+            return (SURRENDER, 0, False, 1)
+        if hard > 21:
+            return (BUST, 0, False, multiple)
+        value = hard + 10 if has_ace and hard + 10 <= 21 else hard
+        # Every total below 17 only wins when the dealer busts
+        return (STAND, max(value, 16), num_cards == 2 and value == 21, multiple)
+
+    def _play(self, hand, upcard, composition):
+        """Play a hand to completion from a decision point
+
+        Returns:
+            tuple: one ((key, weight), ...) column per entry of self._leaf's result; by default
+                a single column of (terminal state, expected count) over this hand and any hands
+                split from it, or with distributions one column of (net payout, probability)
+                per dealer outcome
+        """
+        hard, has_ace, num_cards, first, second, doubled, split, split_aces = hand
+        action = self._action(hand, upcard)
+        can_double = num_cards == 2 and not doubled
+        outcomes = [{} for _ in range(self.num_columns)]
+
+        def add(results, probability):
+            for column, items in zip(outcomes, results):
+                for key, weight in items:
+                    column[key] = column.get(key, 0) + probability * weight
+
+        def hit(continues):
+            for card, probability, remaining in card_probabilities(composition):
+                new_hand = self._add_card(hand, card)
+                if continues and new_hand[0] <= 21:
+                    add(self._play(new_hand, upcard, remaining), probability)
+                else:
+                    add(self._leaf(self._terminal(new_hand)), probability)
+
+        if action == "S" or (action == "D" and not can_double):
+            add(self._leaf(self._terminal(hand)), 1)
+        elif action in ("D", "B") and can_double:
+            doubled_hand = (hard, has_ace, num_cards, first, second, True, split, split_aces)
+            for card, probability, remaining in card_probabilities(composition):
+                add(self._leaf(self._terminal(self._add_card(doubled_hand, card))), probability)
+        elif action in ("X", "U") and num_cards == 2 and not split:
+            add(self._leaf(self._terminal(hand, surrendered=True)), 1)
+        elif action == "U":
+            add(self._leaf(self._terminal(hand)), 1)
+        elif action == "P" and num_cards == 2 and first == second:
+            add(self._split(first, upcard, composition), 1)
+        else:
+            # Hit, including a split or double that isn't allowed; a failed surrender hits once then stands
+            hit(continues=action != "X")
+        return tuple(tuple(column.items()) for column in outcomes)
+
+    def _split(self, card, upcard, composition):
+        """Play both hands of a split pair, each drawing from the same composition"""
+        aces = card == 11
+        hands = []
+        for current in (True, False):
+            # The hand being played is marked as split (no surrender); the new hand is not
+            start = (1 if aces else card, aces, 1, card, 0, False, current, aces)
+            outcomes = [{} for _ in range(self.num_columns)]
+            for drawn, probability, remaining in card_probabilities(composition):
+                hand = self._add_card(start, drawn)
+                if aces and not current:
+                    results = self._leaf(self._terminal(hand))
+                else:
+                    results = self._play(hand, upcard, remaining)
+                for column, items in zip(outcomes, results):
+                    for key, weight in items:
+                        column[key] = column.get(key, 0) + probability * weight
+            hands.append(outcomes)
+        return self._combine(*hands)
+
+    @staticmethod
+    def _count_leaf(terminal):
+        return (((terminal, 1),),)
+
+    @staticmethod
+    def _count_combine(first, second):
+        """Expected counts of terminal states add across the two hands of a split"""
+        combined = dict(first[0])
+        for terminal, count in second[0].items():
+            combined[terminal] = combined.get(terminal, 0) + count
+        return (tuple(combined.items()),)
+
+    @staticmethod
+    def _payout_leaf(terminal):
+        return tuple(((payout, 1),) for payout in payouts(terminal))
+
+    @staticmethod
+    def _payout_combine(first, second):
+        """Convolve the net payouts of the two hands of a split against each dealer outcome"""
+        combined = []
+        for first_column, second_column in zip(first, second):
+            column = {}
+            for first_payout, first_p in first_column.items():
+                for second_payout, second_p in second_column.items():
+                    p = first_p * second_p
+                    # Deep re-splits spread the payout over a wide range of negligible probabilities
+                    if p > NEGLIGIBLE:
+                        payout = first_payout + second_payout
+                        column[payout] = column.get(payout, 0) + p
+            combined.append(tuple(column.items()))
+        return tuple(combined)
+
+    @staticmethod
+    def _payout(terminal, dealer):
+        """Expected net payout, in units of the initial bet, of a terminal hand state against a dealer distribution"""
+        kind, total, blackjack, multiple = terminal
+        if kind == SURRENDER:
+            return -0.5
+        if kind == BUST:
+            return -multiple
+        p_blackjack, p_bust = dealer[5], dealer[6]
+        if blackjack:
+            # As in evaluate_hand, a dealer bust is checked first and pays even money
+            return p_bust + 1.5 * (1 - p_blackjack - p_bust)
+        win = p_bust + sum(p for outcome, p in zip(DEALER_OUTCOMES[:5], dealer[:5]) if outcome < total)
+        lose = p_blackjack + sum(p for outcome, p in zip(DEALER_OUTCOMES[:5], dealer[:5]) if outcome > total)
+        return multiple * (win - lose)
+
+    def initial_hands(self):
+        """Yield (first card, second card, upcard, probability, remaining composition) for every initial deal
+
+        Player hands are unordered (first <= second), with the probability of both orders.
+        """
+        shoe = full_shoe(self.num_decks)
+        for first, p_first, after_first in card_probabilities(shoe):
+            for upcard, p_upcard, after_upcard in card_probabilities(after_first):
+                for second, p_second, remaining in card_probabilities(after_upcard):
+                    if second < first:
+                        continue
+                    probability = p_first * p_upcard * p_second * (2 if second != first else 1)
+                    yield first, second, upcard, probability, remaining
+
+    def hand_ev(self, first, second, upcard, composition):
+        """Expected net payout of an initial two-card hand against an upcard"""
+        dealer = self.dealer_distribution(upcard, composition)
+        hand = self._add_card(self._add_card((0, False, 0, 0, 0, False, False, False), first), second)
+        if self.distributions:
+            return sum(p_dealer * payout * p
+                       for p_dealer, column in zip(dealer, self._play(hand, upcard, composition))
+                       for payout, p in column)
+        return sum(count * self._payout(terminal, dealer)
+                   for terminal, count in self._play(hand, upcard, composition)[0])
+
+    def round_distribution(self):
+        """Compute the distribution of the net payout of a round, in units of the initial bet
+
+        Requires distributions=True. The hands of a split are independent
+        given the composition, as in the EV analysis, and all of a round's
+        hands are settled against the same dealer outcome.
+
+        Returns:
+            dict: {net payout: probability}, sorted by payout
+        """
+        if not self.distributions:
+            raise ValueError("round_distribution requires HouseEdgeCalculator(..., distributions=True)")
+        distribution = {}
+        for first, second, upcard, probability, composition in self.initial_hands():
+            dealer = self.dealer_distribution(upcard, composition)
+            hand = self._add_card(self._add_card((0, False, 0, 0, 0, False, False, False), first), second)
+            for p_dealer, column in zip(dealer, self._play(hand, upcard, composition)):
+                if not p_dealer:
+                    continue
+                for payout, p in column:
+                    distribution[payout] = distribution.get(payout, 0) + probability * p_dealer * p
+        return dict(sorted(distribution.items()))
+
+    def ev_table(self):
+        """Compute the expected value of every initial hand against every upcard
+
+        Returns:
+            tuple: (DataFrame of EV per bet indexed like the strategy table rows, with
+                dealer upcards as columns; overall expected value per hand)
+        """
+        evs = {}
+        weights = {}
+        overall = 0
+        for first, second, upcard, probability, composition in self.initial_hands():
+            ev = self.hand_ev(first, second, upcard, composition)
+            overall += probability * ev
+
+            key = (self.row_key(first, second), DEALER_COLUMNS[upcard - 2])
+            evs[key] = evs.get(key, 0) + probability * ev
+            weights[key] = weights.get(key, 0) + probability
+
+        rows = sorted({row for row, _ in evs}, key=self._row_order)
+        table = pd.DataFrame(index=pd.Index(rows, name="hand"), columns=list(DEALER_COLUMNS), dtype=float)
+        for (row, column), total in evs.items():
+            table.loc[row, column] = total / weights[(row, column)]
+        return table, overall
+
+    @staticmethod
+    def row_key(first, second):
+        """Label an initial hand like the strategy table rows (hard total, A2-A9, pairs, BJ)"""
+        label = {10: "T", 11: "A"}
+        if first == second:
+            return label.get(first, str(first)) * 2
+        if 11 in (first, second):
+            other = first if second == 11 else second
+            return "BJ" if other == 10 else f"A{other}"
+        return str(first + second)
+
+    @staticmethod
+    def _row_order(row):
+        if row.isdigit():
+            return (0, int(row), "")
+        if row == "BJ":
+            return (3, 0, "")
+        if row.startswith("A") and row[1:].isdigit():
+            return (1, int(row[1:]), "")
+        return (2, 0, row)
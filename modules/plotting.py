@@ -2,10 +2,12 @@ import matplotlib
 # Use a non-interactive backend that doesn't require GUI
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import os
 import datetime
 import json
+from modules.results import iter_result_chunks, iter_sessions, session_final_bankrolls
 
 # Try to import plotly, with a fallback if not available
 try:
@@ -15,8 +17,130 @@ except ImportError:
     PLOTLY_AVAILABLE = False
     print("Plotly not available. Install with 'pip install plotly' for interactive HTML plots.")
 
-def plot_results(results_df, starting_stake, num_hands, output_dir="output"):
-    """Create and save plots of the simulation results"""
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+
+def bankroll_bands(results_df, starting_stake, num_hands, bins=1024):
+    """Compute per-hand bankroll percentiles and survival fractions across all sessions
+    
+    Sessions that stopped early keep their final bankroll for the rest of the
+    hands. Every chunk of results is binned into per-hand histograms in one
+    vectorized pass (bins span 0 to 2.5x the starting stake, so percentiles
+    are accurate to within a bin), which keeps the cost independent of how
+    the rows are grouped into sessions.
+    
+    Returns:
+        DataFrame indexed by hand with columns p5, p25, p50, p75, p95, surviving
+        (fraction of sessions with bankroll left) and active (fraction still playing)
+    """
+    width = starting_stake * 2.5 / (bins - 1)
+    counts = np.zeros((num_hands + 1) * bins, dtype=np.int64)
+    # Sessions whose final bankroll carries over from the hand after they stopped
+    carried = np.zeros((num_hands + 2) * bins, dtype=np.int64)
+    # Sessions ruined, and ruined or doubled, at each hand
+    ruined = np.zeros(num_hands + 1, dtype=np.int64)
+    ended = np.zeros(num_hands + 1, dtype=np.int64)
+    num_sessions = 0
+    
+    for chunk in iter_result_chunks(results_df):
+        sessions = chunk['session'].to_numpy()
+        if not len(sessions):
+            continue
+        hands = chunk['hand'].to_numpy().astype(np.int64)
+        bankrolls = chunk['bankroll'].to_numpy()
+        binned = np.clip(np.rint(bankrolls / width), 0, bins - 1).astype(np.int64)
+        counts += np.bincount(hands * bins + binned, minlength=len(counts))
+        
+        # Rows are ordered by session then hand, so each session's last row is its final one
+        ends = np.append(np.flatnonzero(np.diff(sessions)), len(sessions) - 1)
+        last_hand = hands[ends]
+        carried += np.bincount((last_hand + 1) * bins + binned[ends], minlength=len(carried))
+        finals = bankrolls[ends]
+        ruined += np.bincount(last_hand[finals <= 0], minlength=len(ruined))
+        ended += np.bincount(last_hand[(finals <= 0) | (finals >= 2 * starting_stake)], minlength=len(ended))
+        num_sessions += len(ends)
+    
+    counts = counts.reshape(num_hands + 1, bins)
+    counts += np.cumsum(carried.reshape(num_hands + 2, bins), axis=0)[:num_hands + 1]
+    cumulative = np.cumsum(counts, axis=1)
+    
+    bands = {}
+    for percentile in BAND_PERCENTILES:
+        rank = percentile / 100 * (num_sessions - 1)
+        bands[f"p{percentile}"] = (cumulative > rank).argmax(axis=1) * width
+    bands["surviving"] = 1 - np.cumsum(ruined) / max(num_sessions, 1)
+    bands["active"] = 1 - np.cumsum(ended) / max(num_sessions, 1)
+    return pd.DataFrame(bands, index=pd.RangeIndex(num_hands + 1, name="hand"))
+
+def sample_sessions(results_df, count):
+    """Return (session, DataFrame of its rows) for the first count sessions"""
+    samples = []
+    for chunk in iter_result_chunks(results_df):
+        chunk = chunk[chunk['session'] <= count]
+        if len(chunk):
+            samples.extend(chunk.groupby('session', sort=True))
+    return samples
+
+def session_outcome(final_bankroll, starting_stake):
+    """Classify a final bankroll as in the summary statistics"""
+    if final_bankroll >= 2 * starting_stake:
+        return "Doubled"
+    if final_bankroll > 0:
+        return "Positive"
+    return "Zero" if final_bankroll == 0 else "Negative"
+
+def lttb(x, y, threshold):
+    """Downsample a line to threshold points with Largest-Triangle-Three-Buckets
+    
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the point kept from the previous
+    bucket and the average of the next bucket, which preserves the line's
+    peaks and troughs.
+    
+    Returns:
+        tuple: (x, y) arrays of at most threshold points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Averages of every bucket (and of the last point, as the final bucket's "next") don't
+    # depend on which points are kept, so they're computed up front
+    sizes = np.diff(edges)
+    next_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes, x[-1])[1:]
+    next_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes, y[-1])[1:]
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Twice the triangle area; the factor doesn't change the maximum
+        areas = np.abs((x[previous] - next_x[bucket]) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (next_y[bucket] - y[previous]))
+        previous = start + int(areas.argmax())
+        kept[bucket + 1] = previous
+    return x[kept], y[kept]
+
+def plot_results(results_df, starting_stake, num_hands, output_dir="output", mode="auto", sample=20, max_points=500):
+    """Create and save plots of the simulation results
+    
+    results_df can be a DataFrame or streamed ChunkedResults, which are read one chunk at a time
+    
+    Args:
+        mode: "lines" draws every session, "bands" draws per-hand percentile bands
+            with the first sample sessions, and "auto" picks bands when there
+            are more than sample sessions
+        sample: Number of individual sessions drawn over the bands
+        max_points: Points per session in the interactive plot, which are
+            downsampled with LTTB beyond that
+    """
+    if mode == "auto":
+        mode = "bands" if len(session_final_bankrolls(results_df)) > sample else "lines"
+    if mode == "bands":
+        return plot_bands(results_df, starting_stake, num_hands, output_dir, sample, max_points)
+        
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
@@ -26,11 +150,15 @@ def plot_results(results_df, starting_stake, num_hands, output_dir="output"):
     # Create static matplotlib plot
     plt.figure(figsize=(12, 8))
     
-    # Plot each session
-    for session in results_df['session'].unique():
-        session_data = results_df[results_df['session'] == session]
-        plt.plot(session_data['hand'], session_data['bankroll'], 
-                 label=f"Session {session}")
+    # Plot each session, collecting the downsampled interactive traces and outcomes in the same pass
+    sessions, traces, outcomes = [], [], []
+    for session, session_data in iter_sessions(results_df):
+        hands, bankrolls = session_data['hand'].to_numpy(), session_data['bankroll'].to_numpy()
+        plt.plot(hands, bankrolls, label=f"Session {session}")
+        if PLOTLY_AVAILABLE:
+            sessions.append(session)
+            traces.append(lttb(hands, bankrolls, max_points))
+            outcomes.append(session_outcome(bankrolls[-1], starting_stake))
     
     # Add horizontal lines for starting stake and double starting stake
     plt.axhline(y=starting_stake, color='r', linestyle='--', 
@@ -57,180 +185,224 @@ def plot_results(results_df, starting_stake, num_hands, output_dir="output"):
     # Create interactive HTML plot if plotly is available
     html_output_file = None
     if PLOTLY_AVAILABLE:
-        fig = go.Figure()
-        
-        # Add data for each session
-        session_data_dict = {}
-        for session in sorted(results_df['session'].unique()):
-            session_data = results_df[results_df['session'] == session]
-            # Only show first session by default, others hidden in legend
-            visible = True if session == 1 else "legendonly"
-            
-            # Store session data for javascript interactivity
-            session_data_dict[f"Session {session}"] = {
-                "x": session_data['hand'].tolist(),
-                "y": session_data['bankroll'].tolist(),
-                "final_bankroll": session_data['bankroll'].iloc[-1] if len(session_data) > 0 else 0
-            }
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=session_data['hand'],
-                    y=session_data['bankroll'],
-                    mode='lines',
-                    name=f'Session {session}',
-                    visible=visible,
-                    hovertemplate=f'Hand: %{{x}}<br>Bankroll: $%{{y:.2f}}<extra>Session {session}</extra>'
-                )
+        # WebGL traces, so the browser isn't drawing thousands of SVG paths
+        fig = go.Figure([
+            go.Scattergl(
+                x=x,
+                y=y,
+                mode='lines',
+                name=f'Session {session}',
+                # Only show first session by default, others hidden in legend
+                visible=True if session == 1 else "legendonly",
+                hovertemplate=f'Hand: %{{x}}<br>Bankroll: $%{{y:.2f}}<extra>Session {session}</extra>'
             )
+            for session, (x, y) in zip(sessions, traces)
+        ])
         
-        # Add horizontal line for starting stake
-        fig.add_shape(
-            type="line",
-            x0=0,
-            y0=starting_stake,
-            x1=num_hands,
-            y1=starting_stake,
-            line=dict(
-                color="red",
-                width=2,
-                dash="dash",
-            )
-        )
+        add_stake_lines(fig, starting_stake, num_hands)
         
-        # Add horizontal line for double starting stake
-        fig.add_shape(
-            type="line",
-            x0=0,
-            y0=starting_stake * 2,
-            x1=num_hands,
-            y1=starting_stake * 2,
-            line=dict(
-                color="green",
-                width=2,
-                dash="dash",
-            )
-        )
-        
-        # Add annotations for the horizontal lines
-        fig.add_annotation(
-            x=num_hands * 0.02,
-            y=starting_stake,
-            text="Starting Stake",
-            showarrow=False,
-            yshift=10,
-            font=dict(color="red")
-        )
-        
-        fig.add_annotation(
-            x=num_hands * 0.02,
-            y=starting_stake * 2,
-            text="Double Starting Stake",
-            showarrow=False,
-            yshift=10,
-            font=dict(color="green")
-        )
+        # Visibility masks of the outcome filters, one entry per session trace
+        outcomes = np.array(outcomes)
+        masks = {outcome: (outcomes == outcome).tolist() for outcome in ("Doubled", "Positive", "Negative", "Zero")}
         
         # Update layout
         fig.update_layout(
             title='Blackjack Simulation: Bankroll vs. Hand Number',
             xaxis_title='Hand Number',
             yaxis_title='Bankroll ($)',
+            xaxis_range=[0, num_hands],
+            yaxis_range=[0, starting_stake * 2.1],
             legend_title='Session',
             autosize=True,
             height=700,
             hovermode="closest",
             margin=dict(t=100, l=50, r=50, b=50),
-            updatemenus=[
-                dict(
-                    type="buttons",
-                    direction="right",
-                    buttons=[
-                        dict(label="Reset View",
-                             method="relayout",
-                             args=[{"xaxis.range": [0, num_hands],
-                                    "yaxis.range": [0, starting_stake * 2.1]}])
-                    ],
-                    pad={"r": 10, "t": 10},
-                    showactive=False,
-                    x=0.1,
-                    xanchor="left",
-                    y=1.1,
-                    yanchor="top"
-                )
-            ]
+            updatemenus=outcome_menus(
+                [True] * len(sessions), masks, "All Sessions", "Sessions", num_hands, starting_stake
+            )
         )
         
-        # Set axis ranges
-        fig.update_xaxes(range=[0, num_hands])
-        fig.update_yaxes(range=[0, starting_stake * 2.1])
+        # Save as interactive HTML
+        html_output_file = os.path.join(output_dir, f"{timestamp}_bankroll_interactive.html")
+        fig.write_html(
+            html_output_file,
+            include_plotlyjs='cdn',
+            config={'displayModeBar': True}
+        )
         
-        # Add session statistics to the plot
-        session_stats = results_df.groupby('session')['bankroll'].last().reset_index()
-        session_stats['outcome'] = session_stats['bankroll'].apply(
-            lambda x: "Doubled" if x >= 2 * starting_stake else
-                      "Positive" if x > 0 else
-                      "Zero" if x == 0 else "Negative"
+        print(f"Interactive plot saved to {html_output_file}")
+    
+    return static_output_file, html_output_file
+
+def add_stake_lines(fig, starting_stake, num_hands):
+    """Add the labelled starting stake and double starting stake lines to a Plotly figure"""
+    for y, color, text in ((starting_stake, "red", "Starting Stake"), (starting_stake * 2, "green", "Double Starting Stake")):
+        fig.add_shape(type="line", x0=0, y0=y, x1=num_hands, y1=y, line=dict(color=color, width=2, dash="dash"))
+        fig.add_annotation(x=num_hands * 0.02, y=y, text=text, showarrow=False, yshift=10, font=dict(color=color))
+
+def outcome_menus(show_all, masks, all_title, subject, num_hands, starting_stake):
+    """Return the outcome filter dropdown and Reset View button of an interactive plot
+    
+    Args:
+        show_all: Visibility of every trace for "Show All"
+        masks: {outcome: visibility of every trace} for the outcome filters
+        all_title: Plot title when showing all
+        subject: What the filtered traces are, for the filtered titles
+    """
+    titles = {
+        "Doubled": ("Doubled Stake", f"{subject} with Doubled Stake"),
+        "Positive": ("Positive", f"{subject} with Positive Outcome"),
+        "Negative": ("Negative", f"{subject} with Negative Outcome"),
+        "Zero": ("Zero", f"{subject} with Zero Bankroll")
+    }
+    buttons = [dict(label="Show All", method="update", args=[{"visible": show_all}, {"title": all_title}])]
+    for outcome, (label, title) in titles.items():
+        buttons.append(dict(label=label, method="update", args=[{"visible": masks[outcome]}, {"title": title}]))
+    return [
+        dict(
+            buttons=buttons,
+            direction="down",
+            pad={"r": 10, "t": 10},
+            showactive=True,
+            x=0.1,
+            xanchor="left",
+            y=1.02,
+            yanchor="top"
+        ),
+        dict(
+            type="buttons",
+            direction="right",
+            buttons=[
+                dict(label="Reset View",
+                     method="relayout",
+                     args=[{"xaxis.range": [0, num_hands],
+                            "yaxis.range": [0, starting_stake * 2.1]}])
+            ],
+            pad={"r": 10, "t": 10},
+            showactive=False,
+            x=0.37,
+            xanchor="left",
+            y=1.02,
+            yanchor="top"
         )
+    ]
+
+def plot_bands(results_df, starting_stake, num_hands, output_dir="output", sample=20, max_points=500):
+    """Plot per-hand percentile bands (a fan chart), survival and a sample of sessions
+    
+    The cost depends on the number of hands and the sample size, not on the
+    number of sessions. The bands are also saved as CSV.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    
+    bands = bankroll_bands(results_df, starting_stake, num_hands)
+    samples = sample_sessions(results_df, sample)
+    hands = bands.index.to_numpy()
+    
+    bands_file = os.path.join(output_dir, f"{timestamp}_bankroll_bands.csv")
+    bands.to_csv(bands_file)
+    print(f"Bankroll bands saved to {bands_file}")
+    
+    # Static fan chart, with the share of sessions with bankroll left on a second axis
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.fill_between(hands, bands['p5'], bands['p95'], color='tab:blue', alpha=0.15, label="5th-95th percentile")
+    ax.fill_between(hands, bands['p25'], bands['p75'], color='tab:blue', alpha=0.3, label="25th-75th percentile")
+    ax.plot(hands, bands['p50'], color='tab:blue', linewidth=2, label="Median")
+    for index, (session, session_data) in enumerate(samples):
+        ax.plot(session_data['hand'], session_data['bankroll'], color='gray', linewidth=0.6, alpha=0.7,
+                label=f"First {len(samples)} sessions" if index == 0 else None)
+    ax.axhline(y=starting_stake, color='r', linestyle='--', label="Starting Stake")
+    ax.axhline(y=starting_stake * 2, color='g', linestyle='--', label="Double Starting Stake")
+    ax.set_xlim(0, num_hands)
+    ax.set_ylim(0, starting_stake * 2.1)
+    ax.set_xlabel("Hand Number")
+    ax.set_ylabel("Bankroll ($)")
+    ax.set_title("Blackjack Simulation: Bankroll Percentiles vs. Hand Number")
+    ax.grid(True)
+    
+    survival_ax = ax.twinx()
+    survival_ax.plot(hands, bands['surviving'] * 100, color='black', linestyle=':', label="Sessions with bankroll left")
+    survival_ax.set_ylim(0, 105)
+    survival_ax.set_ylabel("Sessions with bankroll left (%)")
+    
+    lines, labels = ax.get_legend_handles_labels()
+    survival_lines, survival_labels = survival_ax.get_legend_handles_labels()
+    # Drawn on the second axis so it sits above the survival line
+    survival_ax.legend(lines + survival_lines, labels + survival_labels, loc="upper left")
+    
+    static_output_file = os.path.join(output_dir, f"{timestamp}_bankroll_plot.png")
+    fig.savefig(static_output_file, dpi=300)
+    plt.close(fig)
+    
+    print(f"Static plot saved to {static_output_file}")
+    
+    html_output_file = None
+    if PLOTLY_AVAILABLE:
+        fig = go.Figure()
+        
+        # The bands are smooth, so every trace shares one evenly thinned set of hands
+        shown = bands.iloc[::-(-len(bands) // max_points)]
+        x = shown.index.to_numpy()
+        
+        # Each upper band edge fills down to the trace added just before it
+        for low, high, opacity in (("p5", "p95", 0.15), ("p25", "p75", 0.3)):
+            fig.add_trace(go.Scattergl(x=x, y=shown[low], mode='lines', line=dict(width=0),
+                                       showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scattergl(
+                x=x, y=shown[high], mode='lines', line=dict(width=0), fill='tonexty',
+                fillcolor=f"rgba(31, 119, 180, {opacity})", name=f"{low[1:]}th-{high[1:]}th percentile",
+                hoverinfo='skip'
+            ))
+        fig.add_trace(go.Scattergl(
+            x=x, y=shown['p50'], mode='lines', line=dict(color="rgb(31, 119, 180)", width=2), name="Median",
+            hovertemplate='Hand: %{x}<br>Median bankroll: $%{y:.2f}<extra></extra>'
+        ))
+        fig.add_trace(go.Scattergl(
+            x=x, y=shown['surviving'] * 100, mode='lines', line=dict(color="black", dash="dot"),
+            name="Sessions with bankroll left (%)", yaxis="y2",
+            hovertemplate='Hand: %{x}<br>Bankroll left: %{y:.1f}%<extra></extra>'
+        ))
+        num_band_traces = len(fig.data)
+        
+        outcomes = []
+        for session, session_data in samples:
+            hands, bankrolls = session_data['hand'].to_numpy(), session_data['bankroll'].to_numpy()
+            outcomes.append(session_outcome(bankrolls[-1], starting_stake))
+            session_x, session_y = lttb(hands, bankrolls, max_points)
+            fig.add_trace(go.Scattergl(
+                x=session_x, y=session_y, mode='lines',
+                line=dict(color="gray", width=1), opacity=0.7, name=f'Session {session}',
+                hovertemplate=f'Hand: %{{x}}<br>Bankroll: $%{{y:.2f}}<extra>Session {session}</extra>'
+            ))
+        
+        add_stake_lines(fig, starting_stake, num_hands)
+        
+        # Bands stay visible; only the sample sessions are filtered
+        outcomes = np.array(outcomes)
+        bands_visible = [True] * num_band_traces
+        masks = {
+            outcome: bands_visible + (outcomes == outcome).tolist()
+            for outcome in ("Doubled", "Positive", "Negative", "Zero")
+        }
         
-        # Add buttons to filter sessions by outcome
         fig.update_layout(
-            updatemenus=[
-                dict(
-                    buttons=[
-                        dict(label="Show All",
-                             method="update",
-                             args=[{"visible": [True] * len(fig.data)},
-                                  {"title": "All Sessions"}]),
-                        dict(label="Doubled Stake",
-                             method="update",
-                             args=[{"visible": [session_stats.loc[i-1, 'outcome'] == "Doubled" 
-                                               for i in range(1, len(fig.data)+1)]},
-                                  {"title": "Sessions with Doubled Stake"}]),
-                        dict(label="Positive",
-                             method="update",
-                             args=[{"visible": [session_stats.loc[i-1, 'outcome'] == "Positive" 
-                                               for i in range(1, len(fig.data)+1)]},
-                                  {"title": "Sessions with Positive Outcome"}]),
-                        dict(label="Negative",
-                             method="update",
-                             args=[{"visible": [session_stats.loc[i-1, 'outcome'] == "Negative" 
-                                               for i in range(1, len(fig.data)+1)]},
-                                  {"title": "Sessions with Negative Outcome"}]),
-                        dict(label="Zero",
-                             method="update",
-                             args=[{"visible": [session_stats.loc[i-1, 'outcome'] == "Zero" 
-                                               for i in range(1, len(fig.data)+1)]},
-                                  {"title": "Sessions with Zero Bankroll"}]),
-                    ],
-                    direction="down",
-                    pad={"r": 10, "t": 10},
-                    showactive=True,
-                    x=0.1,
-                    xanchor="left",
-                    y=1.02,
-                    yanchor="top"
-                ),
-                dict(
-                    type="buttons",
-                    direction="right",
-                    buttons=[
-                        dict(label="Reset View",
-                             method="relayout",
-                             args=[{"xaxis.range": [0, num_hands],
-                                    "yaxis.range": [0, starting_stake * 2.1]}])
-                    ],
-                    pad={"r": 10, "t": 10},
-                    showactive=False,
-                    x=0.37,
-                    xanchor="left",
-                    y=1.02,
-                    yanchor="top"
-                )
-            ]
+            title='Blackjack Simulation: Bankroll Percentiles vs. Hand Number',
+            xaxis_title='Hand Number',
+            yaxis_title='Bankroll ($)',
+            xaxis_range=[0, num_hands],
+            yaxis_range=[0, starting_stake * 2.1],
+            yaxis2=dict(title='Sessions with bankroll left (%)', overlaying='y', side='right', range=[0, 105]),
+            autosize=True,
+            height=700,
+            hovermode="closest",
+            margin=dict(t=100, l=50, r=50, b=50),
+            updatemenus=outcome_menus(
+                bands_visible + [True] * len(samples), masks, "All Sample Sessions", "Sample Sessions",
+                num_hands, starting_stake
+            )
         )
         
-        # Save as interactive HTML
         html_output_file = os.path.join(output_dir, f"{timestamp}_bankroll_interactive.html")
         fig.write_html(
             html_output_file,
@@ -0,0 +1,152 @@
+import os
+from time import perf_counter
+from modules.strategy import ACTIONS
+from modules.game import BlackjackGame
+
+# Phases of a round, in the order they happen
+PHASES = ("reshuffle", "deal", "strategy", "action", "dealer", "evaluate", "other", "record")
+
+PHASE_DESCRIPTIONS = {
+    "reshuffle": "Shoe.initialize",
+    "deal": "deal_initial_cards",
+    "strategy": "Strategy.get_action",
+    "action": "execute_player_action",
+    "dealer": "play_dealer_hand",
+    "evaluate": "evaluate_hand",
+    "other": "rest of play_round_fast (player hand loop, bookkeeping, timer overhead)",
+    "record": "storing the round's bankroll and stop checks in run_session"
+}
+
+class Profile:
+    """Cumulative time and call count per round phase, with counters for actions and events"""
+
+    def __init__(self, worker=None):
+        self.worker = os.getpid() if worker is None else worker
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.actions = dict.fromkeys(ACTIONS, 0)
+        self.rounds = 0
+        self.splits = 0
+        self.doubles = 0
+        self.reshuffles = 0
+
+    def add(self, phase, elapsed):
+        """Record one call of a phase"""
+        self.times[phase] += elapsed
+        self.calls[phase] += 1
+
+    def merge(self, other):
+        """Add another profile's timings and counters to this one"""
+        for phase in PHASES:
+            self.times[phase] += other.times[phase]
+            self.calls[phase] += other.calls[phase]
+        for action in ACTIONS:
+            self.actions[action] += other.actions[action]
+        self.rounds += other.rounds
+        self.splits += other.splits
+        self.doubles += other.doubles
+        self.reshuffles += other.reshuffles
+
+    def to_dict(self):
+        return {
+            "worker": self.worker,
+            "rounds": self.rounds,
+            "phases": {phase: {"seconds": self.times[phase], "calls": self.calls[phase]} for phase in PHASES},
+            "actions": dict(self.actions),
+            "splits": self.splits,
+            "doubles": self.doubles,
+            "reshuffles": self.reshuffles
+        }
+
+    def report(self):
+        """Format the profile as a table of phases followed by the counters"""
+        total = sum(self.times.values())
+        lines = [f"{'phase':<10} {'calls':>12} {'seconds':>10} {'us/call':>9} {'share':>7}  measures"]
+        for phase in PHASES:
+            calls, seconds = self.calls[phase], self.times[phase]
+            per_call = seconds / calls * 1e6 if calls else 0
+            share = seconds / total * 100 if total else 0
+            lines.append(f"{phase:<10} {calls:>12,} {seconds:>10.3f} {per_call:>9.2f} {share:>6.1f}%  "
+                         f"{PHASE_DESCRIPTIONS[phase]}")
+        lines.append(f"Rounds: {self.rounds:,}, total instrumented time: {total:.3f}s")
+        lines.append("Actions: " + ", ".join(f"{action} {count:,}" for action, count in self.actions.items()))
+        lines.append(f"Splits: {self.splits:,}, Doubles: {self.doubles:,}, Reshuffles: {self.reshuffles:,}")
+        return "\n".join(lines)
+
+class ProfiledStrategy:
+    """Strategy wrapper that times each action lookup"""
+
+    def __init__(self, strategy, profile):
+        self.strategy = strategy
+        self.profile = profile
+
+    def get_action(self, player_hand, dealer_upcard):
+        start = perf_counter()
+        action = self.strategy.get_action(player_hand, dealer_upcard)
+        self.profile.add("strategy", perf_counter() - start)
+        return action
+
+    def __getattr__(self, name):
+        return getattr(self.strategy, name)
+
+class ProfiledBlackjackGame(BlackjackGame):
+    """BlackjackGame that records per-phase timings and counters into a Profile
+
+    Used instead of BlackjackGame only when profiling, so the plain game
+    carries no instrumentation cost.
+    """
+
+    def __init__(self, strategy, shoe, bankroll, standard_bet, verbose=False, events=None, profile=None):
+        self.profile = profile if profile is not None else Profile()
+        super().__init__(ProfiledStrategy(strategy, self.profile), shoe, bankroll, standard_bet, verbose, events)
+
+        # Time reshuffles through the shoe, since play_round calls it directly
+        initialize = shoe.initialize
+        def timed_initialize():
+            start = perf_counter()
+            initialize()
+            self.profile.add("reshuffle", perf_counter() - start)
+            self.profile.reshuffles += 1
+        shoe.initialize = timed_initialize
+
+    def deal_initial_cards(self):
+        start = perf_counter()
+        hands = super().deal_initial_cards()
+        self.profile.add("deal", perf_counter() - start)
+        return hands
+
+    def execute_player_action(self, action, player_hand, dealer_upcard, player_hands):
+        doubled, num_hands = player_hand.doubled, len(player_hands)
+        start = perf_counter()
+        hand = super().execute_player_action(action, player_hand, dealer_upcard, player_hands)
+        self.profile.add("action", perf_counter() - start)
+
+        self.profile.actions[action] += 1
+        if player_hand.doubled and not doubled:
+            self.profile.doubles += 1
+        if len(player_hands) > num_hands:
+            self.profile.splits += 1
+        return hand
+
+    def play_dealer_hand(self, dealer_hand):
+        start = perf_counter()
+        dealer_hand = super().play_dealer_hand(dealer_hand)
+        self.profile.add("dealer", perf_counter() - start)
+        return dealer_hand
+
+    def evaluate_hand(self, player_hand, dealer_hand):
+        start = perf_counter()
+        result = super().evaluate_hand(player_hand, dealer_hand)
+        self.profile.add("evaluate", perf_counter() - start)
+        return result
+
+    def play_round_fast(self):
+        # Whatever the timed phases don't cover: the round's own loop and bookkeeping, and
+        # the overhead of the nested timers, so it is inflated compared to an uninstrumented round
+        measured = sum(self.profile.times.values())
+        start = perf_counter()
+        result = super().play_round_fast()
+        elapsed = perf_counter() - start
+        self.profile.add("other", elapsed - (sum(self.profile.times.values()) - measured))
+        self.profile.rounds += 1
+        return result
@@ -0,0 +1,154 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+
+# Arguments that don't change any session's results, left out of cache keys
+# so that, for example, the same run with more workers or more sessions hits
+UNKEYED_ARGS = {
+    "num_sessions", "workers", "verbose", "debug", "scenario", "strategy_file", "chunk_rows",
+    "profile", "event_log", "event_sample", "event_buffer", "plot_mode", "plot_sample", "plot_points",
+    "summary_only", "cache_dir", "cache_size", "no_cache", "shard", "shard_dir"
+}
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_key(args, seed, engine_version):
+    """Return the content-addressed key of a run's results
+
+    The key covers the strategy file's contents (not its path), every
+    argument that can change a session's results, the engine version and
+    the seed.
+    """
+    keyed = {name: value for name, value in sorted(vars(args).items()) if name not in UNKEYED_ARGS}
+    keyed.update(strategy=file_hash(args.strategy_file), seed=seed, engine_version=engine_version)
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True, default=str).encode()).hexdigest()
+
+def distribution_key(strategy_file, num_decks, analysis_version):
+    """Return the content-addressed key of a strategy's exact round payout distribution"""
+    keyed = {"strategy": file_hash(strategy_file), "num_decks": num_decks, "analysis_version": analysis_version}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+class ResultCache:
+    """On-disk cache of per-hand results and session summaries, evicted least recently used first
+
+    Each key has at most one results file, holding the first sessions of the
+    longest run stored (any shorter run's sessions are a prefix of it), and
+    one summary file per session count, and exact payout distributions are
+    kept by strategy and shoe. Files are written atomically, and
+    reading a file marks it as recently used.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _results_path(self, key):
+        return os.path.join(self.directory, f"{key}.results.npz")
+
+    def _summary_path(self, key, num_sessions):
+        return os.path.join(self.directory, f"{key}.summary.{num_sessions}.pkl")
+
+    def _distribution_path(self, key):
+        return os.path.join(self.directory, f"{key}.payouts.npz")
+
+    def _touch(self, path):
+        os.utime(path)
+
+    def _write(self, path, write):
+        """Write a file through a temporary one and a rename, then evict to the size limit"""
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            write(f)
+        os.replace(temporary, path)
+        self.evict(keep=path)
+
+    def load_results(self, key, num_sessions):
+        """Return (session, hand, bankroll) arrays of up to the first num_sessions cached sessions, or None"""
+        path = self._results_path(key)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        with np.load(path) as data:
+            session = data["session"]
+            # Sessions are stored in order from 1, so a prefix of sessions is a prefix of rows
+            end = np.searchsorted(session, num_sessions, side="right")
+            return session[:end], data["hand"][:end], data["bankroll"][:end]
+
+    def cached_sessions(self, key):
+        """Return how many sessions of results are cached for a key"""
+        path = self._results_path(key)
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as data:
+            return int(data["num_sessions"])
+
+    def store_results(self, key, results):
+        """Store a ResultStore holding sessions 1..n, unless more sessions are already cached or it can't fit
+
+        Results larger than the whole cache are never written, since they
+        would only push everything else out and leave the cache over its limit.
+        """
+        rows = results.num_rows
+        size = rows * (results.session.itemsize + results.hand.itemsize + results.bankroll.itemsize)
+        if size > self.max_bytes or results.num_sessions <= self.cached_sessions(key):
+            return
+        self._write(self._results_path(key), lambda f: np.savez(
+            f, session=results.session[:rows], hand=results.hand[:rows], bankroll=results.bankroll[:rows],
+            num_sessions=results.num_sessions
+        ))
+
+    def summary_sessions(self, key):
+        """Return the session counts of the summaries cached for a key, in increasing order"""
+        prefix = os.path.join(self.directory, f"{key}.summary.")
+        return sorted(int(path[len(prefix):-len(".pkl")]) for path in glob.glob(f"{prefix}*.pkl"))
+
+    def load_summary(self, key, num_sessions):
+        """Return the SessionEstimators cached for a key and session count"""
+        path = self._summary_path(key, num_sessions)
+        self._touch(path)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def store_summary(self, key, summary):
+        self._write(self._summary_path(key, summary.sessions), lambda f: pickle.dump(summary, f))
+
+    def load_distribution(self, key):
+        """Return the {net payout: probability} distribution cached for a key, or None"""
+        path = self._distribution_path(key)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        with np.load(path) as data:
+            return dict(zip(data["payouts"].tolist(), data["probabilities"].tolist()))
+
+    def store_distribution(self, key, distribution):
+        self._write(self._distribution_path(key), lambda f: np.savez(
+            f, payouts=np.array(list(distribution), dtype=np.float64),
+            probabilities=np.array(list(distribution.values()), dtype=np.float64)
+        ))
+
+    def evict(self, keep=None):
+        """Delete the least recently used files until the cache fits in max_bytes, never deleting keep"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*")):
+            if path.endswith(".tmp"):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
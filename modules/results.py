@@ -0,0 +1,300 @@
+import glob
+import json
+import os
+import numpy as np
+# pandas is imported where DataFrames are built, so runs that never build one don't pay for importing it
+
+COLUMNS = ("hand", "bankroll", "session")
+
+# Memory-mapped result files start with this magic and a JSON header padded to MAPPED_HEADER_BYTES
+MAPPED_MAGIC = b"BJSIMRES"
+MAPPED_VERSION = 1
+MAPPED_HEADER_BYTES = 4096
+# Rows per DataFrame when reading a mapped result file chunk by chunk
+MAPPED_CHUNK_ROWS = 1 << 22
+
+def session_final_bankrolls(results):
+    """Return the final bankroll of each session, indexed by session, for any results container"""
+    import pandas as pd
+    if isinstance(results, pd.DataFrame):
+        return results.groupby('session')['bankroll'].last()
+    return results.final_bankrolls()
+
+def iter_result_chunks(results):
+    """Iterate over a results container as DataFrames that each hold whole sessions"""
+    import pandas as pd
+    if isinstance(results, pd.DataFrame):
+        yield results
+    else:
+        yield from results.iter_chunks()
+
+def iter_sessions(results):
+    """Iterate over (session, DataFrame of that session's rows) pairs in session order"""
+    for chunk in iter_result_chunks(results):
+        yield from chunk.groupby('session', sort=True)
+
+class ResultStore:
+    """Compact typed columnar store for results that fit in memory
+
+    Columns are preallocated for the longest possible run (every session
+    playing every hand); pages that are never written are never touched, so
+    sessions that stop early cost nothing. offsets[i]:offsets[i + 1] is the
+    row range of the i-th stored session, which makes per-session summaries
+    O(sessions). Bankrolls are float32, which is exact for any multiple of
+    $0.50 up to $8M.
+    """
+
+    def __init__(self, num_sessions, num_hands):
+        max_rows = num_sessions * (num_hands + 1)
+        hand_dtype = np.uint16 if num_hands < np.iinfo(np.uint16).max else np.int32
+        self.session = np.empty(max_rows, dtype=np.uint32)
+        self.hand = np.empty(max_rows, dtype=hand_dtype)
+        self.bankroll = np.empty(max_rows, dtype=np.float32)
+        self.session_ids = np.empty(num_sessions, dtype=np.uint32)
+        self.offsets = np.zeros(num_sessions + 1, dtype=np.int64)
+        self.num_sessions = 0
+        self.num_rows = 0
+
+    def add_session(self, session, bankrolls):
+        """Add one session's bankroll before the first hand and after each hand"""
+        start, count = self.num_rows, len(bankrolls)
+        end = start + count
+        self.session[start:end] = session
+        self.hand[start:end] = np.arange(count)
+        self.bankroll[start:end] = bankrolls
+        self.session_ids[self.num_sessions] = session
+        self.num_sessions += 1
+        self.offsets[self.num_sessions] = end
+        self.num_rows = end
+
+    def add_rows(self, session_ids, hands, bankrolls):
+        """Add rows for one or more complete sessions, ordered by session then hand"""
+        start, end = self.num_rows, self.num_rows + len(session_ids)
+        self.session[start:end] = session_ids
+        self.hand[start:end] = hands
+        self.bankroll[start:end] = bankrolls
+
+        sessions, counts = np.unique(session_ids, return_counts=True)
+        first, last = self.num_sessions, self.num_sessions + len(sessions)
+        self.session_ids[first:last] = sessions
+        self.offsets[first + 1:last + 1] = start + np.cumsum(counts)
+        self.num_sessions = last
+        self.num_rows = end
+
+    def final_bankrolls(self):
+        """Return the final bankroll of each session, indexed by session"""
+        import pandas as pd
+        ends = self.offsets[1:self.num_sessions + 1] - 1
+        return pd.Series(
+            self.bankroll[ends],
+            index=pd.Index(self.session_ids[:self.num_sessions], name='session'),
+            name='bankroll'
+        )
+
+    def to_dataframe(self):
+        """Return the results as a DataFrame backed by views of the stored columns"""
+        import pandas as pd
+        rows = self.num_rows
+        return pd.DataFrame({
+            "hand": self.hand[:rows],
+            "bankroll": self.bankroll[:rows],
+            "session": self.session[:rows]
+        }, copy=False)
+
+    def iter_chunks(self):
+        yield self.to_dataframe()
+
+    def __len__(self):
+        return self.num_rows
+
+class MappedResultStore(ResultStore):
+    """ResultStore whose columns live in a memory-mapped file, for runs larger than RAM
+
+    The file holds a header followed by fixed-width sections for the session,
+    hand and bankroll columns and the session index (session_ids and
+    offsets). Sections are sized for the longest possible run, and the file
+    is created sparse, so rows that are never written take no disk space.
+    Every column is a NumPy view of the mapping: the operating system pages
+    rows in and out, and reading a finished run never copies it onto the
+    Python heap.
+    """
+
+    def __init__(self, path, header, mode):
+        self.path = path
+        self.header = header
+        self.chunk_rows = MAPPED_CHUNK_ROWS
+        self.mapping = np.memmap(path, dtype=np.uint8, mode=mode)
+        for name, (dtype, offset, length) in header["sections"].items():
+            setattr(self, name, self.mapping[offset:offset + length * np.dtype(dtype).itemsize].view(dtype))
+        self.num_sessions = header["num_sessions"]
+        self.num_rows = header["num_rows"]
+
+    @classmethod
+    def create(cls, path, num_sessions, num_hands):
+        """Create a sparse result file with room for num_sessions sessions of num_hands hands, open for writing"""
+        max_rows = num_sessions * (num_hands + 1)
+        hand_dtype = np.uint16 if num_hands < np.iinfo(np.uint16).max else np.int32
+        sections, offset = {}, MAPPED_HEADER_BYTES
+        for name, dtype, length in (
+            ("session", np.uint32, max_rows), ("hand", hand_dtype, max_rows), ("bankroll", np.float32, max_rows),
+            ("session_ids", np.uint32, num_sessions), ("offsets", np.int64, num_sessions + 1)
+        ):
+            sections[name] = (np.dtype(dtype).str, offset, length)
+            # Keep every section 64-byte aligned
+            offset += -(-length * np.dtype(dtype).itemsize // 64) * 64
+        header = {
+            "version": MAPPED_VERSION, "num_hands": num_hands, "max_sessions": num_sessions,
+            "num_sessions": 0, "num_rows": 0, "sections": sections
+        }
+        with open(path, "wb") as f:
+            f.truncate(offset)
+        store = cls(path, header, "r+")
+        store.write_header()
+        return store
+
+    @classmethod
+    def open(cls, path):
+        """Open a result file read-only"""
+        with open(path, "rb") as f:
+            if f.read(len(MAPPED_MAGIC)) != MAPPED_MAGIC:
+                raise ValueError(f"{path} is not a memory-mapped result file")
+            header = json.loads(f.read(MAPPED_HEADER_BYTES - len(MAPPED_MAGIC)))
+        if header["version"] != MAPPED_VERSION:
+            raise ValueError(f"{path} is not a version {MAPPED_VERSION} result file")
+        return cls(path, header, "r")
+
+    def write_header(self):
+        self.header.update(num_sessions=self.num_sessions, num_rows=self.num_rows)
+        encoded = MAPPED_MAGIC + json.dumps(self.header).encode()
+        self.mapping[:MAPPED_HEADER_BYTES] = np.frombuffer(encoded.ljust(MAPPED_HEADER_BYTES), dtype=np.uint8)
+
+    def close(self):
+        """Record the rows written in the header, flush the mapping and return the file reopened read-only"""
+        self.write_header()
+        self.mapping.flush()
+        del self.mapping
+        return MappedResultStore.open(self.path)
+
+    def iter_chunks(self):
+        """Yield DataFrames of views of about MAPPED_CHUNK_ROWS rows each, cut at session boundaries"""
+        import pandas as pd
+        offsets = self.offsets[:self.num_sessions + 1]
+        start = 0
+        while start < self.num_rows:
+            # The session boundary at or before start + chunk_rows, or the next one if a session is longer
+            index = max(np.searchsorted(offsets, start + self.chunk_rows, side="right") - 1,
+                        np.searchsorted(offsets, start, side="right"))
+            end = int(offsets[index])
+            yield pd.DataFrame({
+                "hand": self.hand[start:end],
+                "bankroll": self.bankroll[start:end],
+                "session": self.session[start:end]
+            }, copy=False)
+            start = end
+
+class ChunkedResultWriter:
+    """Stream per-hand results to disk in fixed-size chunks while a simulation runs
+
+    Rows are appended to a CSV file and also written as .npz shards (one per
+    chunk) next to it. Chunks are cut at session boundaries, so every session
+    lives in exactly one shard and readers can work one chunk at a time.
+    """
+
+    def __init__(self, output_dir, chunk_rows, timestamp=None):
+        import pandas as pd
+        if timestamp is None:
+            import datetime
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.chunk_rows = chunk_rows
+        self.csv_path = os.path.join(output_dir, f"{timestamp}_simulation_results.csv")
+        self.shard_dir = os.path.join(output_dir, f"{timestamp}_simulation_results_chunks")
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+        self.pending = []
+        self.pending_rows = 0
+        self.num_chunks = 0
+
+        # Start the CSV with just the header so every chunk can be appended
+        pd.DataFrame(columns=list(COLUMNS)).to_csv(self.csv_path, index=False)
+
+    def add_session(self, session, bankrolls):
+        """Add one session's bankroll before the first hand and after each hand"""
+        bankrolls = np.asarray(bankrolls)
+        self.add_rows(
+            np.full(len(bankrolls), session, dtype=np.int64),
+            np.arange(len(bankrolls)),
+            bankrolls
+        )
+
+    def add_rows(self, session_ids, hands, bankrolls):
+        """Add rows for one or more complete sessions, ordered by session then hand"""
+        self.pending.append((np.asarray(hands), np.asarray(bankrolls), np.asarray(session_ids)))
+        self.pending_rows += len(session_ids)
+        if self.pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write pending rows as chunks of about chunk_rows rows each"""
+        if not self.pending:
+            return
+        hands, bankrolls, session_ids = (np.concatenate(column) for column in zip(*self.pending))
+        self.pending = []
+        self.pending_rows = 0
+
+        # Cut at the session boundary closest to every chunk_rows rows
+        boundaries = np.flatnonzero(np.diff(session_ids)) + 1
+        start = 0
+        while start < len(session_ids):
+            end = len(session_ids)
+            if end - start > self.chunk_rows:
+                candidates = boundaries[(boundaries > start) & (boundaries <= start + self.chunk_rows)]
+                if candidates.size:
+                    end = candidates[-1]
+                else:
+                    later = boundaries[boundaries > start]
+                    end = later[0] if later.size else end
+            self._write_chunk(hands[start:end], bankrolls[start:end], session_ids[start:end])
+            start = end
+
+    def _write_chunk(self, hands, bankrolls, session_ids):
+        import pandas as pd
+        chunk = pd.DataFrame({"hand": hands, "bankroll": bankrolls, "session": session_ids})
+        chunk.to_csv(self.csv_path, mode="a", header=False, index=False)
+        shard = os.path.join(self.shard_dir, f"chunk_{self.num_chunks:06d}.npz")
+        np.savez(shard, hand=hands, bankroll=bankrolls, session=session_ids)
+        self.num_chunks += 1
+
+    def close(self):
+        """Write any remaining rows and return a reader over the output"""
+        self.flush()
+        return ChunkedResults(self.csv_path, self.shard_dir)
+
+class ChunkedResults:
+    """Lazy reader over the output of a ChunkedResultWriter"""
+
+    def __init__(self, csv_path, shard_dir):
+        self.csv_path = csv_path
+        self.shard_dir = shard_dir
+        self.shards = sorted(glob.glob(os.path.join(shard_dir, "chunk_*.npz")))
+
+    def iter_chunks(self):
+        """Yield each chunk as a DataFrame, loading one shard at a time"""
+        import pandas as pd
+        for shard in self.shards:
+            with np.load(shard) as data:
+                yield pd.DataFrame({column: data[column] for column in COLUMNS})
+
+    def final_bankrolls(self):
+        """Return the final bankroll of each session, indexed by session"""
+        import pandas as pd
+        finals = [chunk.groupby('session')['bankroll'].last() for chunk in self.iter_chunks()]
+        if not finals:
+            return pd.Series(dtype=float, name='bankroll')
+        return pd.concat(finals).sort_index()
+
+    def to_dataframe(self):
+        """Load every chunk into a single DataFrame (only for results that fit in memory)"""
+        import pandas as pd
+        return pd.concat(list(self.iter_chunks()), ignore_index=True)
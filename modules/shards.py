@@ -0,0 +1,134 @@
+import glob
+import json
+import os
+import pickle
+import numpy as np
+from modules.result_cache import UNKEYED_ARGS, file_hash
+
+# Arguments that may differ between the shards of one run
+SHARD_ARGS = UNKEYED_ARGS - {"num_sessions", "summary_only"}
+
+def parse_shard(text):
+    """Parse an i/N shard argument into (i, N), with shards numbered from 1"""
+    try:
+        shard, num_shards = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"expected i/N, got {text!r}")
+    if not 1 <= shard <= num_shards:
+        raise ValueError(f"shard {shard} is not between 1 and {num_shards}")
+    return shard, num_shards
+
+def shard_range(num_sessions, shard, num_shards, unit=1):
+    """Return the (first, last) sessions of a shard, splitting sessions into num_shards contiguous ranges
+
+    Ranges are cut at multiples of unit, so with the vector engine every
+    shard plays whole batches and gets the same results as an unsharded run.
+    A shard can be empty (last < first) when there are more shards than units.
+    """
+    units = -(-num_sessions // unit)
+    first = (shard - 1) * units // num_shards * unit + 1
+    last = min(shard * units // num_shards * unit, num_sessions)
+    return first, last
+
+def shard_name(shard, num_shards):
+    return f"shard_{shard:04d}_of_{num_shards:04d}"
+
+def _write_atomic(path, write, mode="wb"):
+    temporary = f"{path}.tmp"
+    with open(temporary, mode) as f:
+        write(f)
+    os.replace(temporary, path)
+
+def write_shard(directory, args, shard, num_shards, first, last, results, summary):
+    """Write a shard's results (if any), summary accumulators and manifest
+
+    The manifest is written last, so a shard only counts as complete once
+    all of its files are in place.
+    """
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, shard_name(shard, num_shards))
+    if results is not None:
+        rows = results.num_rows
+        _write_atomic(f"{base}.npz", lambda f: np.savez(
+            f, session=results.session[:rows], hand=results.hand[:rows], bankroll=results.bankroll[:rows]
+        ))
+    _write_atomic(f"{base}.summary.pkl", lambda f: pickle.dump(summary, f))
+    manifest = {
+        "shard": shard,
+        "num_shards": num_shards,
+        "first_session": first,
+        "last_session": last,
+        "has_results": results is not None,
+        "strategy_hash": file_hash(args.strategy_file),
+        "args": vars(args)
+    }
+    _write_atomic(f"{base}.json", lambda f: json.dump(manifest, f, indent=2, default=str), mode="w")
+    return f"{base}.json"
+
+def run_config(manifest):
+    """Return the settings every shard of one run must share"""
+    config = {name: value for name, value in manifest["args"].items() if name not in SHARD_ARGS}
+    config.update(num_shards=manifest["num_shards"], strategy_hash=manifest["strategy_hash"])
+    return config
+
+def load_shards(directory):
+    """Load and check the manifests of every shard in a directory
+
+    Raises:
+        ValueError: If shards come from different runs, or any shard or
+            session is missing or duplicated
+
+    Returns:
+        list of (manifest, base path) pairs ordered by shard
+    """
+    shards = []
+    for path in sorted(glob.glob(os.path.join(directory, "shard_*_of_*.json"))):
+        with open(path) as f:
+            shards.append((json.load(f), path[:-len(".json")]))
+    if not shards:
+        raise ValueError(f"No shard manifests found in {directory}")
+
+    config = run_config(shards[0][0])
+    for manifest, base in shards[1:]:
+        if run_config(manifest) != config:
+            differing = sorted(name for name in config if run_config(manifest).get(name) != config[name])
+            raise ValueError(f"{base} is from a different run (differs in: {', '.join(differing)})")
+
+    num_shards = config["num_shards"]
+    indices = [manifest["shard"] for manifest, _ in shards]
+    missing = sorted(set(range(1, num_shards + 1)) - set(indices))
+    duplicated = sorted({index for index in indices if indices.count(index) > 1})
+    if missing or duplicated:
+        raise ValueError(f"Expected shards 1-{num_shards}: missing {missing or 'none'}, duplicated {duplicated or 'none'}")
+
+    # Shard ranges must tile sessions 1..num_sessions exactly
+    shards.sort(key=lambda shard: shard[0]["shard"])
+    next_session = 1
+    for manifest, base in shards:
+        first, last = manifest["first_session"], manifest["last_session"]
+        if last >= first and first != next_session:
+            gap = "missing" if first > next_session else "duplicated"
+            raise ValueError(f"Sessions {min(first, next_session)}-{max(first, next_session) - 1} are {gap} before {base}")
+        next_session = max(next_session, last + 1)
+    if next_session != config["num_sessions"] + 1:
+        raise ValueError(f"Sessions {next_session}-{config['num_sessions']} are missing")
+    return shards
+
+def load_shard_results(manifest, base):
+    """Return a shard's (session, hand, bankroll) arrays, checking they hold exactly its sessions once each"""
+    with np.load(f"{base}.npz") as data:
+        session, hand, bankroll = data["session"], data["hand"], data["bankroll"]
+    # Rows are ordered by session then hand, and each session starts at hand 0
+    starts = session[hand == 0]
+    expected = np.arange(manifest["first_session"], manifest["last_session"] + 1)
+    if not np.array_equal(starts, expected) or (len(session) and np.any(np.diff(session.astype(np.int64)) < 0)):
+        missing = np.setdiff1d(expected, starts)
+        duplicated = np.unique(starts[np.r_[False, np.diff(starts) == 0]]) if len(starts) else starts
+        raise ValueError(f"{base} doesn't hold sessions {expected[0] if len(expected) else '-'}-"
+                         f"{expected[-1] if len(expected) else '-'} exactly once "
+                         f"(missing {missing.tolist()[:10]}, duplicated {duplicated.tolist()[:10]})")
+    return session, hand, bankroll
+
+def load_shard_summary(base):
+    with open(f"{base}.summary.pkl", "rb") as f:
+        return pickle.load(f)
@@ -1,9 +1,32 @@
 import json
 import os
-import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import numpy as np
 from modules.card import Card, Suit, Shoe
 from modules.strategy import Strategy
 from modules.game import BlackjackGame
+from modules.vector_engine import VectorEngine
+from modules.results import ChunkedResults, MappedResultStore, ResultStore
+from modules.profiling import Profile, ProfiledBlackjackGame
+from modules.stats import SessionEstimators
+from modules.result_cache import ResultCache, cache_key
+from modules.checkpoint import Checkpointer, read_checkpoint
+from modules.shards import shard_range
+from modules.events import EventBuffer, EventRecorder, EventSink, SESSION_START, SESSION_END, ROUND_START
+
+# Bump whenever a change alters the results a given seed produces, which invalidates cached results
+ENGINE_VERSION = 3
+
+def session_seed(master_seed, session):
+    """Derive an independent seed for a session from the master seed
+    
+    Each session's shoes are shuffled only by its own generator, so a session
+    plays out identically however the sessions are spread across workers.
+    """
+    state = np.random.SeedSequence(master_seed, spawn_key=(session,)).generate_state(4)
+    return int.from_bytes(state.tobytes(), "little")
 
 class BlackjackSimulator:
     def __init__(self, args):
@@ -13,9 +36,37 @@ class BlackjackSimulator:
         self.starting_stake = args.starting_stake
         self.standard_bet = args.standard_bet
         self.verbose = args.verbose
+        self.event_log = args.event_log
+        self.event_sample = args.event_sample
+        self.event_buffer = args.event_buffer
+        self.log_events = self.verbose or self.event_log is not None or self.event_buffer > 0
+        self.event_sink = None
+        # Sink that events are written to as they happen, set only while running in this process
+        self.live_events = None
         self.debug = args.debug
+        self.workers = args.workers or os.cpu_count()
+        self.engine = args.engine
+        self.batch_size = args.batch_size
+        self.profile = args.profile
+        # Profiles of the object engine's rounds, merged per worker process id
+        self.worker_profiles = {}
+        # Without an explicit seed, draw one so the run can still be reproduced
+        self.seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
         self.strategy_file = args.strategy_file
         self.strategy = Strategy(self.strategy_file)
+        # Only seeded runs are cached, since only they can be repeated
+        self.result_cache = None
+        self.cache_key = None
+        if args.cache_dir and args.seed is not None:
+            self.result_cache = ResultCache(args.cache_dir, args.cache_size * 2**20)
+            self.cache_key = cache_key(args, self.seed, ENGINE_VERSION)
+        # Periodic checkpoints, which save the arguments with the drawn seed so a resumed run matches
+        self.checkpointer = None
+        if args.checkpoint:
+            self.checkpointer = Checkpointer(
+                args.checkpoint, dict(vars(args), seed=self.seed), args.checkpoint_sessions, args.checkpoint_seconds
+            )
+        self.resume = args.resume
         
         # Load test scenarios if in debug mode
         if self.debug:
@@ -36,68 +87,464 @@ class BlackjackSimulator:
             
         return scenarios
     
-    def run_simulation(self):
-        """Run the specified number of simulation sessions"""
-        results = []
+    def run_simulation(self, writer=None):
+        """Run the specified number of simulation sessions
+        
+        Sessions already in the result cache are reused, and only the
+        missing ones are simulated.
         
-        for session in range(1, self.num_sessions + 1):
-            if self.verbose:
-                print(f"\n=== Starting Session {session} ===\n")
+        Args:
+            writer: Optional ChunkedResultWriter to stream results to disk as
+                sessions finish, or MappedResultStore to write them into a
+                memory-mapped file, instead of collecting them in memory
                 
-            # Initialize for this session
-            shoe = Shoe(6)
+        Returns:
+            The results as a ResultStore, the ChunkedResultWriter's
+            ChunkedResults, or the MappedResultStore reopened read-only
+        """
+        # Streamed, logged and profiled runs need every session to actually be played
+        use_cache = self.result_cache is not None and writer is None and not self.log_events and not self.profile
+        results = writer if writer is not None else ResultStore(self.num_sessions, self.num_hands)
+        if self.resume is not None:
+            cached = self.resume_results(results)
+        else:
+            cached = self.load_cached_results(results) if use_cache else 0
+        
+        if self.engine == "vector":
+            self.run_vector_simulation(results, cached + 1)
+        else:
+            self.run_object_simulation(results, cached + 1, writer.chunk_rows if writer is not None else None)
+        self.checkpoint_results(results, final=True)
+            
+        if use_cache and cached < self.num_sessions:
+            self.result_cache.store_results(self.cache_key, results)
+        return writer.close() if writer is not None else results
+    
+    def run_object_simulation(self, results, first_session=1, chunk_rows=None, last_session=None):
+        """Play sessions first_session..last_session (default: the last) with the object engine, adding them to results"""
+        # The sink stays out of self until the run is over, since self is sent to worker processes
+        event_sink = None
+        if self.log_events:
+            event_sink = EventSink(self.event_log, console=self.verbose, capacity=self.event_buffer)
+            if self.workers <= 1:
+                self.live_events = event_sink
+        
+        # Keep only about a chunk of rows in flight per task when streaming
+        chunks = self.session_chunks(
+            chunk_rows // (self.num_hands + 1) if chunk_rows is not None else None,
+            sessions=range(first_session, (last_session or self.num_sessions) + 1)
+        )
+        for chunk_results, profile, events in self.map_chunks(self.run_sessions, chunks):
+            self.record_profile(profile)
+            if events is not None:
+                event_sink.extend(events)
+            for session, session_results in chunk_results:
+                results.add_session(session, session_results)
+            self.checkpoint_results(results)
+        self.close_events(event_sink)
+    
+    def checkpoint_results(self, results, final=False):
+        """Save the sessions completed so far if a checkpoint is due, or at the end of the run"""
+        if self.checkpointer is None:
+            return
+        # The last chunk may have just been saved, so the final save only writes anything new
+        if final and results.num_sessions == self.checkpointer.saved_sessions:
+            return
+        if final or self.checkpointer.due(results.num_sessions):
+            rows = results.num_rows
+            self.checkpointer.save(results.num_sessions, {
+                "results": (results.session[:rows], results.hand[:rows], results.bankroll[:rows])
+            })
+    
+    def resume_results(self, results):
+        """Add the sessions completed in the checkpoint being resumed to results, returning how many"""
+        header, payload = read_checkpoint(self.resume)
+        results.add_rows(*payload["results"])
+        print(f"Resuming after {header['sessions']} sessions from {self.resume}")
+        return header["sessions"]
+    
+    def load_cached_results(self, results):
+        """Add the cached sessions this run can reuse to results, returning how many there were"""
+        usable = self.reusable_sessions(self.result_cache.cached_sessions(self.cache_key))
+        if usable:
+            results.add_rows(*self.result_cache.load_results(self.cache_key, usable))
+            print(f"Reusing {usable} cached sessions")
+        return usable
+    
+    def reusable_sessions(self, available):
+        """Return how many of the first available cached sessions this run can reuse
+        
+        Object engine sessions don't depend on each other, so any prefix is
+        reused. Vector engine sessions are shuffled together in batches, so
+        unless the cached run had exactly this many sessions, only whole
+        batches are reused.
+        """
+        usable = min(available, self.num_sessions)
+        if self.engine == "vector" and available != self.num_sessions:
+            usable -= usable % self.batch_size
+        return usable
+    
+    def session_chunks(self, max_chunk_size=None, sessions=None):
+        """Split the sessions (default: all of them) into contiguous chunks, which keep merged results in session order"""
+        if sessions is None:
+            sessions = range(1, self.num_sessions + 1)
+        chunk_size = max(1, len(sessions))
+        if self.workers > 1:
+            chunk_size = max(1, -(-len(sessions) // (self.workers * 4)))
+        if max_chunk_size is not None:
+            chunk_size = min(chunk_size, max(1, max_chunk_size))
+        if self.checkpointer is not None:
+            # Checkpoints are saved between chunks, so no chunk may outlast the checkpoint interval
+            chunk_size = min(chunk_size, max(1, self.checkpointer.every_sessions))
+        return [sessions[i:i + chunk_size] for i in range(0, len(sessions), chunk_size)]
+    
+    def run_adaptive(self, metric, precision, confidence=0.95, batch_sessions=1000, max_sessions=1000000, progress=None):
+        """Run batches of sessions until the metric's confidence interval is narrow enough
+        
+        Only each session's final bankroll and hands played are kept, folded
+        into online estimators after every batch, so memory doesn't grow with
+        the number of sessions. Sessions are numbered consecutively across
+        batches, so the object engine plays the same sessions as a fixed run.
+        
+        Args:
+            metric: One of stats.METRICS to estimate
+            precision: Target half width of the metric's confidence interval
+            confidence: Confidence level of the interval
+            batch_sessions: Sessions run between checks of the target
+            max_sessions: Stop here even if the target hasn't been reached
+            progress: Optional callable called with (sessions, estimate, half width) after each batch
+            
+        Returns:
+            tuple: (SessionEstimators, list of (sessions, estimate, half width) after each batch)
+        """
+        estimators = SessionEstimators(self.starting_stake, self.standard_bet)
+        history = []
+        vector_batches = 0
+        while estimators.sessions < max_sessions:
+            count = min(batch_sessions, max_sessions - estimators.sessions)
+            function, chunks = self.summary_chunks(estimators.sessions + 1, count, vector_batches)
+            vector_batches += len(chunks)
+            for chunk_summary in self.map_chunks(function, chunks):
+                estimators.merge(chunk_summary)
+                
+            estimate, half_width = estimators.estimate(metric, confidence)
+            history.append((estimators.sessions, estimate, half_width))
+            if progress is not None:
+                progress(estimators.sessions, estimate, half_width)
+            if half_width <= precision:
+                break
+        return estimators, history
+    
+    def run_summary(self):
+        """Run every session keeping only online summaries of their outcomes
+        
+        Each chunk of sessions is folded into its own accumulators as sessions
+        end, in whichever process runs it, and the chunks' accumulators are
+        merged here; nothing is kept per session or per hand.
+        
+        Returns:
+            SessionEstimators of all the sessions
+        """
+        summary, cached, completed_chunks = None, 0, 0
+        if self.resume is not None:
+            header, payload = read_checkpoint(self.resume)
+            summary, cached, completed_chunks = payload["summary"], header["sessions"], payload["chunks"]
+            print(f"Resuming after {cached} sessions from {self.resume}")
+        elif self.result_cache is not None and self.checkpointer is None:
+            # Checkpoints count chunks from session 1, so checkpointed runs don't extend cached summaries
+            summary, cached = self.load_cached_summary()
+            if cached == self.num_sessions:
+                return summary
+        if summary is None:
+            summary = SessionEstimators(self.starting_stake, self.standard_bet)
+            
+        if self.resume is not None:
+            # Cut the chunks as the interrupted run did, so they merge in the same order
+            function, chunks = self.summary_chunks(1, self.num_sessions)
+            chunks = chunks[completed_chunks:]
+        else:
+            function, chunks = self.summary_chunks(cached + 1, self.num_sessions - cached, cached // self.batch_size)
+        for chunk_summary in self.map_chunks(function, chunks):
+            summary.merge(chunk_summary)
+            completed_chunks += 1
+            if self.checkpointer is not None and self.checkpointer.due(summary.sessions):
+                self.checkpointer.save(summary.sessions, {"summary": summary, "chunks": completed_chunks})
+        if self.checkpointer is not None and summary.sessions != self.checkpointer.saved_sessions:
+            self.checkpointer.save(summary.sessions, {"summary": summary, "chunks": completed_chunks})
+            
+        if self.result_cache is not None:
+            self.result_cache.store_summary(self.cache_key, summary)
+        return summary
+    
+    def run_shard(self, shard, num_shards, summary_only=False):
+        """Run one shard's share of the sessions
+        
+        Shards split the sessions into contiguous ranges (whole batches with
+        the vector engine), and sessions and batches are seeded by their
+        number, so merging the shards gives exactly the results of a single
+        run. Shards don't use the result cache.
+        
+        Returns:
+            tuple: (first session, last session, ResultStore or None when
+                summary_only, SessionEstimators of the shard's sessions)
+        """
+        first, last = shard_range(
+            self.num_sessions, shard, num_shards, self.batch_size if self.engine == "vector" else 1
+        )
+        count = max(last - first + 1, 0)
+        summary = SessionEstimators(self.starting_stake, self.standard_bet)
+        if summary_only:
+            function, chunks = self.summary_chunks(first, count, (first - 1) // self.batch_size)
+            for chunk_summary in self.map_chunks(function, chunks):
+                summary.merge(chunk_summary)
+            return first, last, None, summary
+            
+        results = ResultStore(count, self.num_hands)
+        if count:
+            if self.engine == "vector":
+                self.run_vector_simulation(results, first, last)
+            else:
+                self.run_object_simulation(results, first, last_session=last)
+        offsets = results.offsets[:results.num_sessions + 1]
+        summary.add(results.bankroll[offsets[1:] - 1], np.diff(offsets) - 1)
+        return first, last, results, summary
+    
+    def load_cached_summary(self):
+        """Return (cached SessionEstimators this run can extend, its session count), or (None, 0)
+        
+        Accumulators can't be split, so a cached summary is reused only for
+        the same number of sessions, or extended from fewer sessions (whole
+        batches, with the vector engine).
+        """
+        for sessions in reversed(self.result_cache.summary_sessions(self.cache_key)):
+            if sessions == self.num_sessions or (
+                sessions < self.num_sessions and self.reusable_sessions(sessions) == sessions
+            ):
+                print(f"Reusing the cached summary of {sessions} sessions")
+                return self.result_cache.load_summary(self.cache_key, sessions), sessions
+        return None, 0
+    
+    def summary_chunks(self, first_session, count, first_batch=0):
+        """Split sessions first_session.. into chunks for the engine's summary function
+        
+        Returns:
+            tuple: (function returning a chunk's SessionEstimators, chunks)
+        """
+        if self.engine == "vector":
+            # Vector batches are numbered across the whole run to keep their generators distinct
+            starts = range(first_session, first_session + count, self.batch_size)
+            chunks = [
+                (first_batch + index, start, min(self.batch_size, first_session + count - start))
+                for index, start in enumerate(starts)
+            ]
+            return self.run_vector_summary, chunks
+        return self.run_session_summary, self.session_chunks(sessions=range(first_session, first_session + count))
+    
+    def run_session_summary(self, sessions):
+        """Run a batch of sessions, folding each into SessionEstimators as it ends"""
+        summary = SessionEstimators(self.starting_stake, self.standard_bet)
+        for session in sessions:
+            summary.add_session(*self.run_session(session, trajectory=False))
+        return summary
+    
+    def run_vector_summary(self, batch):
+        """Simulate one vector engine batch without trajectories, returning its SessionEstimators"""
+        index, first_session, count = batch
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(0, index)))
+        engine = VectorEngine(self.strategy, self.starting_stake, self.standard_bet, self.num_hands)
+        _, hands, finals = engine.run(count, rng, first_session, trajectories=False)
+        summary = SessionEstimators(self.starting_stake, self.standard_bet)
+        summary.add(finals, hands)
+        return summary
+    
+    def run_comparison(self, strategy_files):
+        """Play every strategy on the same shoes, session by session, and compare them
+        
+        Each session's shoes come from the session's own generator, so every
+        strategy sees the same sequence of shuffled shoes (common random numbers).
+        
+        Returns:
+            StrategyComparison of the paired results
+        """
+        from modules.comparison import StrategyComparison
+        self.comparison_strategies = [Strategy(strategy_file) for strategy_file in strategy_files]
+        finals = np.empty((self.num_sessions, len(strategy_files)))
+        hands = np.empty((self.num_sessions, len(strategy_files)))
+        chunks = self.session_chunks()
+        for chunk, (chunk_finals, chunk_hands) in zip(chunks, self.map_chunks(self.run_comparison_sessions, chunks)):
+            finals[chunk.start - 1:chunk.stop - 1] = chunk_finals
+            hands[chunk.start - 1:chunk.stop - 1] = chunk_hands
+        return StrategyComparison(strategy_files, finals, hands, self.starting_stake, self.standard_bet)
+    
+    def run_comparison_sessions(self, sessions):
+        """Play a batch of sessions with every strategy, returning (final bankrolls, hands played) arrays"""
+        finals = np.empty((len(sessions), len(self.comparison_strategies)))
+        hands = np.empty((len(sessions), len(self.comparison_strategies)))
+        for row, session in enumerate(sessions):
+            for column, strategy in enumerate(self.comparison_strategies):
+                finals[row, column], hands[row, column] = self.run_session(session, strategy=strategy, trajectory=False)
+        return finals, hands
+    
+    def map_chunks(self, function, chunks):
+        """Apply function to each chunk, across worker processes if enabled, yielding results in order"""
+        if self.workers <= 1 or len(chunks) <= 1:
+            yield from map(function, chunks)
+            return
+            
+        # Bound the number of chunks in flight so finished results don't pile up in memory
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(function, chunk))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def run_vector_simulation(self, results, first_session=1, last_session=None):
+        """Run sessions first_session..last_session (default: the last) in batches on the lockstep NumPy engine, adding them to results
+        
+        first_session - 1 must be a whole number of batches, so every batch
+        keeps the index (and generator) it has in a run from session 1.
+        """
+        last_session = last_session or self.num_sessions
+        first_batch = (first_session - 1) // self.batch_size
+        batches = [
+            (first_batch + index, start, min(self.batch_size, last_session - start + 1))
+            for index, start in enumerate(range(first_session, last_session + 1, self.batch_size))
+        ]
+        for batch_result in self.map_chunks(self.run_vector_batch, batches):
+            results.add_rows(*batch_result)
+            self.checkpoint_results(results)
+    
+    def run_vector_batch(self, batch):
+        """Simulate one (index, first session, count) batch of sessions on the vector engine"""
+        index, first_session, count = batch
+        # Batch generators use two-element spawn keys, so they never collide with session seeds
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(0, index)))
+        engine = VectorEngine(self.strategy, self.starting_stake, self.standard_bet, self.num_hands)
+        return engine.run(count, rng, first_session)
+    
+    def run_sessions(self, sessions):
+        """Run a batch of sessions
+        
+        Returns:
+            tuple: ((session, bankroll after each hand) pairs, the batch's Profile or None
+                when not profiling, the batch's EventBuffer or None when events are not
+                logged or were written as they happened)
+        """
+        profile = Profile() if self.profile else None
+        events = None
+        if self.log_events:
+            # Worker processes buffer their events for the main process to write in session order
+            events = self.live_events if self.live_events is not None else EventBuffer()
+        results = [(session, self.run_session(session, profile, events)) for session in sessions]
+        return results, profile, events if events is not self.live_events else None
+    
+    def close_events(self, event_sink):
+        """Close the event sink once every batch has been recorded, keeping it for its recent events"""
+        if event_sink is not None:
+            event_sink.close()
+            self.event_sink = event_sink
+            self.live_events = None
+    
+    def record_profile(self, profile):
+        """Merge a batch's profile into the profile of the worker that ran it"""
+        if profile is None:
+            return
+        if profile.worker not in self.worker_profiles:
+            self.worker_profiles[profile.worker] = Profile(profile.worker)
+        self.worker_profiles[profile.worker].merge(profile)
+    
+    def total_profile(self):
+        """Return the profiles of every worker merged together"""
+        total = Profile(worker="all")
+        for profile in self.worker_profiles.values():
+            total.merge(profile)
+        return total
+    
+    def run_session(self, session, profile=None, events=None, strategy=None, trajectory=True):
+        """Run a single session and return the bankroll before the first hand and after each hand
+        
+        Args:
+            session: Session number, which also seeds the session's shoe
+            profile: Optional Profile to record the session's rounds into
+            events: Optional output (EventSink or EventBuffer) for the session's events
+            strategy: Strategy to play instead of the simulator's own
+            trajectory: If False, keep nothing per hand and return just
+                (final bankroll, hands played)
+        """
+        strategy = strategy or self.strategy
+        recorder = None
+        if events is not None:
+            recorder = EventRecorder(events, session)
+            recorder(SESSION_START, self.starting_stake)
+            # Rounds are numbered across sessions, so 1 in event_sample rounds is logged
+            first_round = (session - 1) * self.num_hands
+            
+        # Initialize for this session, with a shoe shuffled by the session's own generator
+        shoe = Shoe(6, rng=np.random.default_rng(session_seed(self.seed, session)))
+        if profile is None:
             game = BlackjackGame(
-                self.strategy, 
+                strategy, 
                 shoe, 
                 self.starting_stake, 
                 self.standard_bet, 
-                self.verbose
+                events=recorder
             )
-            
-            session_results = []
-            
-            # Record initial bankroll
-            session_results.append({
-                "hand": 0,
-                "bankroll": game.bankroll,
-                "session": session
-            })
-            
-            # Play the specified number of hands
-            for hand_num in range(1, self.num_hands + 1):
-                if self.verbose:
-                    print(f"\n--- Hand {hand_num} ---\n")
-                    
-                # Play a round
-                round_result = game.play_round()
-                
-                # Record the result
-                session_results.append({
-                    "hand": hand_num,
-                    "bankroll": game.bankroll,
-                    "session": session
-                })
+        else:
+            game = ProfiledBlackjackGame(
+                strategy, 
+                shoe, 
+                self.starting_stake, 
+                self.standard_bet, 
+                events=recorder, 
+                profile=profile
+            )
+        
+        # Record initial bankroll
+        session_results = [game.bankroll] if trajectory else None
+        
+        # Play the specified number of hands
+        hand_num = 0
+        for hand_num in range(1, self.num_hands + 1):
+            if recorder is not None:
+                # Only sampled rounds reach the game's recorder
+                sampled = (first_round + hand_num - 1) % self.event_sample == 0
+                game.events = recorder if sampled else None
+                recorder.round = hand_num
+                if sampled:
+                    recorder(ROUND_START, game.bankroll)
                 
-                # Check if bankroll is depleted or doubled
-                if game.bankroll <= 0:
-                    if self.verbose:
-                        print("Bankroll depleted. Ending session.")
-                    break
-                elif game.bankroll >= 2 * self.starting_stake:
-                    if self.verbose:
-                        print("Bankroll doubled! Ending session.")
-                    break
+            # Play a round on the lean path; per-hand details are never needed here
+            game.play_round_fast()
             
-            results.extend(session_results)
+            # Record the result
+            if profile is not None:
+                record_start = perf_counter()
+            if trajectory:
+                session_results.append(game.bankroll)
             
-            if self.verbose:
-                print(f"\n=== Session {session} Complete ===")
-                print(f"Final bankroll: ${game.bankroll:.2f}")
-                
-        # Convert results to DataFrame
-        results_df = pd.DataFrame(results)
+            # Check if bankroll is depleted or doubled
+            reason = None
+            if game.bankroll <= 0:
+                reason = "depleted"
+            elif game.bankroll >= 2 * self.starting_stake:
+                reason = "doubled"
+            if profile is not None:
+                profile.add("record", perf_counter() - record_start)
+            if reason is not None:
+                break
+        else:
+            reason = "complete"
         
-        return results_df
+        if recorder is not None:
+            recorder.round = None
+            recorder(SESSION_END, game.bankroll, reason)
+            
+        if not trajectory:
+            return game.bankroll, hand_num
+        return session_results
     
     def run_debug_session(self, scenario_name):
         """Run a specific test scenario for debugging"""
@@ -111,7 +558,7 @@ class BlackjackSimulator:
         shoe = Shoe(1)  # Use a single deck for testing
         
         # Clear the shoe and insert the test cards
-        shoe.cards = []
+        shoe.clear()
         shoe.insert_cards(self.test_scenarios[scenario_name])
         
         # Set up the game
@@ -133,6 +580,15 @@ class BlackjackSimulator:
         
     def save_results(self, results_df, output_dir="output"):
         """Save simulation results to files"""
+        if isinstance(results_df, ChunkedResults):
+            # Streamed results were already appended to their CSV during the run
+            print(f"Results saved to {results_df.csv_path}")
+            return results_df.csv_path
+        if isinstance(results_df, MappedResultStore):
+            # Mapped results were written to their file during the run
+            print(f"Results saved to {results_df.path}")
+            return results_df.path
+            
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
@@ -142,6 +598,8 @@ class BlackjackSimulator:
         
         # Save raw data to CSV
         output_file = os.path.join(output_dir, f"{timestamp}_simulation_results.csv")
+        if isinstance(results_df, ResultStore):
+            results_df = results_df.to_dataframe()
         results_df.to_csv(output_file, index=False)
         
         print(f"Results saved to {output_file}")
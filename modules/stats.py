@@ -0,0 +1,294 @@
+import math
+from statistics import NormalDist
+import numpy as np
+
+def z_score(confidence=0.95):
+    """Two-sided normal critical value for a confidence level"""
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+def mean_interval(values, confidence=0.95):
+    """Return (mean, half width of its confidence interval) for a sample"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return float(values.mean()) if len(values) else math.nan, math.nan
+    return float(values.mean()), z_score(confidence) * float(values.std(ddof=1)) / math.sqrt(len(values))
+
+def ratio_residuals(numerators, denominators):
+    """Return the ratio of sums and each observation's linearized contribution to its error
+
+    The ratio sum(numerators) / sum(denominators) is estimated with the
+    delta method: its variance is the variance of these residuals over n.
+    """
+    numerators = np.asarray(numerators, dtype=np.float64)
+    denominators = np.asarray(denominators, dtype=np.float64)
+    ratio = numerators.sum() / denominators.sum()
+    return float(ratio), (numerators - ratio * denominators) / denominators.mean()
+
+def ratio_interval(numerators, denominators, confidence=0.95):
+    """Return (sum(numerators) / sum(denominators), half width of its confidence interval)"""
+    ratio, residuals = ratio_residuals(numerators, denominators)
+    return ratio, mean_interval(residuals, confidence)[1]
+
+def paired_ratio_difference(numerators_a, denominators_a, numerators_b, denominators_b, confidence=0.95):
+    """Return (ratio B - ratio A, half width of its confidence interval) for paired observations"""
+    ratio_a, residuals_a = ratio_residuals(numerators_a, denominators_a)
+    ratio_b, residuals_b = ratio_residuals(numerators_b, denominators_b)
+    return ratio_b - ratio_a, mean_interval(residuals_b - residuals_a, confidence)[1]
+
+def proportion_interval(successes, count, confidence=0.95):
+    """Return (successes / count, half width of the Wilson score interval)
+
+    Unlike the normal approximation, the Wilson interval doesn't collapse
+    to zero width when no (or every) observation is a success.
+    """
+    if count == 0:
+        return math.nan, math.nan
+    z = z_score(confidence)
+    p = successes / count
+    return p, z / (1 + z * z / count) * math.sqrt(p * (1 - p) / count + z * z / (4 * count * count))
+
+class RunningStats:
+    """Welford's online mean, variance, minimum and maximum, mergeable across batches and workers"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def add_array(self, values):
+        """Add a batch of values at once"""
+        values = np.asarray(values, dtype=np.float64)
+        batch = RunningStats()
+        batch.count = len(values)
+        if batch.count:
+            batch.mean = float(values.mean())
+            batch.m2 = float(((values - batch.mean) ** 2).sum())
+            batch.minimum = float(values.min())
+            batch.maximum = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        """Combine another RunningStats into this one (Chan et al.'s parallel update)"""
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def interval(self, confidence=0.95):
+        """Return (mean, half width of its confidence interval)"""
+        return self.mean, z_score(confidence) * math.sqrt(self.variance / self.count) if self.count > 1 else math.nan
+
+class RunningRatio:
+    """Online ratio of sums, sum(x) / sum(y), with a delta-method confidence interval"""
+
+    def __init__(self):
+        self.count = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def add(self, x, y):
+        self.count += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.syy += y * y
+        self.sxy += x * y
+
+    def add_arrays(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.count += len(x)
+        self.sx += float(x.sum())
+        self.sy += float(y.sum())
+        self.sxx += float((x * x).sum())
+        self.syy += float((y * y).sum())
+        self.sxy += float((x * y).sum())
+
+    def merge(self, other):
+        self.count += other.count
+        self.sx += other.sx
+        self.sy += other.sy
+        self.sxx += other.sxx
+        self.syy += other.syy
+        self.sxy += other.sxy
+
+    def interval(self, confidence=0.95):
+        """Return (ratio, half width of its confidence interval)"""
+        if self.count < 2 or self.sy == 0:
+            return math.nan, math.nan
+        ratio = self.sx / self.sy
+        mean_y = self.sy / self.count
+        # Variance of the residuals (x - ratio * y) / mean_y, whose mean is zero
+        variance = (self.sxx - 2 * ratio * self.sxy + ratio * ratio * self.syy) / (self.count - 1) / mean_y ** 2
+        return ratio, z_score(confidence) * math.sqrt(max(variance, 0) / self.count)
+
+class ValueCounts:
+    """Exact mergeable quantiles from the number of times each distinct value was added
+
+    Session results move in multiples of half a bet, so the number of
+    distinct values grows with the spread of outcomes, not with how many
+    were added. Quantiles interpolate linearly between order statistics, as
+    numpy's percentile and pandas' median do, and counts merge by adding.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        self.counts[value] = self.counts.get(value, 0) + 1
+
+    def add_array(self, values):
+        """Add a batch of values at once"""
+        values, counts = np.unique(np.asarray(values, dtype=np.float64), return_counts=True)
+        self.count += int(counts.sum())
+        for value, count in zip(values.tolist(), counts.tolist()):
+            self.counts[value] = self.counts.get(value, 0) + count
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Return the value at quantile q (between 0 and 1)"""
+        if self.count == 0:
+            return math.nan
+        values = sorted(self.counts)
+        cumulative = np.cumsum([self.counts[value] for value in values])
+        rank = q * (self.count - 1)
+        low = math.floor(rank)
+        lower = values[int(np.searchsorted(cumulative, low, side="right"))]
+        upper = values[int(np.searchsorted(cumulative, min(low + 1, self.count - 1), side="right"))]
+        # Same arithmetic as numpy's linear interpolation, so results match to the last bit
+        fraction = rank - low
+        if fraction >= 0.5:
+            return upper - (upper - lower) * (1 - fraction)
+        return lower + (upper - lower) * fraction
+
+# Session metrics that SessionEstimators can target, with how to display them
+METRICS = {
+    "final_bankroll": "mean final bankroll",
+    "doubled": "probability of doubling the stake",
+    "profit": "probability of ending with a profit",
+    "zero": "probability of losing the whole stake",
+    "ev_per_hand": "EV per hand (fraction of the standard bet)"
+}
+
+# Final bankroll percentiles printed in the summary
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Session outcome counters, matching the summary printed after a simulation
+OUTCOMES = ("doubled", "positive", "negative", "zero", "profit")
+
+class SessionEstimators:
+    """Online accumulators of session outcomes, updated as sessions end
+
+    Holds the final bankroll's running mean, variance and range, the count of
+    each distinct final bankroll (for exact quantiles), outcome counters and the EV per hand ratio. Nothing is kept
+    per session or per hand, and accumulators from different batches or
+    worker processes merge into one.
+    """
+
+    def __init__(self, starting_stake, standard_bet):
+        self.starting_stake = starting_stake
+        self.standard_bet = standard_bet
+        self.final_bankroll = RunningStats()
+        self.quantiles = ValueCounts()
+        self.ev_per_hand = RunningRatio()
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+
+    @property
+    def sessions(self):
+        return self.final_bankroll.count
+
+    def add_session(self, final, hands):
+        """Add one session's final bankroll and hands played"""
+        self.final_bankroll.add(final)
+        self.quantiles.add(final)
+        self.ev_per_hand.add((final - self.starting_stake) / self.standard_bet, hands)
+        if final >= 2 * self.starting_stake:
+            self.counts["doubled"] += 1
+        elif final > 0:
+            self.counts["positive"] += 1
+        elif final < 0:
+            self.counts["negative"] += 1
+        else:
+            self.counts["zero"] += 1
+        if final > self.starting_stake:
+            self.counts["profit"] += 1
+
+    def add(self, finals, hands):
+        """Add the final bankrolls and hands played of a batch of sessions"""
+        finals = np.asarray(finals, dtype=np.float64)
+        self.final_bankroll.add_array(finals)
+        self.quantiles.add_array(finals)
+        self.ev_per_hand.add_arrays((finals - self.starting_stake) / self.standard_bet, hands)
+        doubled = finals >= 2 * self.starting_stake
+        self.counts["doubled"] += int(doubled.sum())
+        self.counts["positive"] += int(((finals > 0) & ~doubled).sum())
+        self.counts["negative"] += int((finals < 0).sum())
+        self.counts["zero"] += int((finals == 0).sum())
+        self.counts["profit"] += int((finals > self.starting_stake).sum())
+
+    def merge(self, other):
+        self.final_bankroll.merge(other.final_bankroll)
+        self.quantiles.merge(other.quantiles)
+        self.ev_per_hand.merge(other.ev_per_hand)
+        for outcome in OUTCOMES:
+            self.counts[outcome] += other.counts[outcome]
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """Return {percentile: final bankroll} from the final bankroll counts"""
+        return {percentile: self.quantiles.quantile(percentile / 100) for percentile in percentiles}
+
+    def to_dict(self):
+        return {
+            "sessions": self.sessions,
+            "mean": self.final_bankroll.mean,
+            "std": math.sqrt(self.final_bankroll.variance) if self.sessions > 1 else None,
+            "min": self.final_bankroll.minimum,
+            "max": self.final_bankroll.maximum,
+            "percentiles": {f"p{percentile}": value for percentile, value in self.percentiles().items()},
+            "outcomes": dict(self.counts),
+            "ev_per_hand": self.ev_per_hand.interval()[0]
+        }
+
+    def estimate(self, metric, confidence=0.95):
+        """Return (estimate, half width of its confidence interval) for one of METRICS"""
+        if metric == "final_bankroll":
+            return self.final_bankroll.interval(confidence)
+        if metric == "ev_per_hand":
+            return self.ev_per_hand.interval(confidence)
+        return proportion_interval(self.counts[metric], self.sessions, confidence)
+
+def format_value(metric, value):
+    """Format a value of one of METRICS, or an interval half width, for printing"""
+    if metric == "final_bankroll":
+        return f"${value:.2f}"
+    if metric == "ev_per_hand":
+        return f"{value * 100:.3f}%"
+    return f"{value * 100:.2f}%"
+
+def format_estimate(metric, estimate, half_width):
+    """Format an estimate of one of METRICS and its interval half width for printing"""
+    return f"{format_value(metric, estimate)} ± {format_value(metric, half_width)}"
@@ -1,31 +1,219 @@
+import contextlib
 import csv
-import pandas as pd
+import glob
+import hashlib
 import os
+from array import array
+from modules.card import CARD_VALUES
 
-class Strategy:
-    def __init__(self, strategy_file):
-        """Initialize strategy from the CSV file"""
+# Action codes, in the order of their integer encoding
+ACTIONS = ("H", "S", "D", "P", "X", "B", "U")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Hand categories (first axis of the compiled table)
+HARD = 0
+SOFT = 1
+PAIR = 2
+
+# Dealer up card columns, indexed by numerical card value - 2 (so the Ace is last)
+DEALER_COLUMNS = ("2", "3", "4", "5", "6", "7", "8", "9", "T", "A")
+
+# Second axis: hand total for hard/soft hands, card value (2-11) for pairs
+MAX_TOTAL = 21
+TABLE_SHAPE = (3, MAX_TOTAL + 1, len(DEALER_COLUMNS))
+
+# Rows a strategy table must have: hard totals, soft totals (A2-A9) and pairs
+HARD_ROWS = tuple(str(total) for total in range(5, MAX_TOTAL + 1))
+SOFT_ROWS = tuple(f"A{card}" for card in range(2, 10))
+PAIR_ROWS = tuple(f"{rank}{rank}" for rank in ("2", "3", "4", "5", "6", "7", "8", "9", "T", "A"))
+STRATEGY_ROWS = HARD_ROWS + SOFT_ROWS + PAIR_ROWS
+
+# Compiled strategy files: magic, version, SHA-256 of the CSV, then one action code per table cell
+COMPILED_MAGIC = b"BJSTRAT"
+COMPILED_VERSION = 1
+COMPILED_HEADER_BYTES = len(COMPILED_MAGIC) + 1 + 32
+COMPILED_TABLE_BYTES = TABLE_SHAPE[0] * TABLE_SHAPE[1] * TABLE_SHAPE[2]
+
+class StrategyError(ValueError):
+    """A strategy table is incomplete or malformed; the message lists every problem found"""
+
+def read_strategy_csv(strategy_file):
+    """Read a strategy CSV into (dealer columns, [(line number, row key, actions)])
+    
+    The table is small and plain, so the csv module reads it without the
+    cost of importing pandas.
+    """
+    with open(strategy_file, newline="") as f:
+        reader = csv.reader(f)
+        columns = [column.strip() for column in next(reader, [""])[1:]]
+        rows = [
+            (reader.line_num, row[0].strip(), [action.strip() for action in row[1:]])
+            for row in reader if row
+        ]
+    return columns, rows
+
+def validate_strategy(columns, rows):
+    """Return every problem that makes a strategy table incomplete or malformed, or an empty list
+    
+    A table needs the dealer columns 2-9, T and A, the hard total rows 5-21,
+    the soft rows A2-A9 and a row for every pair, each with one valid action
+    code per dealer column.
+    """
+    problems = []
+    missing_columns = [column for column in DEALER_COLUMNS if column not in columns]
+    unknown_columns = [column for column in columns if column not in DEALER_COLUMNS]
+    duplicated_columns = sorted({column for column in columns if columns.count(column) > 1})
+    if missing_columns:
+        problems.append(f"missing dealer columns: {', '.join(missing_columns)}")
+    if unknown_columns:
+        problems.append(f"unknown dealer columns: {', '.join(repr(column) for column in unknown_columns)}")
+    if duplicated_columns:
+        problems.append(f"duplicated dealer columns: {', '.join(duplicated_columns)}")
+    
+    seen = set()
+    for line, row_key, actions in rows:
+        if row_key not in STRATEGY_ROWS:
+            problems.append(f"line {line}: unknown row {row_key!r}")
+        elif row_key in seen:
+            problems.append(f"line {line}: duplicated row {row_key}")
+        seen.add(row_key)
+        if len(actions) != len(columns):
+            problems.append(f"line {line}: row {row_key} has {len(actions)} actions for {len(columns)} dealer columns")
+        for column, action in zip(columns, actions):
+            if action not in ACTION_CODES:
+                problems.append(f"line {line}: row {row_key}, dealer {column}: invalid action {action!r} "
+                                f"(expected one of {', '.join(ACTIONS)})")
+    
+    missing_rows = [row_key for row_key in STRATEGY_ROWS if row_key not in seen]
+    if missing_rows:
+        problems.append(f"missing rows: {', '.join(missing_rows)}")
+    return problems
+
+def compiled_path(strategy_file, digest):
+    """Return the path of a strategy CSV's compiled file, next to it and keyed by its content hash"""
+    return f"{os.path.splitext(strategy_file)[0]}.{digest.hex()[:16]}.compiled"
+
+def load_compiled_strategy(strategy_file):
+    """Return the CompiledStrategy of a strategy CSV, compiling and saving it unless an up-to-date compiled file exists
+    
+    Raises:
+        FileNotFoundError: If the strategy file doesn't exist
+        StrategyError: If the table is incomplete or malformed
+    """
+    if not os.path.exists(strategy_file):
+        raise FileNotFoundError(f"Strategy file not found at: {os.path.abspath(strategy_file)}")
+    with open(strategy_file, "rb") as f:
+        digest = hashlib.sha256(f.read()).digest()
+    path = compiled_path(strategy_file, digest)
+    compiled = CompiledStrategy.read(path, digest)
+    if compiled is None:
+        columns, rows = read_strategy_csv(strategy_file)
+        problems = validate_strategy(columns, rows)
+        if problems:
+            raise StrategyError(f"Invalid strategy table {strategy_file}:\n  " + "\n  ".join(problems))
+        compiled = CompiledStrategy.compile({row_key: dict(zip(columns, actions)) for _, row_key, actions in rows})
+        compiled.write(strategy_file, digest)
+    return compiled
+
+class CompiledStrategy:
+    """Dense integer lookup table built once from a validated strategy table
+    
+    Actions are stored as codes into ACTIONS in a flat immutable byte string
+    indexed by (hand category, total or pair value, dealer up card index).
+    Every row key mapping and default action of the original lookup is
+    resolved here, so a lookup is a single index calculation. The table is
+    saved to a compiled file that loads without parsing or validating the
+    CSV again, and is only COMPILED_TABLE_BYTES long, so worker processes
+    receive it with the simulator instead of loading the strategy
+    themselves.
+    """
+    
+    def __init__(self, table):
+        self.table = table
+    
+    @classmethod
+    def compile(cls, strategy_table):
+        """Build the table from a validated {row key: {dealer column: action}} strategy table"""
+        codes = array("b", [0] * COMPILED_TABLE_BYTES)
+        for index in range(MAX_TOTAL + 1):
+            # Hard totals: 5 and below play like 5, 21 and above like 21
+            row_key = str(min(max(index, 5), MAX_TOTAL))
+            default = "S" if index >= 17 else "H"
+            cls._fill_row(codes, strategy_table, HARD, index, row_key, default)
+            
+            # Soft totals: A,2 through A,9 have their own rows, soft 21 uses the hard row
+            if index == MAX_TOTAL:
+                row_key = str(index)
+            elif 13 <= index <= 20:
+                row_key = f"A{index - 11}"
+            else:
+                row_key = None
+            cls._fill_row(codes, strategy_table, SOFT, index, row_key, default)
+            
+            # Pairs, keyed by the value of one card (10 for any ten-value card, 11 for aces)
+            if 2 <= index <= 11:
+                rank = "A" if index == 11 else "T" if index == 10 else str(index)
+                row_key = f"{rank}{rank}"
+            else:
+                row_key = None
+            cls._fill_row(codes, strategy_table, PAIR, index, row_key, "S")
+        return cls(codes.tobytes())
+    
+    @staticmethod
+    def _fill_row(codes, strategy_table, category, index, row_key, default):
+        """Fill one (category, index) row; rows no hand can reach (row_key None) get the default action"""
+        offset = (category * TABLE_SHAPE[1] + index) * TABLE_SHAPE[2]
+        for dealer_index, column in enumerate(DEALER_COLUMNS):
+            action = strategy_table[row_key][column] if row_key is not None else default
+            codes[offset + dealer_index] = ACTION_CODES[action]
+    
+    @classmethod
+    def read(cls, path, digest):
+        """Load a compiled file, or return None if it's missing, stale or damaged"""
         try:
-            self.strategy_table = self.load_strategy(strategy_file)
-            print(f"Successfully loaded strategy from {strategy_file}")
-            # Print the first few rows to verify
-            print(f"Strategy table shape: {self.strategy_table.shape}")
-        except Exception as e:
-            print(f"Error loading strategy file: {e}")
-            print(f"Looking for file at: {os.path.abspath(strategy_file)}")
-            raise
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        header = COMPILED_MAGIC + bytes([COMPILED_VERSION]) + digest
+        table = data[COMPILED_HEADER_BYTES:]
+        if (not data.startswith(header) or len(table) != COMPILED_TABLE_BYTES
+                or max(table) >= len(ACTIONS)):
+            return None
+        return cls(table)
+    
+    def write(self, strategy_file, digest):
+        """Save the table to the strategy CSV's compiled file, removing those of earlier versions of the CSV
         
-    def load_strategy(self, strategy_file):
-        """Load the strategy table from a CSV file"""
-        if not os.path.exists(strategy_file):
-            raise FileNotFoundError(f"Strategy file not found at: {os.path.abspath(strategy_file)}")
-            
+        Compiling is only a cache, so a directory that can't be written to is
+        skipped.
+        """
+        path = compiled_path(strategy_file, digest)
+        temporary = f"{path}.{os.getpid()}.tmp"
         try:
-            df = pd.read_csv(strategy_file, index_col=0)
-            print(f"Successfully loaded strategy from {strategy_file}")
-            return df
-        except Exception as e:
-            raise Exception(f"Error parsing strategy file {strategy_file}: {e}")
+            with open(temporary, "wb") as f:
+                f.write(COMPILED_MAGIC + bytes([COMPILED_VERSION]) + digest + self.table)
+            os.replace(temporary, path)
+        except OSError:
+            return
+        stem = glob.escape(os.path.splitext(strategy_file)[0])
+        for stale in glob.glob(f"{stem}.{'[0-9a-f]' * 16}.compiled"):
+            if stale != path:
+                with contextlib.suppress(OSError):
+                    os.remove(stale)
+    
+    def lookup(self, category, index, dealer_index):
+        """Return the action code for a hand category, total (or pair value) and dealer up card index"""
+        if index > MAX_TOTAL:
+            index = MAX_TOTAL
+        return self.table[(category * TABLE_SHAPE[1] + index) * TABLE_SHAPE[2] + dealer_index]
+
+class Strategy:
+    def __init__(self, strategy_file):
+        """Load the strategy from its compiled file, compiling and validating the CSV first if needed"""
+        self.strategy_file = strategy_file
+        self.compiled = load_compiled_strategy(strategy_file)
+        print(f"Successfully loaded strategy from {strategy_file}")
     
     def get_action(self, player_hand, dealer_upcard):
         """
@@ -33,71 +221,20 @@ class Strategy:
         
         Args:
             player_hand: The player's hand
-            dealer_upcard: The dealer's face-up card
+            dealer_upcard: The dealer's face-up card code
             
         Returns:
             str: The action to take (H, S, D, P, X, B, U)
         """
-        # Convert face cards to 'T' for the dealer's upcard
-        dealer_value = dealer_upcard.value
-        if dealer_value in ["J", "Q", "K"]:
-            dealer_value = "T"
-            
-        # Handle pairs
-        if player_hand.is_pair():
-            card_value = player_hand.cards[0].value
-            # For face cards and 10s
-            if card_value in ["J", "Q", "K"]:
-                card_value = "T"
-                
-            row_key = f"{card_value}{card_value}"
-                
-            try:
-                return self.strategy_table.loc[row_key, dealer_value]
-            except KeyError:
-                print(f"KeyError: Pair lookup failed for row_key={row_key}, dealer_value={dealer_value}")
-                print(f"Available row keys: {self.strategy_table.index.tolist()}")
-                print(f"Available column keys: {self.strategy_table.columns.tolist()}")
-                return "S"  # Default to stand if lookup fails
-        
-        # Handle soft totals (Ace counted as 11)
-        elif player_hand.is_soft():
-            hand_value = player_hand.get_value()
-            
-            # For soft 20 (A,9) and soft 21 (A,10), use hard total strategy
-            if hand_value >= 20:
-                row_key = str(hand_value)
-            # For hands like A,2 through A,9
-            elif 13 <= hand_value <= 19:
-                non_ace_value = hand_value - 11
-                row_key = f"A{non_ace_value}"
-                
-            try:
-                return self.strategy_table.loc[row_key, dealer_value]
-            except KeyError:
-                print(f"KeyError: Soft total lookup failed for row_key={row_key}, dealer_value={dealer_value}")
-                print(f"Available row keys: {self.strategy_table.index.tolist()}")
-                if hand_value >= 17:
-                    return "S"  # Stand on soft 17+
-                else:
-                    return "H"  # Hit on soft 16-
+        return ACTIONS[self.get_action_code(player_hand, dealer_upcard)]
+    
+    def get_action_code(self, player_hand, dealer_upcard):
+        """Determine the action for a hand as an integer code (index into ACTIONS)"""
+        dealer_index = CARD_VALUES[dealer_upcard] - 2
         
-        # Handle hard totals
+        if player_hand.pair:
+            return self.compiled.lookup(PAIR, CARD_VALUES[player_hand.cards[0]], dealer_index)
+        elif player_hand.soft:
+            return self.compiled.lookup(SOFT, player_hand.value, dealer_index)
         else:
-            hand_value = player_hand.get_value()
-            row_key = str(hand_value)
-            
-            # Use appropriate row based on hand value
-            if hand_value <= 8:
-                row_key = "8"
-            elif hand_value >= 21:
-                row_key = "21"
-                
-            try:
-                return self.strategy_table.loc[row_key, dealer_value]
-            except KeyError:
-                print(f"KeyError: Hard total lookup failed for row_key={row_key}, dealer_value={dealer_value}")
-                if hand_value >= 17:
-                    return "S"  # Stand on 17+
-                else:
-                    return "H"  # Hit on 16-
+            return self.compiled.lookup(HARD, player_hand.value, dealer_index)
@@ -0,0 +1,493 @@
+import copy
+import numpy as np
+from modules.card import RANK_VALUES, SUITS
+from modules.strategy import ACTION_CODES, HARD, SOFT, PAIR, MAX_TOTAL, TABLE_SHAPE
+
+HIT = ACTION_CODES["H"]
+STAND = ACTION_CODES["S"]
+DOUBLE = ACTION_CODES["D"]          # Double, or stand if not allowed
+SPLIT = ACTION_CODES["P"]
+SURRENDER = ACTION_CODES["X"]       # Surrender, or hit if not allowed
+DOUBLE_OR_HIT = ACTION_CODES["B"]
+SURRENDER_OR_STAND = ACTION_CODES["U"]
+
+# Outside the per-hand slots, a hand is one code: its hard total (aces counted as 1) plus
+# ACE_CODE per ace, so adding a card adds the card's code. Codes cover hard totals below
+# ACE_CODE and up to 31 aces, more than any hand (or a window of cards past a stop) reaches.
+ACE_CODE = 128
+NUM_CODES = ACE_CODE * 32
+CARD_CODES = np.array([0, 0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 1 + ACE_CODE], dtype=np.int16)  # Indexed by card value
+BLACKJACK_CODE = ACE_CODE + 11
+
+# Soft-adjusted value of every hand code, and whether the dealer stands on it (hitting soft 17)
+HAND_HARD = np.arange(NUM_CODES) % ACE_CODE
+HAND_SOFT = (np.arange(NUM_CODES) >= ACE_CODE) & (HAND_HARD + 10 <= 21)
+HAND_VALUES = np.where(HAND_SOFT, HAND_HARD + 10, HAND_HARD)
+DEALER_STANDS = (HAND_VALUES > 17) | ((HAND_VALUES == 17) & ~HAND_SOFT)
+
+# What a hand of three or more cards does next: keep hitting, stop, or (a surrender that's
+# no longer allowed) hit once more and stop
+HIT_CONTINUES = 0
+HIT_STOPS = 1
+HIT_ONCE = 2
+
+# Cards looked ahead at once when resolving a run of player hits or the dealer's draws;
+# the few hands that need more continue with the next window
+HIT_WINDOW = 4
+DEALER_WINDOW = 5
+
+class VectorEngine:
+    """Lockstep NumPy engine that plays many sessions at once
+
+    Every session's shoe, hands and bankroll live in arrays with one row per
+    session. Each step, all active sessions are dealt and make their first
+    decision at once; runs of hits and the dealer's draws are then resolved
+    in bulk by looking up every prefix of a window of the next cards in the
+    shoe, following the same rules (and draw order) as
+    BlackjackGame.play_round. Rounds with a split, a few percent, wait and
+    are played together, one decision at a time over per-hand slots, while
+    the other sessions play on. Sessions leave the active set on the same
+    stop conditions as BlackjackSimulator.run_session.
+    """
+
+    def __init__(self, strategy, starting_stake, standard_bet, num_hands, num_decks=6):
+        self.table = np.frombuffer(strategy.compiled.table, dtype=np.int8).reshape(TABLE_SHAPE)
+        # Hard/soft strategy action of every hand code, then the hit run outcome of hands of
+        # three or more cards, both flattened and indexed by dealer up card index * NUM_CODES + code
+        actions = self.table[np.where(HAND_SOFT, SOFT, HARD), np.minimum(HAND_VALUES, MAX_TOTAL)].T
+        busted = HAND_HARD > 21
+        self.actions = actions.ravel()
+        self.hit_outcomes = np.where(
+            busted | (actions == STAND) | (actions == DOUBLE) | (actions == SURRENDER_OR_STAND), HIT_STOPS,
+            np.where(actions == SURRENDER, HIT_ONCE, HIT_CONTINUES)
+        ).astype(np.int8).ravel()
+        self.starting_stake = starting_stake
+        self.standard_bet = standard_bet
+        self.num_hands = num_hands
+        self.num_decks = num_decks
+        # Shoes hold numerical card values (2-11); suits don't matter to the game
+        self.template = np.tile(np.array(RANK_VALUES * len(SUITS), dtype=np.int8), num_decks)
+        self.reshuffle_threshold = num_decks * 52 * 0.1
+
+    def run(self, num_sessions, rng, first_session=1, trajectories=True):
+        """Simulate sessions first_session.. together
+
+        Returns:
+            tuple: (session, hand, bankroll) arrays, ordered by session then hand;
+                with trajectories=False, only each session's final row
+        """
+        self.rng = rng
+        n = num_sessions
+        rows = np.arange(n)
+
+        self.shoes = self._new_shoes(n)
+        self.cursor = np.zeros(n, dtype=np.int64)
+        self.bankroll = np.full(n, self.starting_stake, dtype=np.float64)
+
+        session_ids = [rows + first_session]
+        hand_nums = [np.zeros(n, dtype=np.int64)]
+        bankrolls = [self.bankroll.copy()]
+
+        hands_played = np.zeros(n, dtype=np.int64)
+
+        # Sessions are independent, so a session whose round has a split waits (see
+        # _play_round) while the others play on; waiting sessions are played together
+        # once there are as many of them as sessions that just played a round
+        active = rows if self.num_hands > 0 else rows[:0]
+        waiting = rows[:0]
+        while active.size or waiting.size:
+            finished = rows[:0]
+            if active.size:
+                kept = self._play_round(active)
+                finished, waiting = active[kept], np.concatenate([waiting, active[~kept]])
+            if waiting.size and waiting.size >= active.size:
+                self._play_split_round(waiting)
+                finished, waiting = np.concatenate([finished, waiting]), rows[:0]
+
+            hands_played[finished] += 1
+            if trajectories:
+                session_ids.append(finished + first_session)
+                hand_nums.append(hands_played[finished])
+                bankrolls.append(self.bankroll[finished])
+
+            # Drop sessions whose bankroll is depleted or doubled, or that played every hand
+            bankroll = self.bankroll[finished]
+            active = finished[(bankroll > 0) & (bankroll < 2 * self.starting_stake)
+                              & (hands_played[finished] < self.num_hands)]
+
+        if not trajectories:
+            return rows + first_session, hands_played, self.bankroll.copy()
+
+        session_ids = np.concatenate(session_ids)
+        hand_nums = np.concatenate(hand_nums)
+        bankrolls = np.concatenate(bankrolls)
+        order = np.lexsort((hand_nums, session_ids))
+        return session_ids[order], hand_nums[order], bankrolls[order]
+
+    def _new_shoes(self, count):
+        """Shuffle count fresh shoes in one batched call"""
+        return self.rng.permuted(np.tile(self.template, (count, 1)), axis=1)
+
+    def _allocate_hands(self, n, slots):
+        """Allocate per-hand state with room for the given number of hands per session"""
+        self.hard = np.zeros((n, slots), dtype=np.int16)     # Total with aces counted as 1
+        self.aces = np.zeros((n, slots), dtype=np.int8)
+        self.ncards = np.zeros((n, slots), dtype=np.int8)
+        self.first = np.zeros((n, slots), dtype=np.int8)     # Values of the first two cards, for pairs
+        self.second = np.zeros((n, slots), dtype=np.int8)
+        self.bet = np.zeros((n, slots), dtype=np.float64)
+        self.doubled = np.zeros((n, slots), dtype=bool)
+        self.surrendered = np.zeros((n, slots), dtype=bool)
+        self.split = np.zeros((n, slots), dtype=bool)
+        self.split_aces = np.zeros((n, slots), dtype=bool)
+        self.num_player_hands = np.zeros(n, dtype=np.int64)
+        self.current = np.zeros(n, dtype=np.int64)
+        self.dealer_hard = np.zeros(n, dtype=np.int16)
+        self.dealer_aces = np.zeros(n, dtype=np.int8)
+        self.upcard = np.zeros(n, dtype=np.int8)
+
+    def _grow_hands(self):
+        """Double the number of hand slots (only needed after repeated re-splits)"""
+        for name in ("hard", "aces", "ncards", "first", "second", "bet",
+                     "doubled", "surrendered", "split", "split_aces"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)], axis=1))
+
+    def _window(self, rows, cursor, width):
+        """Return the next width cards of each session's shoe from cursor, one row per card
+
+        Cards past the end of a shoe are another shoe's; they only matter if taken,
+        which _advance rejects.
+        """
+        positions = rows * self.shoes.shape[1] + cursor + np.arange(width)[:, None]
+        return self.shoes.ravel().take(positions, mode="clip")
+
+    def _advance(self, cursor, taken):
+        """Return cursor moved past taken cards, checking the shoe had them"""
+        cursor = cursor + taken
+        if cursor.size and cursor.max() > self.shoes.shape[1]:
+            raise ValueError("No cards left in the shoe")
+        return cursor
+
+    def _hit_run(self, rows, cursor, codes, dealer_offsets):
+        """Hit each given hand, then keep deciding with the strategy until it stops
+
+        Hands with three or more cards can only hit or stand (see
+        HIT_CONTINUES and the codes after it), so the outcome of every
+        prefix of a window of the next cards is one table lookup.
+
+        Returns:
+            tuple: (code, cursor) of each hand once it stops
+        """
+        pending = np.arange(rows.size)
+        while pending.size:
+            cards = self._window(rows[pending], cursor[pending], HIT_WINDOW + 1)
+            # Hand after each card of the window; a hit once needs the card after the last decision
+            states = np.cumsum(CARD_CODES[cards], axis=0, dtype=np.int16)
+            states += codes[pending]
+            outcomes = self.hit_outcomes.take(dealer_offsets[pending] + states[:HIT_WINDOW])
+            position = np.arange(pending.size)
+            end = (outcomes != HIT_CONTINUES).argmax(axis=0)
+            resolved = outcomes[end, position] != HIT_CONTINUES
+            end[~resolved] = HIT_WINDOW - 1
+            # Index of the last card taken
+            last = end + (outcomes[end, position] == HIT_ONCE)
+            codes[pending] = states[last, position]
+            cursor[pending] = self._advance(cursor[pending], last + 1)
+            pending = pending[~resolved]
+        return codes, cursor
+
+    def _dealer_draws(self, rows, cursor, codes):
+        """Draw cards to each given dealer hand until it stands (hitting soft 17)
+
+        Returns:
+            tuple: (code, cursor) of each dealer hand once it stands
+        """
+        pending = np.flatnonzero(~DEALER_STANDS[codes])
+        while pending.size:
+            cards = self._window(rows[pending], cursor[pending], DEALER_WINDOW)
+            states = np.cumsum(CARD_CODES[cards], axis=0, dtype=np.int16)
+            states += codes[pending]
+            stands = DEALER_STANDS[states]
+            position = np.arange(pending.size)
+            last = stands.argmax(axis=0)
+            resolved = stands[last, position]
+            last[~resolved] = DEALER_WINDOW - 1
+            codes[pending] = states[last, position]
+            cursor[pending] = self._advance(cursor[pending], last + 1)
+            pending = pending[~resolved]
+        return codes, cursor
+
+    def _draw(self, rows):
+        """Draw the next card from the shoe of each of the given sessions"""
+        position = self.cursor[rows]
+        if position.size and position.max() >= self.shoes.shape[1]:
+            raise ValueError("No cards left in the shoe")
+        self.cursor[rows] = position + 1
+        return self.shoes[rows, position]
+
+    def _add_card(self, rows, slots, values):
+        """Add one card to hand slot slots[i] of session rows[i]"""
+        count = self.ncards[rows, slots]
+        self.first[rows, slots] = np.where(count == 0, values, self.first[rows, slots])
+        self.second[rows, slots] = np.where(count == 1, values, self.second[rows, slots])
+        self.hard[rows, slots] += np.where(values == 11, 1, values)
+        self.aces[rows, slots] += values == 11
+        self.ncards[rows, slots] = count + 1
+
+    def _add_dealer_card(self, rows, values):
+        self.dealer_hard[rows] += np.where(values == 11, 1, values)
+        self.dealer_aces[rows] += values == 11
+
+    def _play_round(self, rows):
+        """Play one round for every session in rows
+
+        Rounds are played on per-session arrays holding the one player hand.
+        Sessions that split are left untouched, to be played from the deal by
+        _play_split_round, so they draw the same cards either way.
+
+        Returns:
+            ndarray: Mask of the sessions whose round was played (didn't split)
+        """
+        # Reshuffle shoes with less than 10% of the cards left
+        remaining = self.shoes.shape[1] - self.cursor[rows]
+        reshuffle = rows[remaining < self.reshuffle_threshold]
+        if reshuffle.size:
+            self.shoes[reshuffle] = self._new_shoes(reshuffle.size)
+            self.cursor[reshuffle] = 0
+
+        # Place the standard bet and deal in the traditional order: player, dealer, player, dealer
+        bet = np.minimum(self.standard_bet, self.bankroll[rows])
+        bankroll = self.bankroll[rows] - bet
+        cursor = self.cursor[rows]
+        cards = self._window(rows, cursor, 4)
+        cursor = self._advance(cursor, 4)
+        first, upcard, second = cards[0], cards[1], cards[2]
+        card_codes = CARD_CODES[cards]
+        player = card_codes[0] + card_codes[2]
+        dealer = card_codes[1] + card_codes[3]
+        dealer_blackjack = dealer == BLACKJACK_CODE
+        dealer_index = upcard - 2
+        dealer_offsets = dealer_index.astype(np.int64) * NUM_CODES
+
+        # First decision, with doubling, splitting and surrender allowed
+        pair = first == second
+        action = np.where(pair, self.table[PAIR, first, dealer_index], self.actions.take(dealer_offsets + player))
+        funds = bankroll >= bet
+        do_split = (action == SPLIT) & pair & funds
+        do_double = ((action == DOUBLE) | (action == DOUBLE_OR_HIT)) & funds
+        surrendered = (action == SURRENDER) | (action == SURRENDER_OR_STAND)
+        hitting = ((action == HIT) | ((action == SPLIT) & ~do_split)
+                   | ((action == DOUBLE_OR_HIT) & ~do_double))
+
+        doubling = np.flatnonzero(do_double)
+        if doubling.size:
+            bankroll[doubling] -= bet[doubling]
+            bet[doubling] *= 2
+            player[doubling] += CARD_CODES[self._window(rows[doubling], cursor[doubling], 1)[0]]
+            cursor[doubling] = self._advance(cursor[doubling], 1)
+        bankroll[surrendered] += bet[surrendered] / 2
+        hitters = np.flatnonzero(hitting)
+        if hitters.size:
+            player[hitters], cursor[hitters] = self._hit_run(
+                rows[hitters], cursor[hitters], player[hitters], dealer_offsets[hitters]
+            )
+
+        # Play the dealer's hand if the player's hand is still live
+        player_value = HAND_VALUES[player]
+        live = (player_value <= 21) & ~surrendered & ~do_split
+        dealing = np.flatnonzero(live & ~dealer_blackjack)
+        if dealing.size:
+            dealer[dealing], cursor[dealing] = self._dealer_draws(rows[dealing], cursor[dealing], dealer[dealing])
+
+        # Evaluate the player's hand
+        player_blackjack = ~hitting & ~do_double & (player == BLACKJACK_CODE)
+        dealer_value = HAND_VALUES[dealer]
+        dealer_busted = dealer_value > 21
+
+        dealer_bust_win = live & dealer_busted
+        standing = live & ~dealer_busted
+        blackjack_win = standing & player_blackjack & ~dealer_blackjack
+        compared = standing & ~blackjack_win & ~(dealer_blackjack & ~player_blackjack)
+        win = compared & (player_value > dealer_value)
+        push = compared & (player_value == dealer_value)
+        bankroll += (np.where(dealer_bust_win | win, 2 * bet, 0)
+                     + np.where(blackjack_win, 2.5 * bet, 0)
+                     + np.where(push, bet, 0))
+
+        kept = ~do_split
+        self.bankroll[rows[kept]] = bankroll[kept]
+        self.cursor[rows[kept]] = cursor[kept]
+        return kept
+
+    def _play_split_round(self, rows):
+        """Play one round for sessions whose first decision is a split
+
+        The sessions' shoes, cursors and bankrolls are copied to an engine
+        of their own, so its per-hand slots hold only these sessions.
+        """
+        split = copy.copy(self)
+        split.shoes, split.cursor, split.bankroll = self.shoes[rows], self.cursor[rows], self.bankroll[rows]
+        split._allocate_hands(rows.size, 8)
+        split._play_slots(np.arange(rows.size))
+        self.cursor[rows] = split.cursor
+        self.bankroll[rows] = split.bankroll
+
+    def _play_slots(self, rows):
+        """Play one round for every session in rows, one decision at a time over hand slots"""
+        # Place the standard bet
+        bet = np.minimum(self.standard_bet, self.bankroll[rows])
+        self.bankroll[rows] -= bet
+        self.bet[rows, 0] = bet
+        self.num_player_hands[rows] = 1
+        self.current[rows] = 0
+
+        # Deal in the traditional order: player, dealer, player, dealer
+        first_slot = np.zeros(rows.size, dtype=np.int64)
+        self._add_card(rows, first_slot, self._draw(rows))
+        self.upcard[rows] = self._draw(rows)
+        self._add_dealer_card(rows, self.upcard[rows])
+        self._add_card(rows, first_slot, self._draw(rows))
+        self._add_dealer_card(rows, self._draw(rows))
+        dealer_blackjack = (self.dealer_hard[rows] == 11) & (self.dealer_aces[rows] > 0)
+
+        # Play the player's hands, one decision per step for every session still deciding
+        playing = rows
+        while playing.size:
+            playing = self._player_step(playing)
+
+        # Play the dealer's hand if any player hand is still live
+        slots = np.arange(self.hard.shape[1])
+        valid = slots < self.num_player_hands[rows, None]
+        busted = self.hard[rows] > 21
+        live = valid & ~busted & ~self.surrendered[rows]
+        dealing = rows[live.any(axis=1) & ~dealer_blackjack]
+        codes, self.cursor[dealing] = self._dealer_draws(
+            dealing, self.cursor[dealing], self.dealer_hard[dealing] + ACE_CODE * self.dealer_aces[dealing].astype(np.int16)
+        )
+        self.dealer_aces[dealing], self.dealer_hard[dealing] = np.divmod(codes, ACE_CODE)
+
+        # Evaluate each player hand
+        hard = self.hard[rows]
+        soft = (self.aces[rows] > 0) & (hard + 10 <= 21)
+        player_value = np.where(soft, hard + 10, hard)
+        player_blackjack = (self.ncards[rows] == 2) & (player_value == 21)
+        dealer_hard = self.dealer_hard[rows]
+        dealer_soft = (self.dealer_aces[rows] > 0) & (dealer_hard + 10 <= 21)
+        dealer_value = np.where(dealer_soft, dealer_hard + 10, dealer_hard)[:, None]
+        dealer_busted = (dealer_hard > 21)[:, None]
+        dealer_blackjack = dealer_blackjack[:, None]
+        bet = self.bet[rows]
+
+        dealer_bust_win = live & dealer_busted
+        standing = live & ~dealer_busted
+        blackjack_win = standing & player_blackjack & ~dealer_blackjack
+        compared = standing & ~blackjack_win & ~(dealer_blackjack & ~player_blackjack)
+        win = compared & (player_value > dealer_value)
+        push = compared & (player_value == dealer_value)
+        returned = (np.where(dealer_bust_win | win, 2 * bet, 0)
+                    + np.where(blackjack_win, 2.5 * bet, 0)
+                    + np.where(push, bet, 0))
+        self.bankroll[rows] += returned.sum(axis=1)
+
+    def _player_step(self, rows):
+        """Make one strategy decision for the current hand of each session in rows
+
+        Returns:
+            ndarray: The sessions that still have player decisions to make
+        """
+        slots = self.current[rows]
+        hard = self.hard[rows, slots]
+        ncards = self.ncards[rows, slots]
+        first = self.first[rows, slots]
+        pair = (ncards == 2) & (first == self.second[rows, slots])
+        soft = (self.aces[rows, slots] > 0) & (hard + 10 <= 21)
+        total = np.minimum(np.where(soft, hard + 10, hard), MAX_TOTAL)
+        category = np.where(pair, PAIR, np.where(soft, SOFT, HARD))
+        action = self.table[category, np.where(pair, first, total), self.upcard[rows] - 2]
+
+        bet = self.bet[rows, slots]
+        doubled = self.doubled[rows, slots]
+        surrendered = self.surrendered[rows, slots]
+        funds = self.bankroll[rows] >= bet
+        two_cards = (ncards == 2) & ~doubled & ~surrendered
+
+        do_double = ((action == DOUBLE) | (action == DOUBLE_OR_HIT)) & two_cards & funds
+        do_split = (action == SPLIT) & pair & ~doubled & ~surrendered & funds
+        do_surrender = (((action == SURRENDER) | (action == SURRENDER_OR_STAND))
+                        & two_cards & ~self.split[rows, slots])
+        do_hit = ((action == HIT)
+                  | ((action == SPLIT) & ~do_split)
+                  | ((action == SURRENDER) & ~do_surrender)
+                  | ((action == DOUBLE_OR_HIT) & ~do_double))
+
+        if do_double.any():
+            r, s = rows[do_double], slots[do_double]
+            self.bankroll[r] -= self.bet[r, s]
+            self.bet[r, s] *= 2
+            self.doubled[r, s] = True
+            self._add_card(r, s, self._draw(r))
+
+        if do_surrender.any():
+            r, s = rows[do_surrender], slots[do_surrender]
+            self.surrendered[r, s] = True
+            self.bankroll[r] += self.bet[r, s] / 2
+
+        # A failed surrender hits once; any other hit leaves a hand of three or more cards,
+        # whose run of hits is played out at once
+        hits_once = do_hit & (action == SURRENDER)
+        runs = do_hit & ~hits_once
+        if hits_once.any():
+            r, s = rows[hits_once], slots[hits_once]
+            self._add_card(r, s, self._draw(r))
+        if runs.any():
+            r, s = rows[runs], slots[runs]
+            codes, cursor = self._hit_run(
+                r, self.cursor[r], self.hard[r, s] + ACE_CODE * self.aces[r, s].astype(np.int16),
+                (self.upcard[r] - 2).astype(np.int64) * NUM_CODES
+            )
+            self.ncards[r, s] += cursor - self.cursor[r]
+            self.aces[r, s], self.hard[r, s] = np.divmod(codes, ACE_CODE)
+            self.cursor[r] = cursor
+
+        if do_split.any():
+            r, s = rows[do_split], slots[do_split]
+            while self.num_player_hands[r].max() >= self.hard.shape[1]:
+                self._grow_hands()
+            new = self.num_player_hands[r]
+            value = self.second[r, s]
+
+            # Move the second card to a new hand with an equal bet
+            self.split[r, s] = True
+            self.hard[r, s] -= np.where(value == 11, 1, value)
+            self.aces[r, s] -= value == 11
+            self.ncards[r, s] = 1
+            self._add_card(r, new, value)
+            self.bet[r, new] = self.bet[r, s]
+            self.bankroll[r] -= self.bet[r, s]
+            aces = value == 11
+            self.split_aces[r[aces], s[aces]] = True
+            self.split_aces[r[aces], new[aces]] = True
+            self.num_player_hands[r] += 1
+
+            # Deal one more card to each hand
+            self._add_card(r, s, self._draw(r))
+            self._add_card(r, new, self._draw(r))
+
+        # A hand is finished once busted, doubled or surrendered, or after stand-type actions
+        done = ((self.hard[rows, slots] > 21) | self.doubled[rows, slots] | self.surrendered[rows, slots] | runs
+                | (action == STAND) | (action == DOUBLE) | (action == SURRENDER_OR_STAND)
+                | (action == SURRENDER))
+        finished = rows[done]
+        self.current[finished] += 1
+
+        # Split aces hands after the current one get no decisions
+        skipping = finished
+        while skipping.size:
+            position = self.current[skipping]
+            in_range = position < self.num_player_hands[skipping]
+            skipping, position = skipping[in_range], position[in_range]
+            skipping = skipping[self.split_aces[skipping, position]]
+            self.current[skipping] += 1
+
+        return rows[self.current[rows] < self.num_player_hands[rows]]